@@ -23,7 +23,15 @@ Author: Beyhan MEYRALI
 
 import requests
 import json
-from typing import Optional, List, Dict
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.ollama_client import get_client
+from common.response_cache import ResponseCache
+from common.model_cascade import ModelCascade
+from common.batch import DEFAULT_MAX_CONCURRENCY, iter_completed, run_batch
 
 
 # =============================================================================
@@ -45,32 +53,58 @@ class OllamaBot:
 
     def __init__(self,
                  model: str = "qwen3:8b",
-                 base_url: str = "http://localhost:11434",
-                 timeout: int = 60):
+                 base_url: Optional[str] = None,
+                 timeout: int = 60,
+                 temperature: Optional[float] = None,
+                 cache: Optional[ResponseCache] = None,
+                 cascade: Optional[ModelCascade] = None,
+                 verbose: bool = True):
         """
         Initialize the chatbot.
 
         Args:
             model: The Ollama model to use (default: qwen3:8b)
-            base_url: Ollama API endpoint (default: http://localhost:11434)
+            base_url: Ollama API endpoint (default: OLLAMA_BASE_URL or http://localhost:11434)
+                      Several hosts ("http://a:11434,http://b:11434" or a list)
+                      are load balanced by common/backend_pool.py
             timeout: Request timeout in seconds (default: 60)
+            temperature: Sampling temperature (None = Ollama's default)
+            cache: Optional ResponseCache - repeated questions are answered
+                   from the cache instead of the LLM (low temperature only)
+            cascade: Optional ModelCascade - a small model answers first and
+                     `model` is ignored; the big model is only used when needed
+            verbose: Print every question and answer (False for big batches)
 
         Note: This is the CONSTRUCTOR - it runs when you create a new bot.
         """
+        # Shared keep-alive connection pool (one per Ollama host)
+        # Re-using connections avoids a new TCP handshake on every question
+        self.client = get_client(base_url)
+
         self.model = model
-        self.base_url = base_url
+        self.base_url = self.client.base_url
         self.timeout = timeout
-        self.api_endpoint = f"{base_url}/api/chat"
+        self.api_endpoint = f"{self.base_url}/api/chat"
+        self.temperature = temperature
+        self.cache = cache
+        self.cascade = cascade
+        self.verbose = verbose
 
         # Instance variable to store conversation history
         # Each bot instance has its own history!
         self.messages: List[Dict[str, str]] = []
 
-        print(f"[OK] OllamaBot initialized")
-        print(f"[OK] Model: {self.model}")
-        print(f"[OK] Endpoint: {self.api_endpoint}")
+        self._log(f"[OK] OllamaBot initialized")
+        self._log(f"[OK] Model: {self.model}")
+        self._log(f"[OK] Endpoint: {self.api_endpoint}")
+
+    def _log(self, message: str):
+        """print() unless the bot is quiet (verbose=False)."""
+        if self.verbose:
+            print(message)
 
-    def ask_question(self, question: str, stream: bool = False) -> Optional[str]:
+    def ask_question(self, question: str, stream: bool = False,
+                     raise_errors: bool = False) -> Optional[str]:
         """
         Send a single question to the LLM and get a response.
 
@@ -79,6 +113,7 @@ class OllamaBot:
         Args:
             question: The question to ask the LLM
             stream: If True, get streaming response (for future use)
+            raise_errors: Raise instead of printing the error and returning None
 
         Returns:
             The LLM's response as a string, or None if error occurred
@@ -102,14 +137,45 @@ class OllamaBot:
             ],
             "stream": stream  # Get complete response at once (not token-by-token)
         }
+        if self.temperature is not None:
+            payload["options"] = {"temperature": self.temperature}
+
+        # Step 1b: Same question, same model, same options -> same answer?
+        # A cache hit skips the whole (multi-second) generation. With a cascade
+        # the answer may come from the small model, so the key is the cascade
+        # ("ministral-3:3b->qwen3:8b"), never the plain model name
+        target = "->".join(self.cascade.models) if self.cascade is not None else self.model
+        cache_key = None
+        if self.cache is not None and not stream and self.cache.is_cacheable(payload.get("options")):
+            cache_key = self.cache.make_key(target, payload["messages"], payload.get("options"))
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                self._log(f"\n[USER] {question}")
+                self._log(f"[CACHE] Hit - answered without calling {target}")
+                self._log(f"[AI] {cached}")
+                return cached
 
         # Step 2: Send POST request to Ollama
-        print(f"\n[USER] {question}")
-        print(f"[INFO] Sending to {self.model}...")
+        self._log(f"\n[USER] {question}")
+        self._log(f"[INFO] Sending to {target}...")
 
         try:
-            response = requests.post(
-                self.api_endpoint,
+            if self.cascade is not None:
+                # Small model first; escalates to the big one only on a weak answer
+                response_data = self.cascade.chat(payload, timeout=self.timeout)
+                llm_response = response_data['message']['content']
+                decision = response_data['cascade']
+                escalated = ", ".join(e["model"] + ": " + e["reason"] for e in decision["escalations"])
+                self._log(f"[CASCADE] Answered by {decision['model']}"
+                          + (f" (escalated - {escalated})" if escalated else ""))
+                if cache_key is not None:
+                    self.cache.set(cache_key, llm_response)
+                self._log(f"[AI] {llm_response}")
+                return llm_response
+
+            # "/api/chat" instead of a full URL, so the client (or pool) picks the host
+            response = self.client.post(
+                "/api/chat",
                 json=payload,
                 timeout=self.timeout
             )
@@ -123,14 +189,21 @@ class OllamaBot:
                 # Response structure: response['message']['content']
                 llm_response = response_data['message']['content']
 
-                print(f"[AI] {llm_response}")
+                if cache_key is not None:
+                    self.cache.set(cache_key, llm_response)
+
+                self._log(f"[AI] {llm_response}")
                 return llm_response
             else:
                 error_msg = f"Error {response.status_code}: {response.text}"
+                if raise_errors:
+                    raise RuntimeError(error_msg)
                 print(f"[ERROR] {error_msg}")
                 return None
 
         except requests.exceptions.RequestException as e:
+            if raise_errors:
+                raise
             print(f"[ERROR] Connection failed: {e}")
             print("[HINT] Make sure Ollama is running: ollama serve")
             return None
@@ -143,6 +216,29 @@ class OllamaBot:
         """
         return self.ask_question(user_message)
 
+    def ask_many(self, prompts: Iterable[str],
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY) -> Iterator[Dict[str, Any]]:
+        """
+        Ask many INDEPENDENT questions concurrently.
+
+        ask_question() keeps no history, so one bot can answer several
+        questions at the same time from worker threads. Results arrive in
+        COMPLETION order - use "index" to match them to the prompts:
+
+            for result in bot.ask_many(questions, max_concurrency=8):
+                print(result["index"], result["answer"] or result["error"])
+
+        Args:
+            prompts: Questions (a list or a lazy generator)
+            max_concurrency: Requests in flight at once. More than Ollama's
+                OLLAMA_NUM_PARALLEL (or OLLAMA_POOL_SIZE) only adds queueing
+
+        Yields:
+            {"index", "prompt", "answer", "error", "seconds"} per question
+        """
+        ask = lambda prompt: self.ask_question(prompt, raise_errors=True)
+        return iter_completed(ask, prompts, max_concurrency=max_concurrency)
+
     def reset(self):
         """
         Reset the bot's conversation history.
@@ -159,11 +255,17 @@ class OllamaBot:
         Returns:
             Dictionary with model information
         """
-        return {
+        info = {
             "model": self.model,
             "endpoint": self.api_endpoint,
-            "timeout": self.timeout
+            "timeout": self.timeout,
+            "temperature": self.temperature
         }
+        if self.cache is not None:
+            info["cache"] = self.cache.get_stats()
+        if self.cascade is not None:
+            info["cascade"] = self.cascade.get_stats()
+        return info
 
 
 # =============================================================================
@@ -298,6 +400,138 @@ def demonstrate_multiple_bots():
     print("="*70)
 
 
+# =============================================================================
+# PERFORMANCE: Response Cache for Repeated Questions
+# =============================================================================
+
+def demonstrate_response_cache():
+    """
+    Show how a response cache makes repeated (FAQ-style) questions instant.
+
+    At a low temperature the model gives (almost) the same answer to the
+    same question, so we can store it and skip the LLM next time.
+    """
+
+    print("\n" + "="*70)
+    print("PERFORMANCE: Response Cache")
+    print("="*70)
+
+    # Memory + SQLite file: the cache survives a restart of this script
+    cache = ResponseCache(path="response_cache.sqlite", ttl=24 * 3600)
+    bot = OllamaBot(model="qwen3:8b", temperature=0.1, cache=cache)
+
+    import time
+    for attempt in range(1, 3):
+        start = time.perf_counter()
+        bot.ask_question("What is the capital of France?")
+        print(f"[INFO] Attempt {attempt}: {time.perf_counter() - start:.4f}s")
+
+    # High temperature = creative answers, these are never cached
+    creative_bot = OllamaBot(model="qwen3:8b", temperature=0.9, cache=cache)
+    creative_bot.ask_question("Write a one-line poem about Paris")
+
+    print(f"\n[INFO] Cache stats: {json.dumps(cache.get_stats(), indent=2)}")
+    print("\n" + "="*70)
+    print("EXPLANATION:")
+    print("The second attempt came from the cache (microseconds, no GPU work).")
+    print("The key includes model + messages + options, so a different")
+    print("question, model or temperature never returns a wrong answer.")
+    print("="*70)
+
+
+# =============================================================================
+# PERFORMANCE: Model Cascade (small model first)
+# =============================================================================
+
+def demonstrate_model_cascade():
+    """
+    Most questions are simple - let a 3B model answer them and keep the
+    8B model for the ones the small model struggles with.
+    """
+
+    print("\n" + "="*70)
+    print("PERFORMANCE: Model Cascade (ministral-3:3b -> qwen3:8b)")
+    print("="*70)
+
+    cascade = ModelCascade(["ministral-3:3b", "qwen3:8b"], self_report=True)
+    bot = OllamaBot(cascade=cascade)
+
+    import time
+    for question in ["What is the capital of France?",
+                     "What is 15 multiplied by 7?",
+                     "Prove that there are infinitely many prime numbers."]:
+        start = time.perf_counter()
+        bot.ask_question(question)
+        print(f"[INFO] {time.perf_counter() - start:.2f}s")
+
+    print(f"\n[INFO] Cascade stats: {json.dumps(cascade.get_stats(), indent=2)}")
+    print("\n" + "="*70)
+    print("EXPLANATION:")
+    print("Easy questions never reach the big model. An answer is escalated when")
+    print("it is empty, cut off, a refusal, or rated below 7/10 by the small model.")
+    print("="*70)
+
+
+# =============================================================================
+# PERFORMANCE: Concurrent Batches (ask_many)
+# =============================================================================
+
+def demonstrate_ask_many():
+    """
+    Independent questions do not have to wait for each other.
+
+    demonstrate_multiple_bots() asks one question after another. ask_many()
+    keeps several requests in flight (Ollama answers OLLAMA_NUM_PARALLEL at
+    once) and hands back each answer as soon as it is ready.
+    """
+
+    print("\n" + "="*70)
+    print("PERFORMANCE: Concurrent Batch (ask_many)")
+    print("="*70)
+
+    questions = ["What is the capital of France?",
+                 "What is 2+2?",
+                 "Name a primary color.",
+                 "What is the boiling point of water in Celsius?"]
+
+    import time
+    bot = OllamaBot(verbose=False)  # quiet: answers are printed below
+    start = time.perf_counter()
+    for result in bot.ask_many(questions, max_concurrency=4):
+        # Completion order - "index" says which question this answers
+        answer = result["answer"] or f"[ERROR] {result['error']}"
+        print(f"[{result['index']}] ({result['seconds']:.2f}s) {result['prompt']}")
+        print(f"    [AI] {answer[:100]}")
+    print(f"\n[INFO] {len(questions)} questions in {time.perf_counter() - start:.2f}s")
+
+    print("\n" + "="*70)
+    print("EXPLANATION:")
+    print("Total time is close to the SLOWEST answer, not the sum of all answers.")
+    print("For large evaluation sets use the resumable JSONL batch mode:")
+    print("  python 01_basic_chat.py --batch prompts.jsonl --output answers.jsonl")
+    print("="*70)
+
+
+def run_batch_cli(args):
+    """JSONL in -> JSONL out, concurrently; re-run the same command to resume."""
+    bot = OllamaBot(model=args.model, temperature=args.temperature, verbose=False)
+
+    def progress(record):
+        status = "[ERROR]" if record["error"] else "[OK]"
+        print(f"{status} {record['id']} ({record['seconds']:.2f}s)", flush=True)
+
+    print(f"[INFO] Batch {args.batch} -> {args.output} "
+          f"({args.concurrency} concurrent, model {args.model})")
+    try:
+        summary = run_batch(bot.ask_many, args.batch, args.output,
+                            max_concurrency=args.concurrency, on_result=progress,
+                            model=args.model)
+    except KeyboardInterrupt:
+        print("\n[INFO] Interrupted - run the same command again to resume")
+        return
+    print(f"\n[OK] Done: {summary}")
+
+
 # =============================================================================
 # CURL EQUIVALENT
 # =============================================================================
@@ -379,6 +613,15 @@ def main():
     # Test 4: Show multiple bots (OOP advantage)
     demonstrate_multiple_bots()
 
+    # Test 5: Response cache for repeated questions
+    demonstrate_response_cache()
+
+    # Test 6: Small model first, big model only when needed
+    demonstrate_model_cascade()
+
+    # Test 7: Many independent questions at once
+    demonstrate_ask_many()
+
     # Show curl equivalent
     show_curl_equivalent()
 
@@ -396,11 +639,24 @@ if __name__ == "__main__":
     """
     This block runs when the script is executed directly.
     It's the ENTRY POINT of the program.
+
+    Batch mode (no demos):
+        python 01_basic_chat.py --batch prompts.jsonl --output answers.jsonl --concurrency 8
     """
+    import argparse
+    parser = argparse.ArgumentParser(description="Basic chat demo / JSONL batch runner")
+    parser.add_argument("--batch", help="JSONL file with {\"id\", \"prompt\"} lines")
+    parser.add_argument("--output", help="JSONL results (appended; re-run to resume)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY)
+    parser.add_argument("--model", default="qwen3:8b")
+    parser.add_argument("--temperature", type=float, default=None)
+    args = parser.parse_args()
+    if args.batch and not args.output:
+        parser.error("--batch needs --output")
 
     # Check if Ollama is accessible before starting
     try:
-        response = requests.get("http://localhost:11434/api/tags", timeout=5)
+        response = get_client().get("/api/tags", timeout=5)
         if response.status_code != 200:
             print("[WARNING] Ollama is running but returned unexpected status")
     except requests.exceptions.RequestException:
@@ -412,7 +668,10 @@ if __name__ == "__main__":
         exit(1)
 
     # Run the main program
-    main()
+    if args.batch:
+        run_batch_cli(args)
+    else:
+        main()
 
 
 # =============================================================================
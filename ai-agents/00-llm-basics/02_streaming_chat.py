@@ -9,6 +9,14 @@ What you'll learn:
 - How to maintain conversation history (memory)
 - Why conversation history is needed (LLMs are stateless)
 - Cleaning LLM responses (removing thinking tags)
+- TRUE token streaming (show tokens as soon as they arrive)
+- Non-blocking async FastAPI endpoints + Server-Sent Events (SSE)
+- Per-user memory on a server with bounded RAM (SessionManager)
+- Keeping long conversations fast with a token budget + summary (HistoryPolicy)
+- Sharing ONE generation between identical concurrent requests (SingleFlight)
+- Admission control: a fair, bounded queue in front of Ollama (429/503 when busy)
+- Stateful sessions: re-using Ollama's `context` tokens instead of re-sending history
+- Thinking budgets: no / capped / full reasoning per request (ThinkingPolicy)
 - Error handling for API calls
 
 DEBUGGING TIPS FOR NEWBIES:
@@ -24,21 +32,40 @@ DEBUGGING TIPS FOR NEWBIES:
 3. If responses are weird or include thinking:
    - The clean_response() method removes <think> tags
    - You can add more cleaning logic in that function
+   - In streaming mode, common/think_filter.py removes them chunk by chunk
 
 4. To see what's being sent to the LLM:
-   - Add: `print(json.dumps(payload, indent=2))` before requests.post()
+   - Add: `print(json.dumps(payload, indent=2))` before self.client.post()
    - This shows the exact JSON being sent
 
 5. To debug conversation history:
    - Add: `print(f"Messages: {len(self.messages)}")` to see history size
    - Add: `print(self.messages)` to see full conversation
+   - With a HistoryPolicy, `bot.history_policy.get_stats()` shows tokens saved
 
 Author: Beyhan MEYRALI
 """
-import requests
 import json
-from fastapi import FastAPI, HTTPException
+import time
+from contextlib import ExitStack, contextmanager
+from typing import Optional
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
 import uvicorn
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.ollama_client import get_client, get_async_client, aclose_all
+from common.think_filter import ThinkFilter
+from common.session_manager import SessionManager
+from common.history_policy import HistoryPolicy, OllamaSummarizer
+from common.single_flight import SingleFlight, payload_key
+from common.admission import (AdmissionRejected, PRIORITY_DEFAULT, get_admission_controller,
+                              parse_priority)
+from common.metrics import chunk_text, instrument_app
+from common.context_session import ContextSession
+from common.thinking import THINK_CAPPED, THINKING_OFF, ThinkingPolicy
 
 class OllamaBot:
     """
@@ -48,32 +75,132 @@ class OllamaBot:
     - Conversation history management (the 'messages' list)
     - API error handling
     - Response cleaning
+    - Token streaming (ask_question(..., stream=True) / stream_question())
 
     Each instance maintains its own conversation history!
     """
 
-    def __init__(self, model="qwen3:8b", base_url="http://localhost:11434"):
+    def __init__(self, model="qwen3:8b", base_url=None, history_policy=None, stateful=False,
+                 thinking=None):
         """
         Initialize the chatbot.
 
         Args:
             model: The Ollama model to use (default: qwen3:8b)
-            base_url: Ollama API endpoint
+            base_url: Ollama API endpoint (default: OLLAMA_BASE_URL) - or several
+                ("http://a:11434,http://b:11434" or a list) to spread the load with a BackendPool
+            history_policy: Optional HistoryPolicy - sends a token-budgeted window
+                (pinned system + summary + recent turns) instead of ALL messages
+            stateful: Use /api/generate and send back Ollama's `context` tokens, so
+                only the NEW question is tokenised each turn (see ContextSession).
+                With several hosts the conversation stays on the one holding its
+                context; falls back to /api/chat when the model or host changes
+            thinking: Default reasoning policy - "off", "capped" / "capped:200" (the cap
+                is enforced while streaming), "full" or a ThinkingPolicy. None = model default
 
         Debugging: If this fails, check if Ollama is running with `ollama serve`
         """
+        # Shared keep-alive connection pool (see common/ollama_client.py)
+        self.client = get_client(base_url)
+
         self.model = model
-        self.base_url = base_url
+        self.base_url = self.client.base_url
 
         # This list stores the conversation history!
         # Each time you ask a question, it gets added here
         # This is how the LLM "remembers" previous messages
         self.messages = []
+        self.history_policy = history_policy
+        self.context_session = ContextSession() if stateful else None
+        self.thinking = ThinkingPolicy.parse(thinking)
+        # Host of the current stateful turn, and the `host=` pin for a BackendPool
+        self._turn_host = self.base_url
+        self._pin = {}
 
         print(f"[OK] Initialized Ollama bot with model: {model}")
-        print(f"[OK] Ollama base URL: {base_url}")
+        print(f"[OK] Ollama base URL: {self.base_url}")
+
+    def _build_payload(self, stream=False):
+        """
+        Build the /api/chat payload from the current conversation.
+
+        NOTE: We send ALL messages (entire conversation history)
+        This is why the LLM "remembers" - it sees everything each time!
+
+        With a history_policy, long conversations are trimmed to a token budget:
+        older turns are replaced by a short running summary.
+        """
+        messages = self.messages
+        if self.history_policy is not None:
+            messages = self.history_policy.build(self.messages)
+
+        return {
+            "model": self.model,
+            "messages": messages,  # <- Full conversation history (or the budgeted window)
+            "stream": stream,  # False = complete response at once, True = token-by-token
+            "options": {
+                "temperature": 0.1,  # Lower = more focused, Higher = more creative
+                "top_p": 0.9  # Nucleus sampling parameter
+            }
+        }
 
-    def ask_question(self, question):
+    def _next_request(self, stream=False, thinking=None):
+        """
+        (path, payload) for the next turn.
+
+        Stateful bots continue the conversation on /api/generate with the
+        `context` from the previous answer; everything else uses /api/chat.
+        A ThinkingPolicy sets the `think` flag on whichever payload is used.
+        """
+        path, payload = "/api/chat", self._build_payload(stream=stream)
+        self._turn_host, self._pin = self.base_url, {}
+        if self.context_session is not None:
+            route = getattr(self.client, "route", None)  # several hosts: BackendPool
+            if route is not None:
+                # The host holding our context, unless it is down (-> "host changed")
+                self._turn_host = route(self.model, prefer=self.context_session.host)
+            generate = self.context_session.build(self.model, self._turn_host, self.messages,
+                                                  stream=stream, options=payload.get("options"))
+            if generate is not None:
+                path, payload = "/api/generate", generate
+                if route is not None:
+                    self._pin = {"host": self._turn_host}
+        if thinking is not None:
+            payload = thinking.apply(payload)
+        return path, payload
+
+    def _thinking_policy(self, thinking=None):
+        """Per-request policy ("off", "capped", ...) or the bot's default."""
+        return ThinkingPolicy.parse(thinking) or self.thinking
+
+    def _chunks(self, policy):
+        """
+        Stream the chunks of the next answer, enforcing the thinking cap.
+
+        If the reasoning runs past the cap, the stream is closed (Ollama stops
+        generating) and the same question is asked again with thinking off.
+        """
+        path, payload = self._next_request(stream=True, thinking=policy)
+        budget = policy.budget(self.model) if policy is not None else None
+        chunks = self.client.stream(path, payload, timeout=60, **self._pin)
+        try:
+            for chunk in chunks:
+                if budget is not None and budget.feed(chunk):
+                    break
+                yield chunk
+        finally:
+            chunks.close()
+
+        if budget is None:
+            return
+        budget.finish()
+        if budget.aborted:
+            print(f"\n[THINK] Reasoning hit {policy.max_thinking_tokens} tokens - "
+                  "answering without thinking")
+            path, payload = self._next_request(stream=True, thinking=THINKING_OFF)
+            yield from self.client.stream(path, payload, timeout=60, **self._pin)
+
+    def ask_question(self, question, stream=False, thinking=None):
         """
         Send a question to Ollama and maintain conversation history.
 
@@ -84,43 +211,52 @@ class OllamaBot:
         4. Adds the response to history
         5. Returns the cleaned response
 
+        Args:
+            question: The user's question
+            stream: If True, print tokens as they arrive (see stream_question)
+            thinking: Reasoning policy for this question (default: the bot's)
+
         Debugging: If you get errors here, add print statements to see the payload
         """
-        try:
-            url = f"{self.base_url}/api/chat"
+        policy = self._thinking_policy(thinking)
+        if stream or (policy is not None and policy.mode == THINK_CAPPED):
+            # The thinking cap can only be enforced while tokens are streaming
+            print(f"[ASK] Asking: {question}")
+            print("[OK] Response: ", end="", flush=True)
+            count, tokens = len(self.messages), []
+            for token in self.stream_question(question, thinking=policy):
+                self._print_safe(token)
+                tokens.append(token)
+            print()
+            # Same as below: the answer, or the error message
+            return self._answer_since(count, tokens)
 
+        try:
             # IMPORTANT: Add user message to conversation history
             # This is how we build up the conversation over time
             self.messages.append({"role": "user", "content": question})
             
-            # Prepare the payload
-            # NOTE: We send ALL messages (entire conversation history)
-            # This is why the LLM "remembers" - it sees everything each time!
-            payload = {
-                "model": self.model,
-                "messages": self.messages,  # <- Full conversation history!
-                "stream": False,  # Get complete response at once
-                "options": {
-                    "temperature": 0.1,  # Lower = more focused, Higher = more creative
-                    "top_p": 0.9  # Nucleus sampling parameter
-                }
-            }
+            # Prepare the payload (full conversation history - or the stateful context)
+            path, payload = self._next_request(stream=False, thinking=policy)
 
             # DEBUGGING: Uncomment to see what's being sent to the LLM
             # print(f"[DEBUG] Payload: {json.dumps(payload, indent=2)}")
             
             print(f"[ASK] Asking: {question}")
-            response = requests.post(url, json=payload, timeout=60)
+            # A path (not a full URL): with several hosts, the pool picks one
+            response = self.client.post(path, json=payload, timeout=60, **self._pin)
             
             if response.status_code == 200:
                 response_data = response.json()
-                ai_response = response_data.get("message", {}).get("content", "")
+                ai_response = chunk_text(response_data)  # "message.content" or "response"
+                if policy is not None:
+                    policy.budget(self.model).finish(response_data)  # thinking tokens used
                 
                 # Filter out thinking tags from response
                 cleaned_response = self.clean_response(ai_response)
                 
                 # Add assistant response to conversation
-                self.messages.append({"role": "assistant", "content": cleaned_response})
+                self._save_answer(cleaned_response, response_data)
                 
                 # Handle encoding issues on Windows
                 try:
@@ -133,13 +269,106 @@ class OllamaBot:
             else:
                 error_msg = f"Ollama API Error: {response.status_code} - {response.text}"
                 print(f"[ERROR] {error_msg}")
+                self._drop_question()  # unanswered - keep the history consistent
                 return error_msg
                 
         except Exception as e:
             error_msg = f"Connection error: {str(e)}"
             print(f"[ERROR] {error_msg}")
+            self._drop_question()
             return error_msg
 
+    def stream_question(self, question, thinking=None):
+        """
+        Stream the answer token by token (a generator).
+
+        Ollama sends NDJSON - one small JSON object per line:
+            {"message": {"content": "Par"}, "done": false}
+            {"message": {"content": "is"}, "done": false}
+            {"done": true, ...}
+
+        We yield each visible piece immediately, so the user sees the answer
+        while the model is still generating. <think> blocks are removed on
+        the fly by ThinkFilter (tags can be split across chunks!).
+
+        When the stream ends, the CLEANED full answer is added to history,
+        exactly like ask_question() does.
+
+        Example:
+            for token in bot.stream_question("Tell me a joke"):
+                print(token, end="", flush=True)
+        """
+        self.messages.append({"role": "user", "content": question})
+        policy = self._thinking_policy(thinking)
+
+        think_filter = ThinkFilter()
+        raw_parts = []
+        final = None
+
+        try:
+            for chunk in self._chunks(policy):
+                token = chunk_text(chunk)
+                raw_parts.append(token)
+                if chunk.get("done"):
+                    final = chunk  # timing stats (+ `context` on /api/generate)
+
+                visible = think_filter.feed(token)
+                if visible:
+                    yield visible
+
+            remainder = think_filter.flush()
+            if remainder:
+                yield remainder
+
+        except GeneratorExit:
+            self._drop_question()  # the caller stopped reading
+            raise
+        except Exception as e:
+            error_msg = f"Connection error: {str(e)}"
+            print(f"\n[ERROR] {error_msg}")
+            self._drop_question()
+            yield error_msg
+            return
+
+        # Save the cleaned answer to history (same as the non-streaming path)
+        cleaned_response = self.clean_response("".join(raw_parts))
+        self._save_answer(cleaned_response, final)
+
+    def _drop_question(self):
+        """
+        Forget a question that got no answer (Ollama error, rejected, aborted).
+
+        Otherwise the next turn would send two user messages in a row.
+        """
+        if self.messages and self.messages[-1]["role"] == "user":
+            self.messages.pop()
+
+    def _answer_since(self, count, tokens):
+        """
+        Result of a streamed turn that started with `count` messages: the
+        saved answer, or - if the turn failed - the error (its last token).
+        """
+        if len(self.messages) > count and self.messages[-1]["role"] == "assistant":
+            return self.messages[-1]["content"]
+        return tokens[-1] if tokens else None
+
+    def _save_answer(self, cleaned_response, final=None):
+        """Add the answer to history and let the history policy fold old turns."""
+        self.messages.append({"role": "assistant", "content": cleaned_response})
+        if self.context_session is not None:
+            # Keep Ollama's context for the next turn (a /api/chat reply ends the reuse)
+            self.context_session.update(self.model, self._turn_host, self.messages, final)
+        if self.history_policy is not None:
+            # Summarisation runs in the background - the user does not wait for it
+            self.history_policy.after_turn(self.messages)
+
+    def _print_safe(self, text):
+        """Print a token without a newline (handles Windows encoding issues)."""
+        try:
+            print(text, end="", flush=True)
+        except UnicodeEncodeError:
+            print(text.encode('ascii', 'replace').decode('ascii'), end="", flush=True)
+
     def clean_response(self, response):
         """
         Remove thinking tags and content from response.
@@ -165,27 +394,386 @@ class OllamaBot:
     def reset_conversation(self):
         """Reset the conversation history"""
         self.messages = []
+        if self.history_policy is not None:
+            self.history_policy.reset()
+        if self.context_session is not None:
+            self.context_session.reset()
         print("[INFO] Conversation history reset")
 
 
+class AsyncOllamaBot(OllamaBot):
+    """
+    asyncio version of OllamaBot for web servers (FastAPI).
+
+    WHY? An `async def` FastAPI handler that calls the blocking `requests`
+    library freezes the whole event loop: while one slow generation runs,
+    EVERY other client waits. AsyncOllamaBot uses httpx.AsyncClient and
+    `await`s the network, so one uvicorn worker serves many chats at once.
+
+    History handling and response cleaning are inherited from OllamaBot,
+    only the network calls are async.
+
+    Example:
+        bot = AsyncOllamaBot()
+        answer = await bot.ask_question("What is 2+2?")
+        async for token in bot.stream_question("Tell me a joke"):
+            print(token, end="")
+    """
+
+    def __init__(self, model="qwen3:8b", base_url=None, history_policy=None,
+                 single_flight=None, stateful=False, thinking=None):
+        super().__init__(model=model, base_url=base_url, history_policy=history_policy,
+                         stateful=stateful, thinking=thinking)
+        # Shared async connection pool (must be created inside the event loop)
+        self.async_client = get_async_client(base_url)
+        # Optional SingleFlight: identical concurrent payloads share one generation
+        self.single_flight = single_flight
+
+    async def _post(self, path, payload, admit=None):
+        """POST /api/chat (or /api/generate), joining an identical in-flight request."""
+        pin = self._pin
+        if self.single_flight is None:
+            return await self._send(path, payload, admit, pin)
+        return await self.single_flight.do(
+            (path, payload_key(payload)), lambda: self._send(path, payload, admit, pin))
+
+    async def _send(self, path, payload, admit, pin):
+        # `admit` (an admission slot) is entered by the LEADER only: requests
+        # that join its generation wait for the answer without holding a slot
+        if admit is None:
+            return await self.async_client.post(path, json=payload, timeout=60, **pin)
+        async with admit():
+            return await self.async_client.post(path, json=payload, timeout=60, **pin)
+
+    def _stream(self, path, payload, admit=None):
+        """Stream chunks, fanned out from a shared generation if possible."""
+        pin = self._pin
+        if self.single_flight is None:
+            return self._open_stream(path, payload, admit, pin)
+        return self.single_flight.stream(
+            (path, payload_key(payload)), lambda: self._open_stream(path, payload, admit, pin))
+
+    async def _open_stream(self, path, payload, admit, pin):
+        if admit is None:
+            async for chunk in self.async_client.stream(path, payload, timeout=60, **pin):
+                yield chunk
+            return
+        async with admit():
+            async for chunk in self.async_client.stream(path, payload, timeout=60, **pin):
+                yield chunk
+
+    async def _chunks(self, policy, admit=None):
+        """Async version of OllamaBot._chunks() (thinking cap + retry without thinking)."""
+        path, payload = self._next_request(stream=True, thinking=policy)
+        budget = policy.budget(self.model) if policy is not None else None
+        chunks = self._stream(path, payload, admit)
+        try:
+            async for chunk in chunks:
+                if budget is not None and budget.feed(chunk):
+                    break
+                yield chunk
+        finally:
+            await chunks.aclose()
+
+        if budget is None:
+            return
+        budget.finish()
+        if budget.aborted:
+            path, payload = self._next_request(stream=True, thinking=THINKING_OFF)
+            async for chunk in self._stream(path, payload, admit):
+                yield chunk
+
+    async def ask_question(self, question, thinking=None, admit=None):
+        """
+        Async version of OllamaBot.ask_question() - does not block the event loop.
+
+        admit: optional `admit()` async context manager (e.g. an admission
+               slot) entered around the request to Ollama - only if this
+               request starts a generation, not if it joins one
+        """
+        policy = self._thinking_policy(thinking)
+        if policy is not None and policy.mode == THINK_CAPPED:
+            # The cap is enforced on the stream; collect it into one answer
+            count = len(self.messages)
+            tokens = [token async for token in
+                      self.stream_question(question, policy, admit=admit)]
+            return self._answer_since(count, tokens)
+
+        self.messages.append({"role": "user", "content": question})
+        path, payload = self._next_request(stream=False, thinking=policy)
+
+        try:
+            response = await self._post(path, payload, admit)
+            if response.status_code != 200:
+                error_msg = f"Ollama API Error: {response.status_code} - {response.text}"
+                print(f"[ERROR] {error_msg}")
+                self._drop_question()
+                return error_msg
+
+            response_data = response.json()
+            if policy is not None:
+                policy.budget(self.model).finish(response_data)
+            cleaned_response = self.clean_response(chunk_text(response_data))
+            self._save_answer(cleaned_response, response_data)
+            return cleaned_response
+
+        except AdmissionRejected:
+            # Not admitted: the server answers 429/503, the question is not history
+            self._drop_question()
+            raise
+        except Exception as e:
+            error_msg = f"Connection error: {str(e)}"
+            print(f"[ERROR] {error_msg}")
+            self._drop_question()
+            return error_msg
+
+    async def stream_question(self, question, thinking=None, admit=None):
+        """Async generator version of OllamaBot.stream_question() (`admit`: see ask_question)."""
+        self.messages.append({"role": "user", "content": question})
+        policy = self._thinking_policy(thinking)
+
+        think_filter = ThinkFilter()
+        raw_parts = []
+        final = None
+
+        try:
+            async for chunk in self._chunks(policy, admit):
+                token = chunk_text(chunk)
+                raw_parts.append(token)
+                if chunk.get("done"):
+                    final = chunk
+
+                visible = think_filter.feed(token)
+                if visible:
+                    yield visible
+
+            remainder = think_filter.flush()
+            if remainder:
+                yield remainder
+
+        except (AdmissionRejected, GeneratorExit):
+            self._drop_question()
+            raise
+        except Exception as e:
+            error_msg = f"Connection error: {str(e)}"
+            print(f"[ERROR] {error_msg}")
+            self._drop_question()
+            yield error_msg
+            return
+
+        cleaned_response = self.clean_response("".join(raw_parts))
+        self._save_answer(cleaned_response, final)
+
+
 # FastAPI app
 app = FastAPI()
 
+# GET /metrics for Prometheus: Ollama load/prompt/decode times, tokens/s, TTFT
+instrument_app(app)
+
+# When 50 clients ask the same thing at once, run ONE generation and share it
+# (only while it is running - finished answers are never reused)
+inflight = SingleFlight()
+
+# Ollama runs only OLLAMA_NUM_PARALLEL requests at once - queue the rest here,
+# fairly per user, and answer 429/503 quickly instead of timing out after 60s
+admission = get_admission_controller()
+
+def admission_args(request: Request, session_id: Optional[str]):
+    """Tenant = session (or client IP); priority from the X-Priority header."""
+    tenant = session_id or (request.client.host if request.client else "anonymous")
+    return tenant, parse_priority(request.headers.get("X-Priority"))
+
+def rejected(e: AdmissionRejected):
+    """Turn an admission rejection into a fast HTTP error with Retry-After."""
+    return HTTPException(status_code=e.status_code, detail=str(e),
+                         headers={"Retry-After": str(e.retry_after)})
+
+# One conversation per session id - but NOT an unbounded global dict!
+# Old/idle sessions are evicted (and spilled to disk, so they can come back).
+sessions = SessionManager(
+    # Each session keeps its prompt under ~3000 tokens; older turns are summarised
+    # stateful=True: turns continue from Ollama's `context`, so only the new
+    # question is tokenised; the HistoryPolicy window takes over if that breaks
+    factory=lambda: AsyncOllamaBot(history_policy=HistoryPolicy(
+        max_tokens=3000, keep_recent=6, summarizer=OllamaSummarizer(model="qwen3:8b")),
+        single_flight=inflight, stateful=True),
+    max_sessions=200,          # LRU limit
+    idle_ttl=30 * 60,          # evict after 30 minutes without activity
+    max_tokens=500_000,        # cap on stored history across all users
+    spill_dir="chat_sessions"  # evicted sessions are saved here as JSON
+)
+
+@contextmanager
+def session_bot(session_id: Optional[str]):
+    """Bot for this session (remembers history), or a fresh one without memory."""
+    if session_id:
+        # Not evicted (and spilled half-way through a turn) while we use it
+        with sessions.use(session_id) as bot:
+            yield bot
+    else:
+        yield AsyncOllamaBot(single_flight=inflight)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close the pooled async connections to Ollama."""
+    await aclose_all()
+
 @app.get("/")
 async def root():
     return {"message": "Hello World - Ollama Basic Chat", "model": "qwen3:8b"}
 
-async def ollama_chat(query: str):
+def parse_thinking(think: Optional[str]):
+    """?think=off / capped / capped:200 / full -> ThinkingPolicy (400 if invalid)."""
     try:
-        bot = OllamaBot()
-        answer = bot.ask_question(query)
-        return {"ai_response": answer, "model": "qwen3:8b"}
+        return ThinkingPolicy.parse(think)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def ollama_chat(query: str, session_id: Optional[str] = None,
+                      tenant: str = "default", priority: int = PRIORITY_DEFAULT,
+                      thinking: Optional[ThinkingPolicy] = None):
+    try:
+        # AsyncOllamaBot awaits the network - other requests keep being served.
+        # The admission slot is taken only if this request starts a generation;
+        # requests joining an identical one wait without using a slot.
+        with session_bot(session_id) as bot:
+            answer = await bot.ask_question(
+                query, thinking=thinking, admit=lambda: admission.async_slot(tenant, priority))
+        return {"ai_response": answer, "model": "qwen3:8b", "session_id": session_id}
+    except AdmissionRejected as e:
+        raise rejected(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/chat/{query}")
-async def chat_get(query: str):
-    return await ollama_chat(query)
+async def chat_get(query: str, request: Request, session_id: Optional[str] = None,
+                   think: Optional[str] = None):
+    """`?think=off` answers without reasoning - much faster for simple questions."""
+    thinking = parse_thinking(think)
+    tenant, priority = admission_args(request, session_id)
+    return await ollama_chat(query, session_id, tenant, priority, thinking)
+
+@app.get("/sessions/stats")
+async def sessions_stats():
+    """How many sessions are in memory, how many were evicted/spilled, ..."""
+    return sessions.get_stats()
+
+@app.get("/admission/stats")
+async def admission_stats():
+    """Running / waiting requests, rejections and the average queue wait."""
+    return admission.get_stats()
+
+@app.get("/inflight/stats")
+async def inflight_stats():
+    """How many requests started a generation vs. joined an identical running one."""
+    return inflight.get_stats()
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    sessions.drop(session_id)
+    return {"deleted": session_id}
+
+def sse_event(data, event=None):
+    """
+    Format one Server-Sent Event.
+
+    SSE is plain text over a long-lived HTTP response:
+        event: done
+        data: {"token": "Hello"}
+        <blank line>
+    """
+    lines = f"event: {event}\n" if event else ""
+    return lines + f"data: {json.dumps(data)}\n\n"
+
+@app.get("/chat/stream/{query}")
+async def chat_stream(query: str, request: Request, session_id: Optional[str] = None,
+                      think: Optional[str] = None):
+    """
+    Stream the answer to the browser token by token (Server-Sent Events).
+
+    Browser usage:
+        const source = new EventSource("/chat/stream/hello?think=capped:200");
+        source.onmessage = (e) => output.textContent += JSON.parse(e.data).token;
+        source.addEventListener("done", () => source.close());
+    """
+    thinking = parse_thinking(think)
+    tenant, priority = admission_args(request, session_id)
+    # The session stays in use until the stream is finished
+    in_use = ExitStack()
+    bot = in_use.enter_context(session_bot(session_id))
+    count = len(bot.messages)
+    tokens = bot.stream_question(query, thinking=thinking,
+                                 admit=lambda: admission.async_slot(tenant, priority))
+
+    # Wait for the first token BEFORE the response starts, so a busy server
+    # can still answer with a proper 429/503 status code
+    try:
+        first = await tokens.__anext__()
+    except StopAsyncIteration:
+        first = None
+    except AdmissionRejected as e:
+        in_use.close()
+        raise rejected(e)
+
+    async def event_stream():
+        try:
+            if first is not None:
+                yield sse_event({"token": first})
+                async for token in tokens:
+                    yield sse_event({"token": token})
+            answer = bot.messages[-1]["content"] if len(bot.messages) > count else ""
+            yield sse_event({"ai_response": answer, "model": bot.model}, event="done")
+        finally:
+            # Client gone: stop the generation (and give its slot back)
+            await tokens.aclose()
+            in_use.close()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def demonstrate_context_reuse():
+    """
+    Stateful mode: /api/generate + `context` instead of re-sending history.
+
+    Watch `prompt_tokens`: with /api/chat every turn re-reads the whole
+    conversation; with the context only the new question is evaluated.
+    """
+    print("\n" + "="*50)
+    print("STATEFUL SESSION (context reuse)")
+    print("="*50)
+
+    bot = OllamaBot(stateful=True)
+    bot.ask_question("My name is Alice and I love Python.")
+    bot.ask_question("What is my name?")
+    bot.ask_question("Which language do I love?")
+    print(f"[INFO] Context stats: {bot.context_session.get_stats()}")
+
+    # Switching the model invalidates the token ids -> transparent /api/chat fallback
+    bot.model = "qwen3:4b"
+    bot.ask_question("Summarise what you know about me.")
+    print(f"[INFO] After model switch: {bot.context_session.get_stats()}")
+
+def demonstrate_thinking_budget():
+    """
+    Same question, three reasoning budgets.
+
+    "off" skips the <think> block entirely, "capped:64" lets qwen3 think a
+    little and aborts the stream if it rambles on. Tokens spent / saved are
+    on /metrics (ollama_thinking_tokens_total, ollama_thinking_tokens_saved).
+    """
+    print("\n" + "="*50)
+    print("THINKING BUDGET (off / capped / full)")
+    print("="*50)
+
+    for thinking in ("full", "capped:64", "off"):
+        bot = OllamaBot()
+        started = time.time()
+        bot.ask_question("What is 17 * 23?", thinking=thinking)
+        print(f"[INFO] think={thinking}: {time.time() - started:.2f}s")
 
 def main():
     """Test the basic chat functionality"""
@@ -201,6 +789,9 @@ def main():
         bot.ask_question("Tell me a short joke")
         
         print("\n[SUCCESS] Predefined tests completed successfully!")
+
+        demonstrate_context_reuse()
+        demonstrate_thinking_budget()
         
         # Interactive questioning
         print("\n" + "="*50)
@@ -224,7 +815,8 @@ def main():
                     print("[INFO] Please enter a question or 'quit' to exit")
                     continue
                 
-                result = bot.ask_question(user_question)
+                # stream=True: tokens are printed as soon as they arrive
+                result = bot.ask_question(user_question, stream=True)
                 # Result is already printed in the ask_question method
                 
             except KeyboardInterrupt:
@@ -249,4 +841,8 @@ if __name__ == "__main__":
 
 # Example URLs:
 # http://127.0.0.1:8002/chat/tallest%20man%20in%20the%20world
-# http://127.0.0.1:8002/chat/weather%20in%20istanbul
\ No newline at end of file
+# http://127.0.0.1:8002/chat/weather%20in%20istanbul
+# http://127.0.0.1:8002/chat/stream/tell%20me%20a%20joke   (Server-Sent Events)
+#   curl -N http://127.0.0.1:8002/chat/stream/tell%20me%20a%20joke
+# http://127.0.0.1:8002/chat/my%20name%20is%20Alice?session_id=alice   (with memory)
+# http://127.0.0.1:8002/chat/what%20is%20my%20name?session_id=alice
\ No newline at end of file
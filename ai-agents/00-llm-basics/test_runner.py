@@ -3,9 +3,13 @@
 Quick test script for 00-llm-basics examples
 Tests all functionality without interactive mode
 """
+import os
 import sys
 sys.path.insert(0, '.')
 
+# Point at common/mock_ollama.py for a fast offline run: OLLAMA_BASE_URL=http://localhost:11435
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+
 # Import and test 01_basic_chat
 print("="*70)
 print("TESTING: 01_basic_chat.py")
@@ -16,7 +20,7 @@ import requests
 
 # Check Ollama first
 try:
-    response = requests.get("http://localhost:11434/api/tags", timeout=5)
+    response = requests.get(f"{OLLAMA_BASE_URL}/api/tags", timeout=5)
     if response.status_code != 200:
         print("[ERROR] Ollama not running correctly")
         exit(1)
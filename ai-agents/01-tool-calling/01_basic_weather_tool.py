@@ -2,17 +2,58 @@
 """
 Tool calling using Ollama's native tool calling API with qwen3:8b model.
 Ollama now supports native function calling similar to OpenAI.
+
+Direct render: "What's the weather in Tokyo?" needs ONE tool call and no
+reasoning about the result. Instead of a second LLM generation that turns
+the JSON into a sentence, a registered formatter renders it instantly. The
+LLM still composes the answer when the question needs it ("Should I bring
+an umbrella?", "Compare Paris and London").
 """
-import requests
 import json
-from fastapi import FastAPI, HTTPException
+import re
+from typing import Optional
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 import uvicorn
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.ollama_client import get_client
+from common.single_flight import SingleFlight
+from common.admission import AdmissionRejected, get_admission_controller, parse_priority
+from common.metrics import REGISTRY, instrument_app
+from common.thinking import ThinkingPolicy
+
+# Questions that need the LLM to think about the tool result, not just report it
+COMPOSITION_PATTERN = re.compile(
+    r"\b(?:should|would|could|compare|comparison|than|better|worse|recommend|advice|"
+    r"why|wear|bring|need|plan|both|and|or|difference|if|whether)\b",
+    re.IGNORECASE,
+)
+
+ANSWER_RENDERS = REGISTRY.counter(
+    "tool_answer_renders_total", "How tool answers were phrased", ("path",))
+
+def needs_composition(question):
+    """True if the answer must be composed by the LLM (comparison, advice, ...)."""
+    return bool(COMPOSITION_PATTERN.search(question)) or question.count("?") > 1
 
 class OllamaToolBot:
-    def __init__(self, model="qwen3:8b", base_url="http://localhost:11434"):
+    def __init__(self, model="qwen3:8b", base_url=None, thinking=None, direct_render=True):
+        """
+        thinking: "off" skips qwen3's <think> block on BOTH calls (tool choice and
+        final answer); "full"/None = model default. This bot does not stream, so
+        "capped" can only be measured here, not enforced.
+        direct_render: Phrase simple single-tool answers with a formatter
+        instead of a second LLM call (see register_formatter)
+        """
         self.model = model
-        self.base_url = base_url
+        self.thinking = ThinkingPolicy.parse(thinking)
+        self.direct_render = direct_render
+        self.client = get_client(base_url)  # shared keep-alive connection pool
+        self.base_url = self.client.base_url  # OLLAMA_BASE_URL unless given
         self.messages = []
         
         # Define tools in Ollama format
@@ -36,8 +77,12 @@ class OllamaToolBot:
             },
         ]
         
+        # Tool name -> formatter(result_json, arguments) -> sentence (or None = ask the LLM)
+        self.formatters = {}
+        self.register_formatter("get_weather", self.format_weather)
+
         print(f"[OK] Initialized Ollama tool bot with model: {model}")
-        print(f"[OK] Ollama base URL: {base_url}")
+        print(f"[OK] Ollama base URL: {self.base_url}")
         print(f"[OK] Tools available: get_current_weather")
 
     def get_current_weather(self, city, unit="celsius"):
@@ -76,6 +121,31 @@ class OllamaToolBot:
                 "humidity": "unknown"
             })
 
+    def register_formatter(self, tool_name, formatter):
+        """Answer single calls of `tool_name` with formatter(result, arguments), no LLM."""
+        self.formatters[tool_name] = formatter
+
+    def format_weather(self, result, arguments):
+        """get_current_weather JSON -> one sentence (None for unknown cities)."""
+        data = json.loads(result)
+        if data.get("temperature") == "unknown":
+            return None  # let the LLM explain that there is no data
+        return (f"It is currently {data['temperature']} and {data['condition']} in "
+                f"{data['city']} (humidity: {data['humidity']}).")
+
+    def render_directly(self, question, tool_calls, results):
+        """The formatted answer if no second LLM call is needed, else None."""
+        if not self.direct_render or len(tool_calls) != 1 or len(results) != 1:
+            return None
+        function_data = tool_calls[0].get("function", {})
+        formatter = self.formatters.get(function_data.get("name"))
+        if formatter is None or needs_composition(question):
+            return None
+        try:
+            return formatter(results[0], function_data.get("arguments", {}))
+        except (ValueError, KeyError, TypeError):
+            return None  # unexpected result shape - the LLM can still cope
+
     def ask_question(self, question):
         """Send a question to Ollama with native tool calling"""
         try:
@@ -97,7 +167,7 @@ class OllamaToolBot:
             }
             
             print(f"[ASK] Question: {question}")
-            response = requests.post(url, json=payload, timeout=60)
+            response = self._post_chat(url, payload)
             
             if response.status_code == 200:
                 response_data = response.json()
@@ -111,6 +181,7 @@ class OllamaToolBot:
                 
                 if tool_calls:
                     print(f"[TOOL] AI wants to call tools!")
+                    results = []
                     
                     for tool_call in tool_calls:
                         # Handle Ollama's tool call format
@@ -127,6 +198,7 @@ class OllamaToolBot:
                             unit = arguments.get("unit", "celsius")
                             result = self.get_current_weather(city, unit)
                             print(f"[TOOL] Result: {result}")
+                            results.append(result)
                             
                             # Add tool result to conversation
                             self.messages.append({
@@ -134,7 +206,16 @@ class OllamaToolBot:
                                 "content": result
                             })
                     
+                    # Simple lookup? Phrase it ourselves - no second LLM generation
+                    direct = self.render_directly(question, tool_calls, results)
+                    if direct is not None:
+                        ANSWER_RENDERS.inc(path="direct")
+                        self.messages.append({"role": "assistant", "content": direct})
+                        print(f"[FAST] Final response (no second LLM call): {direct}")
+                        return direct
+                    
                     # Get final response with tool results
+                    ANSWER_RENDERS.inc(path="llm")
                     return self.get_final_response()
                 else:
                     # Direct response without tool use
@@ -172,7 +253,7 @@ class OllamaToolBot:
                 }
             }
             
-            response = requests.post(url, json=payload, timeout=60)
+            response = self._post_chat(url, payload)
             
             if response.status_code == 200:
                 response_data = response.json()
@@ -192,6 +273,15 @@ class OllamaToolBot:
         except Exception as e:
             return f"Error in final response: {str(e)}"
 
+    def _post_chat(self, url, payload):
+        """POST with the thinking policy applied; records the thinking tokens used."""
+        if self.thinking is None:
+            return self.client.post(url, json=payload, timeout=60)
+        response = self.client.post(url, json=self.thinking.apply(payload), timeout=60)
+        if response.status_code == 200:
+            self.thinking.budget(self.model).finish(response.json())
+        return response
+
     def clean_response(self, response):
         """Remove thinking tags and content from response"""
         import re
@@ -210,28 +300,68 @@ class OllamaToolBot:
 # FastAPI app
 app = FastAPI()
 
+# GET /metrics for Prometheus: Ollama load/prompt/decode times, tokens/s, TTFT
+instrument_app(app)
+
+# Identical questions that arrive while one is being answered share that answer
+inflight = SingleFlight()
+
+# Bounded, per-client fair queue in front of Ollama (429/503 instead of 60s timeouts)
+admission = get_admission_controller()
+
+def answer_query(query: str, thinking: Optional[str] = None):
+    """Fresh bot per request (no memory), so the answer depends only on the query."""
+    return OllamaToolBot(thinking=thinking).ask_question(query)
+
 class Query(BaseModel):
     query: str
+    think: Optional[str] = None  # "off" = no reasoning before picking the tool
 
 @app.get("/")
 async def root():
     return {"message": "Hello World - Ollama Native Tool Calling", "model": "qwen3:8b", "tools": ["get_current_weather"]}
 
-async def ollama_tool_chat(query: str):
+async def ollama_tool_chat(query: str, request: Request, think: Optional[str] = None):
+    tenant = request.client.host if request.client else "anonymous"
+    priority = parse_priority(request.headers.get("X-Priority"))
     try:
-        bot = OllamaToolBot()
-        answer = bot.ask_question(query)
+        ThinkingPolicy.parse(think)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    async def admitted():
+        # Only the request that starts the work waits for an Ollama slot;
+        # the ones joining it below do not hold a slot while they wait
+        async with admission.async_slot(tenant, priority):
+            # The bot is blocking (requests), so run it in a worker thread
+            return await run_in_threadpool(answer_query, query, think)
+
+    try:
+        # Concurrent identical queries join the one that is already running
+        answer = await inflight.do(("chat", query.strip(), think), admitted)
         return {"ai_response": answer, "model": "qwen3:8b", "tools_available": ["get_current_weather"]}
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e),
+                            headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/chat/{query}")
-async def chat_get(query: str):
-    return await ollama_tool_chat(query)
+async def chat_get(query: str, request: Request, think: Optional[str] = None):
+    return await ollama_tool_chat(query, request, think)
 
 @app.post("/chat")
-async def chat_post(query: Query):
-    return await ollama_tool_chat(query.query)
+async def chat_post(query: Query, request: Request):
+    return await ollama_tool_chat(query.query, request, query.think)
+
+@app.get("/admission/stats")
+async def admission_stats():
+    """Running / waiting requests, rejections and the average queue wait."""
+    return admission.get_stats()
+
+@app.get("/inflight/stats")
+async def inflight_stats():
+    """How many requests started a generation vs. joined an identical running one."""
+    return inflight.get_stats()
 
 def main():
     """Test native tool calling functionality"""
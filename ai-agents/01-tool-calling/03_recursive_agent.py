@@ -9,23 +9,52 @@ The recursive agent can:
 - Call multiple tools in sequence
 - Use output from one tool as input to another
 - Solve complex multi-step tasks autonomously
+- Run several tool calls from one message at the same time (parallel tools)
+- Offer the model only the tools that matter for the current step
+- Notice when it goes in circles (same call again) and make it answer
+- Report each step as an event and stream the answer token by token
+- Optionally start read-only tools while the model is still writing its calls
+- Trim tool results to what the model needs before they enter the conversation
 
 This is what people mean when they say "agentic behavior"!
 
 Author: Beyhan MEYRALI
 """
 
+import os
+import time
 import requests
 import json
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.ollama_client import get_client
+from common.parallel_tools import execute_tool_calls, parse_tool_call
+from common.tool_cache import ToolCache
+from common.tool_selector import ToolSelector, selection_query
+from common.loop_guard import LoopGuard
+from common.think_filter import ThinkFilter
+from common.speculative_tools import SpeculativeTools
+from common.tool_compactor import ToolResultCompactor
+from common.tokens import count_tokens
 
 # =============================================================================
 # CONFIGURATION
 # =============================================================================
 
-OLLAMA_BASE_URL = "http://localhost:11434"
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
 MODEL_NAME = "qwen3:8b"  # Best tool-calling model for local agents (2025)
 
+# Tool calls from ONE message run concurrently; each gets a time limit
+TOOL_TIMEOUT_SECONDS = 10.0
+TOOL_TIMEOUTS = {"search_web": 20.0}  # per-tool overrides
+
+# The mock tools answer instantly. Set e.g. MOCK_TOOL_LATENCY=0.5 to simulate
+# real network calls and see what parallel execution saves.
+MOCK_TOOL_LATENCY = float(os.getenv("MOCK_TOOL_LATENCY", "0"))
+
 # =============================================================================
 # MOCK TOOLS (Simulated Functions)
 # =============================================================================
@@ -33,11 +62,17 @@ MODEL_NAME = "qwen3:8b"  # Best tool-calling model for local agents (2025)
 # These are the "real" functions your agent can call.
 # In production, these would call actual APIs, databases, etc.
 
+def _simulate_latency():
+    """Pretend to wait for a remote API (see MOCK_TOOL_LATENCY)."""
+    if MOCK_TOOL_LATENCY > 0:
+        time.sleep(MOCK_TOOL_LATENCY)
+
 def get_current_weather(city: str) -> str:
     """
     Mock weather API.
     In production, this would call a real weather service.
     """
+    _simulate_latency()
     weather_db = {
         "tokyo": {"temp": 25, "condition": "sunny", "humidity": "low"},
         "paris": {"temp": 18, "condition": "cloudy", "humidity": "moderate"},
@@ -64,6 +99,7 @@ def get_my_manager() -> str:
     Get current user's manager information.
     In production, this would query HR system/database.
     """
+    _simulate_latency()
     return json.dumps({
         "manager_name": "Alice Johnson",
         "manager_email": "alice.johnson@company.com",
@@ -77,6 +113,7 @@ def get_team_members(manager_name: str) -> str:
     Get team members for a given manager.
     In production, this would query HR/org chart database.
     """
+    _simulate_latency()
     teams = {
         "Alice Johnson": [
             {"name": "Bob Smith", "role": "Senior Engineer", "city": "London"},
@@ -100,6 +137,7 @@ def search_web(query: str) -> str:
     Mock web search.
     In production, this would call a real search API (Google, Bing, etc.)
     """
+    _simulate_latency()
     # Simulated search results
     results = {
         "python programming": "Python is a high-level, interpreted programming language known for its simplicity and readability.",
@@ -196,6 +234,44 @@ AVAILABLE_FUNCTIONS = {
     "search_web": search_web
 }
 
+# How long each tool's result may be re-used (seconds). Tools that are not
+# listed - or set to None - are NEVER cached: anything with a side effect
+# (sending mail, booking, writing to a database) must stay out of here.
+TOOL_CACHE_TTLS = {
+    "get_current_weather": 10 * 60,   # weather changes slowly
+    "get_my_manager": 60 * 60,        # org chart data
+    "get_team_members": 60 * 60,
+    "search_web": 30 * 60,
+}
+
+# Same tool + same arguments -> re-use the result (memory LRU; set
+# TOOL_CACHE_PATH=tool_cache.sqlite to keep results across runs)
+TOOL_CACHE = ToolCache(TOOL_CACHE_TTLS, path=os.getenv("TOOL_CACHE_PATH"))
+
+
+def is_read_only(name: str) -> bool:
+    """Cacheable tools have no side effects, so they may also run early."""
+    return TOOL_CACHE_TTLS.get(name) is not None
+
+
+# Every schema in TOOLS costs prompt tokens on EVERY iteration. With a big
+# catalogue, embed the tool descriptions once and send only the top-k for the
+# question (needs an embedding model: ollama pull qwen3-embedding:0.6b).
+# Catalogues of up to top_k + 1 tools (like these 4) are sent whole - the
+# embedding call would cost more than one schema saves.
+TOOL_SELECTOR = ToolSelector(TOOLS, top_k=3, cache_path=os.getenv("TOOL_VECTORS_PATH"))
+
+# Every tool result is re-sent on EVERY later iteration. Per tool: keep only
+# the fields the model needs, cut long lists, cap the size in tokens and keep
+# the full result aside (by handle). Tools not listed get the default cap.
+TOOL_OUTPUT_POLICIES = {
+    # No e-mail tool here, so the address is dead weight
+    "get_my_manager": {"fields": ["manager_name", "manager_city", "manager_department"]},
+    "get_team_members": {"max_items": 10, "max_tokens": 400},
+    "search_web": {"fields": ["query", "result"], "max_tokens": 200, "offload": True},
+}
+TOOL_COMPACTOR = ToolResultCompactor(TOOL_OUTPUT_POLICIES, default_max_tokens=1000)
+
 
 # =============================================================================
 # TOOL EXECUTION
@@ -227,6 +303,13 @@ def execute_tool(function_name: str, arguments: Dict[str, Any]) -> str:
         print(f"  [ERROR] {error_result}")
         return error_result
 
+    # Asked before (this run or, with TOOL_CACHE_PATH, an earlier one)?
+    if TOOL_CACHE is not None:
+        cached = TOOL_CACHE.get(function_name, arguments)
+        if cached is not None:
+            print(f"  [CACHE] {cached}")
+            return cached
+
     try:
         # Get the actual Python function
         function = AVAILABLE_FUNCTIONS[function_name]
@@ -235,6 +318,8 @@ def execute_tool(function_name: str, arguments: Dict[str, Any]) -> str:
         result = function(**arguments)
 
         print(f"  [RESULT] {result}")
+        if TOOL_CACHE is not None:
+            TOOL_CACHE.set(function_name, arguments, result)
         return result
 
     except Exception as e:
@@ -248,11 +333,75 @@ def execute_tool(function_name: str, arguments: Dict[str, Any]) -> str:
 # THE RECURSIVE AGENT LOOP
 # =============================================================================
 
-def recursive_agent(user_message: str, max_iterations: int = 10, verbose: bool = True) -> str:
+# agent_events() reports what the agent does as it happens, one dict per event
+# ("type" says which). A chat UI can show tool activity and stream the answer
+# token by token instead of staring at a spinner for the whole run:
+#
+#   {"type": "iteration",   "iteration": 1, "tools": ["get_my_manager", ...]}
+#   {"type": "tool_call",   "iteration": 1, "name": "get_my_manager", "arguments": {}}
+#   {"type": "tool_result", "iteration": 1, "name": "get_my_manager",
+#                           "content": "{...}", "seconds": 0.01, "reused": False,
+#                           "tokens_saved": 12}         (content = what the model sees)
+#   {"type": "notice",      "iteration": 1,
+#                           "kind": "parallel" | "loop" | "tools_fallback" | "speculative",
+#                           "message": "..."}
+#   {"type": "token",       "iteration": 2, "text": "The weather in"}
+#   {"type": "done",        "answer": "...", "iterations": 2,
+#                           "status": "answered" | "stopped" | "max_iterations" | "error"}
+#
+# Every LLM call is streamed - we only know it was the FINAL answer when it
+# ends without tool calls. Token events of an iteration that then calls tools
+# (or gets a "tools_fallback" notice and is asked again) were not the answer;
+# a UI should clear them. "done" always comes last, exactly once.
+
+EVENT_TYPES = ("iteration", "tool_call", "tool_result", "notice", "token", "done")
+
+
+def _stream_llm(messages: List[Dict[str, Any]], tools: List[Dict[str, Any]], iteration: int,
+                speculation: Optional[SpeculativeTools] = None):
     """
-    The recursive agent loop - THIS IS THE KEY PATTERN!
+    Stream one LLM call: yields token events, RETURNS the assembled message.
 
-    This function:
+    Use with `message = yield from _stream_llm(...)`. With `speculation`,
+    every tool call is handed over the moment its chunk arrives.
+    """
+    payload = {"model": MODEL_NAME, "messages": messages}
+    if tools:
+        payload["tools"] = tools
+
+    content, tool_calls = [], []
+    think_filter = ThinkFilter()  # qwen3 may put <think>...</think> in the content
+    for chunk in get_client(OLLAMA_BASE_URL).stream("/api/chat", payload, timeout=60):
+        delta = chunk.get("message", {})
+        for tool_call in delta.get("tool_calls") or []:
+            tool_calls.append(tool_call)
+            if speculation is not None and speculation.start(tool_call):
+                yield {"type": "notice", "iteration": iteration, "kind": "speculative",
+                       "message": f"Started {parse_tool_call(tool_call)[0]} while the model "
+                                  "is still writing"}
+        text = delta.get("content") or ""
+        if text:
+            content.append(text)
+            visible = think_filter.feed(text)
+            if visible:
+                yield {"type": "token", "iteration": iteration, "text": visible}
+    visible = think_filter.flush()
+    if visible:
+        yield {"type": "token", "iteration": iteration, "text": visible}
+
+    message = {"role": "assistant", "content": "".join(content)}
+    if tool_calls:
+        message["tool_calls"] = tool_calls
+    return message
+
+
+def agent_events(user_message: str, max_iterations: int = 10,
+                 parallel_tools: bool = True,
+                 speculative_tools: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    The recursive agent loop as a stream of events - THIS IS THE KEY PATTERN!
+
+    This generator:
     1. Sends user message to LLM with available tools
     2. If LLM wants to use tools, executes them
     3. Sends tool results back to LLM
@@ -263,101 +412,229 @@ def recursive_agent(user_message: str, max_iterations: int = 10, verbose: bool =
     Args:
         user_message: The user's question/request
         max_iterations: Maximum number of LLM calls (prevents infinite loops)
-        verbose: Print detailed execution logs
+        parallel_tools: Run the tool calls of one message concurrently
+        speculative_tools: Start read-only (cacheable) tools as soon as the
+            streamed reply contains their call, before the message is complete
 
-    Returns:
-        Final answer from the agent
+    Yields:
+        Event dicts (see EVENT_TYPES above); the last one is always "done"
     """
 
-    if verbose:
-        print("\n" + "="*70)
-        print("RECURSIVE AGENT EXECUTION")
-        print("="*70)
-        print(f"[USER] {user_message}")
-        print("-"*70)
-
     # Initialize conversation with user message
     messages = [
         {"role": "user", "content": user_message}
     ]
 
-    url = f"{OLLAMA_BASE_URL}/api/chat"
+    # One selection per run (one query embedding), not one per iteration;
+    # needs_full_set() below widens it if a needed tool is missing
+    full_catalogue = TOOL_SELECTOR is None
+    offered = TOOLS if full_catalogue else TOOL_SELECTOR.select(selection_query(messages))
+
+    # Same tool + same arguments again? Re-use the result, nudge the model,
+    # and force an answer when iterations stop producing new information
+    guard = LoopGuard(agent="recursive_agent")
+
+    # Opt-in: overlap tool I/O with the time the model spends writing the
+    # remaining calls. Only read-only tools (the cacheable ones) run early
+    speculation = None
+    if speculative_tools:
+        speculation = SpeculativeTools(execute_tool, is_safe=is_read_only)
+
+    def done(answer: str, iterations: int, status: str) -> Dict[str, Any]:
+        event = {"type": "done", "answer": answer, "iterations": iterations,
+                 "status": status, "loop_guard": guard.get_stats()}
+        if speculation is not None:
+            speculation.finish()
+            event["speculation"] = speculation.get_stats()
+        return event
 
     # THE AGENT LOOP
-    for iteration in range(max_iterations):
-        if verbose:
-            print(f"\n[ITERATION {iteration + 1}]")
-
-        # Prepare request payload
-        payload = {
-            "model": MODEL_NAME,
-            "messages": messages,
-            "tools": TOOLS,
-            "stream": False
-        }
+    for iteration in range(1, max_iterations + 1):
+        # Only the tools relevant to this question
+        if guard.force_answer:
+            tools = []  # no tools = the model has to answer now
+        elif full_catalogue:
+            tools = TOOLS
+        else:
+            tools = offered
+        yield {"type": "iteration", "iteration": iteration,
+               "tools": [tool["function"]["name"] for tool in tools]}
 
         try:
-            # Call LLM
-            if verbose:
-                print("  [LLM] Thinking...")
-
-            response = requests.post(url, json=payload, timeout=60)
-
-            if response.status_code != 200:
-                return f"Error: LLM API returned {response.status_code}"
-
-            response_data = response.json()
-            message = response_data.get("message", {})
-
-            # Add LLM's response to conversation
-            messages.append(message)
-
-            # Check if LLM wants to use tools
-            tool_calls = message.get("tool_calls", [])
+            # Call LLM (streamed - tokens reach the caller as they arrive)
+            message = yield from _stream_llm(messages, tools, iteration, speculation)
+
+            # Wanted a tool we did not offer? Ask again with the full catalogue
+            if tools and not full_catalogue and TOOL_SELECTOR.needs_full_set(message, tools):
+                yield {"type": "notice", "iteration": iteration, "kind": "tools_fallback",
+                       "message": "A needed tool was not offered - retrying with all tools"}
+                full_catalogue = True
+                message = yield from _stream_llm(messages, TOOLS, iteration, speculation)
+
+        except requests.exceptions.HTTPError as e:
+            status = e.response.status_code if e.response is not None else "?"
+            yield done(f"Error: LLM API returned {status}", iteration, "error")
+            return
+        except requests.exceptions.RequestException as e:
+            yield done(f"Error: Connection to LLM failed: {str(e)}", iteration, "error")
+            return
+
+        # Add LLM's response to conversation
+        messages.append(message)
+
+        # Check if LLM wants to use tools
+        tool_calls = message.get("tool_calls", [])
+
+        if tool_calls and guard.force_answer:
+            # Still asking for tools although none were offered - give up
+            answer = message.get("content") or "Stopped: the agent kept repeating the same tool calls"
+            yield done(answer, iteration, "stopped")
+            return
+
+        if not tool_calls:
+            # No tool calls - LLM has reached final answer
+            yield done(message.get("content", ""), iteration, "answered")
+            return
+
+        # LLM wants to use one or more tools
+        for name, arguments in map(parse_tool_call, tool_calls):
+            yield {"type": "tool_call", "iteration": iteration,
+                   "name": name, "arguments": arguments}
+
+        # Execute the tools the LLM requested - independent calls run
+        # at the same time, so we wait for the slowest, not the sum
+        started = time.perf_counter()
+        executed = []
+
+        def execute_calls(calls):
+            # Calls started early just wait for their result here
+            execute = speculation.execute if speculation is not None else execute_tool
+            results = execute_tool_calls(calls, execute,
+                                         timeout=TOOL_TIMEOUT_SECONDS,
+                                         timeouts=TOOL_TIMEOUTS,
+                                         parallel=parallel_tools)
+            executed.extend(results)
+            return [result["content"] for result in results]
+
+        # Only calls we have not seen in this run are executed
+        contents = guard.run(tool_calls, execute_calls)
+        if speculation is not None:
+            discarded = speculation.finish()  # started, but not in the final message
+            if discarded:
+                yield {"type": "notice", "iteration": iteration, "kind": "speculative",
+                       "message": f"Discarded {discarded} early result(s) the model did not ask for"}
+        if len(executed) > 1:
+            elapsed = time.perf_counter() - started
+            sequential = sum(r["seconds"] for r in executed)
+            yield {"type": "notice", "iteration": iteration, "kind": "parallel",
+                   "message": f"{len(executed)} tools in {elapsed:.2f}s "
+                              f"(one by one: ~{sequential:.2f}s)"}
+
+        # Add tool results to conversation IN CALL ORDER (deterministic
+        # transcript). The LLM will see them in the next iteration
+        seconds = {LoopGuard.fingerprint(r["name"], r["arguments"]): r["seconds"] for r in executed}
+        for (name, arguments), result in zip(map(parse_tool_call, tool_calls), contents):
+            key = LoopGuard.fingerprint(name, arguments)
+            # Compact once here - the conversation keeps only the short form
+            content = TOOL_COMPACTOR.compact(name, result) if TOOL_COMPACTOR is not None else result
+            yield {"type": "tool_result", "iteration": iteration, "name": name,
+                   "content": content, "seconds": seconds.get(key, 0.0),
+                   "reused": key not in seconds,
+                   "tokens_saved": count_tokens(result) - count_tokens(content)}
+            messages.append({
+                "role": "tool",
+                "content": content
+            })
+
+        # Going in circles? Tell the model (and stop offering tools)
+        nudge = guard.nudge()
+        if nudge:
+            messages.append(nudge)
+            yield {"type": "notice", "iteration": iteration, "kind": "loop",
+                   "message": "No new information - "
+                              + ("forcing a final answer" if guard.force_answer
+                                 else "asking the model to use what it has")}
+
+        # Continue loop - LLM will process tool results
 
-            if tool_calls:
-                # LLM wants to use one or more tools
-                if verbose:
-                    print(f"  [LLM] Wants to use {len(tool_calls)} tool(s)")
+    # Max iterations reached without final answer
+    yield done("Task too complex - exceeded maximum iterations", max_iterations, "max_iterations")
 
-                # Execute each tool the LLM requested
-                for tool_call in tool_calls:
-                    function_data = tool_call.get("function", {})
-                    function_name = function_data.get("name")
-                    arguments = function_data.get("arguments", {})
 
-                    # Execute the tool
-                    result = execute_tool(function_name, arguments)
+def recursive_agent(user_message: str, max_iterations: int = 10, verbose: bool = True,
+                    parallel_tools: bool = True, stream: bool = False,
+                    speculative_tools: bool = False) -> str:
+    """
+    Run the agent loop and return the final answer.
 
-                    # Add tool result to conversation
-                    # The LLM will see this result in the next iteration
-                    messages.append({
-                        "role": "tool",
-                        "content": result
-                    })
+    A thin wrapper around agent_events(): it prints the events (verbose)
+    and returns the answer of the "done" event.
 
-                # Continue loop - LLM will process tool results
+    Args:
+        user_message: The user's question/request
+        max_iterations: Maximum number of LLM calls (prevents infinite loops)
+        verbose: Print detailed execution logs
+        parallel_tools: Run the tool calls of one message concurrently
+        stream: Print the answer token by token as it is generated
+        speculative_tools: Start read-only tools before the LLM's message is complete
 
-            else:
-                # No tool calls - LLM has reached final answer
-                final_answer = message.get("content", "")
+    Returns:
+        Final answer from the agent
+    """
 
-                if verbose:
-                    print(f"\n[FINAL ANSWER after {iteration + 1} iteration(s)]")
-                    print("-"*70)
-                    print(final_answer)
-                    print("="*70)
+    if verbose:
+        print("\n" + "="*70)
+        print("RECURSIVE AGENT EXECUTION")
+        print("="*70)
+        print(f"[USER] {user_message}")
+        print("-"*70)
 
-                return final_answer
+    streamed = False  # tokens of the current iteration already on screen
+    for event in agent_events(user_message, max_iterations, parallel_tools, speculative_tools):
+        kind = event["type"]
 
-        except requests.exceptions.RequestException as e:
-            return f"Error: Connection to LLM failed: {str(e)}"
+        if kind == "token":
+            if stream:
+                if not streamed:
+                    print("  [STREAM] ", end="")
+                    streamed = True
+                print(event["text"], end="", flush=True)
+            continue
+        if streamed:
+            print()
+            streamed = False
 
-    # Max iterations reached without final answer
-    if verbose:
-        print(f"\n[WARNING] Max iterations ({max_iterations}) reached!")
+        if not verbose:
+            if kind == "done":
+                return event["answer"]
+            continue
 
-    return "Task too complex - exceeded maximum iterations"
+        if kind == "iteration":
+            print(f"\n[ITERATION {event['iteration']}]")
+            offered = event["tools"]
+            if offered and len(offered) < len(TOOLS):
+                print(f"  [TOOLS] Offering {len(offered)}/{len(TOOLS)}: {', '.join(offered)}")
+            print("  [LLM] Thinking...")
+        elif kind == "tool_call":
+            print(f"  [LLM] Wants to use {event['name']}({event['arguments']})")
+        elif kind == "tool_result" and event["tokens_saved"] > 0:
+            print(f"  [COMPACT] {event['name']}: {event['tokens_saved']} tokens trimmed "
+                  f"-> {event['content']}")
+        elif kind == "notice":
+            label = {"parallel": "PARALLEL", "loop": "LOOP",
+                     "speculative": "SPECULATIVE"}.get(event["kind"], "TOOLS")
+            print(f"  [{label}] {event['message']}")
+        elif kind == "done":
+            if event["status"] == "answered":
+                print(f"\n[FINAL ANSWER after {event['iterations']} iteration(s)]")
+                print("-"*70)
+                if not stream:  # already on screen
+                    print(event["answer"])
+                print("="*70)
+            elif event["status"] == "max_iterations":
+                print(f"\n[WARNING] Max iterations ({max_iterations}) reached! "
+                      f"Loop guard: {event['loop_guard']}")
+            return event["answer"]
 
 
 # =============================================================================
@@ -412,6 +689,12 @@ def run_demonstrations():
     recursive_agent("What is 2+2?")
     # LLM can answer directly without calling any tools
 
+    # Examples 2 and 3 both looked up the manager - the second time it came
+    # from the tool cache instead of the (pretend) HR system
+    print(f"\n[INFO] Tool cache: {json.dumps(TOOL_CACHE.get_stats(), indent=2)}")
+    print(f"[INFO] Tool selection: {json.dumps(TOOL_SELECTOR.get_stats(), indent=2)}")
+    print(f"[INFO] Tool output compaction: {json.dumps(TOOL_COMPACTOR.get_stats(), indent=2)}")
+
 
 # =============================================================================
 # INTERACTIVE MODE
@@ -449,8 +732,8 @@ def interactive_mode():
         if not user_input:
             continue
 
-        # Run the recursive agent
-        recursive_agent(user_input, verbose=True)
+        # Run the recursive agent (the answer appears as it is generated)
+        recursive_agent(user_input, verbose=True, stream=True)
 
 
 # =============================================================================
@@ -464,7 +747,7 @@ def main():
 
     # Check Ollama connection
     try:
-        response = requests.get(f"{OLLAMA_BASE_URL}/api/tags", timeout=5)
+        response = get_client(OLLAMA_BASE_URL).get("/api/tags", timeout=5)
         if response.status_code != 200:
             print("[ERROR] Ollama is not responding correctly")
             exit(1)
@@ -3,17 +3,21 @@
 Quick test script for 01-tool-calling examples
 Tests without interactive mode
 """
+import os
 import sys
 import requests
 from importlib import import_module
 
+# Point at common/mock_ollama.py for a fast offline run: OLLAMA_BASE_URL=http://localhost:11435
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+
 # Check Ollama first
 print("="*70)
 print("TESTING: 01-tool-calling scripts")
 print("="*70)
 
 try:
-    response = requests.get("http://localhost:11434/api/tags", timeout=5)
+    response = requests.get(f"{OLLAMA_BASE_URL}/api/tags", timeout=5)
     if response.status_code != 200:
         print("[ERROR] Ollama not running correctly")
         exit(1)
@@ -60,6 +64,15 @@ print("\n[TEST] Multi-step query (2 tools)...")
 result = recursive.recursive_agent("What's the weather in my manager's city?", verbose=False)
 print(f"✅ Got answer (length: {len(result)} chars)")
 
+print("\n[TEST] Multi-hop query reaches the second tool...")
+question = "Where does my manager live, and what's the weather there?"
+tools_called = [event["name"] for event in recursive.agent_events(question)
+                if event["type"] == "tool_call"]
+if "get_current_weather" not in tools_called:
+    print(f"[ERROR] Stopped after {tools_called} - the manager's city was not used")
+    exit(1)
+print(f"✅ Tools called: {' -> '.join(tools_called)}")
+
 print("\n" + "="*70)
 print("✅ PASSED - 03_recursive_agent.py")
 print("="*70)
@@ -19,7 +19,7 @@ def main():
     # 1. Setup LLM
     llm = ChatOllama(
         model="qwen3:8b",
-        base_url="http://localhost:11434",
+        base_url=os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"),
         temperature=0.7
     )
 
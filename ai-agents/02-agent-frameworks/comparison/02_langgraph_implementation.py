@@ -1,4 +1,5 @@
 import operator
+import os
 from typing import TypedDict, Annotated
 from langchain_ollama import ChatOllama
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
@@ -26,7 +27,7 @@ def main():
     # 2. Setup LLM
     llm = ChatOllama(
         model="qwen3:8b",
-        base_url="http://localhost:11434",
+        base_url=os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"),
         temperature=0.7
     )
 
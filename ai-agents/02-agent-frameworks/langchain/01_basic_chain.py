@@ -30,11 +30,16 @@ DEBUGGING TIPS:
 Author: Beyhan MEYRALI
 """
 
-from typing import Dict, Any
+import sys
+from pathlib import Path
+from typing import Dict, Any, Optional
 from langchain_ollama import OllamaLLM
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from common.response_cache import ResponseCache
+
 
 class BasicChainAgent:
     """
@@ -49,15 +54,21 @@ class BasicChainAgent:
         chain: The LLMChain that ties everything together
     """
 
-    def __init__(self, model: str = "qwen3:8b", temperature: float = 0.7):
+    def __init__(self, model: str = "qwen3:8b", temperature: float = 0.7,
+                 cache: Optional[ResponseCache] = None):
         """
         Initialize the basic chain agent.
 
         Args:
             model: Ollama model name
             temperature: LLM temperature (0.0 = deterministic, 1.0 = creative)
+            cache: Optional ResponseCache for repeated questions
+                   (only used when the temperature is low enough)
         """
         print(f"\n[INIT] Creating BasicChainAgent with {model}...")
+        self.model = model
+        self.temperature = temperature
+        self.cache = cache
 
         # Step 1: Create LLM instance
         self.llm = self._create_llm(model, temperature)
@@ -147,10 +158,26 @@ Please provide a clear and concise answer."""
         """
         print(f"\n[ASKING] {question}")
 
+        # Cache lookup: key on the exact prompt the LLM would see
+        cache_key = None
+        options = {"temperature": self.temperature}
+        if self.cache is not None and self.cache.is_cacheable(options):
+            formatted_prompt = self.prompt_template.format(question=question)
+            cache_key = self.cache.make_key(
+                self.model, [{"role": "user", "content": formatted_prompt}], options
+            )
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                print(f"[CACHE HIT] {cached[:100]}...")
+                return cached
+
         try:
             # Run the chain using LCEL invoke
             response = self.chain.invoke({"question": question})
 
+            if cache_key is not None:
+                self.cache.set(cache_key, response)
+
             print(f"[ANSWER] {response[:100]}...")
             return response
 
@@ -193,7 +220,7 @@ Please provide a clear and concise answer."""
             "question": question,
             "formatted_prompt": formatted_prompt,
             "answer": response,
-            "model": "qwen3:8b",
+            "model": self.model,
         }
 
 
@@ -252,6 +279,28 @@ def demo_different_temperatures():
     print("\n💡 Notice how temperature affects creativity!")
 
 
+def demo_response_cache():
+    """Show how a response cache answers repeated questions instantly."""
+    print("\n" + "="*70)
+    print("DEMO 4: Response Cache (Repeated Questions)")
+    print("="*70)
+
+    import time
+
+    # Low temperature = (almost) deterministic = safe to cache
+    cache = ResponseCache(path="chain_cache.sqlite", ttl=24 * 3600)
+    agent = BasicChainAgent(temperature=0.0, cache=cache)
+
+    for attempt in range(1, 3):
+        start = time.perf_counter()
+        agent.ask("What is the capital of France?")
+        print(f"  Attempt {attempt}: {time.perf_counter() - start:.4f}s")
+
+    stats = cache.get_stats()
+    print(f"\n[CACHE] hits={stats['hits']} misses={stats['misses']} hit_rate={stats['hit_rate']}")
+    print("💡 The second answer came from the cache - no LLM call at all!")
+
+
 def main():
     """Main entry point."""
     print("""
@@ -270,6 +319,7 @@ def main():
     demo_basic_usage()
     demo_detailed_usage()
     demo_different_temperatures()
+    demo_response_cache()
 
     # Summary
     print("\n" + "="*70)
@@ -281,6 +331,7 @@ def main():
     print("  3. How to chain them with LLMChain")
     print("  4. How to run the chain")
     print("  5. How temperature affects responses")
+    print("  6. How a response cache skips repeated LLM calls")
     print("\n📖 Key Concepts:")
     print("  • LLM = The language model")
     print("  • Prompt = What you send to the LLM")
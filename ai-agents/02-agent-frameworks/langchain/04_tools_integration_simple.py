@@ -21,6 +21,12 @@ import json
 import requests
 from typing import Dict, Any, List
 from datetime import datetime
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from common.ollama_client import get_client
+from common.loop_guard import LoopGuard
 
 
 # =============================================================================
@@ -171,7 +177,8 @@ class SimpleToolAgent:
         """Initialize the agent."""
         print(f"\n[INIT] Creating SimpleToolAgent with {model}...")
         self.model = model
-        self.base_url = "http://localhost:11434"
+        self.client = get_client()  # shared keep-alive pool (OLLAMA_BASE_URL)
+        self.base_url = self.client.base_url
         print("[INIT] ✅ Agent ready!")
 
     def _call_ollama(self, messages: List[dict], tools: List[dict] = None) -> dict:
@@ -185,7 +192,7 @@ class SimpleToolAgent:
         if tools:
             payload["tools"] = tools
 
-        response = requests.post(
+        response = self.client.post(
             f"{self.base_url}/api/chat",
             json=payload,
             timeout=60
@@ -235,11 +242,16 @@ class SimpleToolAgent:
 
         messages = [{"role": "user", "content": question}]
 
+        # Repeated calls (same tool, same arguments) are answered from memory;
+        # when nothing new comes out, the model must answer without tools
+        guard = LoopGuard(agent="simple_tool_agent")
+
         for iteration in range(max_iterations):
             print(f"\n[ITERATION {iteration + 1}]")
 
-            # Call LLM with tools
-            response = self._call_ollama(messages, TOOLS_SCHEMA)
+            # Call LLM with tools (none once the guard forces an answer)
+            tools = None if guard.force_answer else TOOLS_SCHEMA
+            response = self._call_ollama(messages, tools)
             llm_message = response.get("message", {})
 
             # Add LLM's message to history
@@ -248,19 +260,24 @@ class SimpleToolAgent:
             # Check if LLM wants to call tools
             tool_calls = llm_message.get("tool_calls")
 
-            if tool_calls:
+            if tool_calls and not guard.force_answer:
                 print(f"[AGENT] Wants to call {len(tool_calls)} tool(s)")
 
-                # Execute each tool
-                for tool_call in tool_calls:
-                    result = self._execute_tool(tool_call)
-
+                # Execute each NEW tool call (repeats re-use the earlier result)
+                results = guard.run(tool_calls,
+                                    lambda calls: [self._execute_tool(call) for call in calls])
+                for result in results:
                     # Add tool result to messages
                     messages.append({
                         "role": "tool",
                         "content": result
                     })
 
+                nudge = guard.nudge()
+                if nudge:
+                    print("[LOOP] Repeated tool calls - nudging the model to answer")
+                    messages.append(nudge)
+
                 # Continue loop - LLM might call more tools
                 continue
 
@@ -275,6 +292,7 @@ class SimpleToolAgent:
                 return final_answer
 
         # Max iterations reached
+        print(f"[LOOP] {guard.get_stats()}")
         return "Error: Max iterations reached"
 
 
@@ -381,7 +399,7 @@ def main():
 if __name__ == "__main__":
     # Check Ollama
     try:
-        response = requests.get("http://localhost:11434/api/tags", timeout=5)
+        response = get_client().get("/api/tags", timeout=5)
         if response.status_code != 200:
             print("[WARNING] Ollama might not be running correctly")
     except:
@@ -21,9 +21,16 @@ Author: Beyhan MEYRALI
 """
 
 import json
-import requests
 from typing import Dict, Any, List, Optional
 from datetime import datetime
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from common.ollama_client import get_client
+from common.tool_selector import ToolSelector, selection_query
+from common.loop_guard import LoopGuard
+from common.tool_compactor import ToolResultCompactor
 from langchain_ollama import OllamaLLM
 from langchain_core.prompts import PromptTemplate
 
@@ -146,6 +153,13 @@ class AgentTools:
         ]
 
 
+# Tool results are re-sent to the model on every later iteration - keep only
+# what it needs (see common/tool_compactor.py). Unlisted tools: capped size.
+TOOL_OUTPUT_POLICIES = {
+    "search_web": {"fields": ["result"], "max_tokens": 200, "offload": True},
+}
+
+
 # =============================================================================
 # PART 2: Production Agent
 # =============================================================================
@@ -167,7 +181,9 @@ class ProductionAgent:
         model: str = "qwen3:8b",
         memory_size: int = 5,
         max_iterations: int = 5,
-        verbose: bool = True
+        verbose: bool = True,
+        tool_top_k: Optional[int] = None,
+        tool_output_policies: Optional[Dict[str, Dict[str, Any]]] = None
     ):
         """
         Initialize production agent.
@@ -177,6 +193,10 @@ class ProductionAgent:
             memory_size: Number of conversation turns to remember
             max_iterations: Max tool-calling iterations
             verbose: Enable detailed logging
+            tool_top_k: Send only the k most relevant tool schemas per message
+                (embedding-based, see common/tool_selector.py); None = all tools
+            tool_output_policies: Per-tool result compaction (fields, max_items,
+                max_tokens, offload); None = TOOL_OUTPUT_POLICIES
         """
         print(f"\n[INIT] Creating ProductionAgent...")
         print(f"  Model: {model}")
@@ -191,12 +211,22 @@ class ProductionAgent:
         self.tools = AgentTools()
         self.memory = SimpleMemory(k=memory_size)
         self.llm = OllamaLLM(model=model, temperature=0.7)
+        self.client = get_client()  # shared keep-alive pool for raw API calls
+        self.tool_schemas = self.tools.get_tool_schemas()
+        self.tool_selector = (ToolSelector(self.tool_schemas, top_k=tool_top_k)
+                              if tool_top_k else None)
+        self.tool_compactor = ToolResultCompactor(
+            TOOL_OUTPUT_POLICIES if tool_output_policies is None else tool_output_policies,
+            default_max_tokens=1000)
 
         # Statistics
         self.stats = {
             "total_requests": 0,
             "tools_called": 0,
-            "errors": 0
+            "errors": 0,
+            "repeated_tool_calls": 0,
+            "wasted_iterations": 0,
+            "forced_answers": 0
         }
 
         print("[INIT] ✅ Production agent ready!")
@@ -217,8 +247,8 @@ class ProductionAgent:
         if tools:
             payload["tools"] = tools
 
-        response = requests.post(
-            "http://localhost:11434/api/chat",
+        response = self.client.post(
+            "/api/chat",
             json=payload,
             timeout=60
         )
@@ -252,7 +282,9 @@ class ProductionAgent:
             result = {"error": f"Unknown tool: {func_name}"}
 
         self.stats["tools_called"] += 1
-        return json.dumps(result)
+
+        # Only the compact form goes into the conversation
+        return self.tool_compactor.compact(func_name, json.dumps(result))
 
     def chat(self, user_input: str) -> str:
         """
@@ -282,34 +314,57 @@ class ProductionAgent:
         # Add current message
         messages.append({"role": "user", "content": user_input})
 
+        # Tool selection once per message (one query embedding), not per iteration
+        full_catalogue = self.tool_selector is None
+        offered = (self.tool_schemas if full_catalogue
+                   else self.tool_selector.select(selection_query(messages)))
+        guard = LoopGuard(agent="production_agent")  # repeated calls / stuck loops
+
         # Agent loop with tools
         for iteration in range(self.max_iterations):
             self._log(f"Iteration {iteration + 1}/{self.max_iterations}")
 
             try:
+                # Only the schemas relevant to this step (fewer prompt tokens);
+                # no tools at all once the loop guard forces a final answer
+                if guard.force_answer:
+                    tools = None
+                elif full_catalogue:
+                    tools = self.tool_schemas
+                else:
+                    tools = offered
+
                 # Call LLM
-                response = self._call_ollama(
-                    messages,
-                    self.tools.get_tool_schemas()
-                )
+                response = self._call_ollama(messages, tools)
 
                 llm_message = response.get("message", {})
+                if tools and not full_catalogue and self.tool_selector.needs_full_set(llm_message, tools):
+                    self._log("Needed tool was not offered - retrying with all tools", "WARNING")
+                    full_catalogue = True
+                    response = self._call_ollama(messages, self.tool_schemas)
+                    llm_message = response.get("message", {})
                 messages.append(llm_message)
 
                 # Check for tool calls
                 tool_calls = llm_message.get("tool_calls")
 
-                if tool_calls:
+                if tool_calls and not guard.force_answer:
                     self._log(f"LLM requested {len(tool_calls)} tool(s)")
 
-                    # Execute tools
-                    for tool_call in tool_calls:
-                        result = self._execute_tool(tool_call)
+                    # Execute tools (a repeated call re-uses its earlier result)
+                    results = guard.run(
+                        tool_calls, lambda calls: [self._execute_tool(call) for call in calls])
+                    for result in results:
                         messages.append({
                             "role": "tool",
                             "content": result
                         })
 
+                    nudge = guard.nudge()
+                    if nudge:
+                        self._log("No new information from tools - nudging for an answer", "WARNING")
+                        messages.append(nudge)
+
                     # Continue loop
                     continue
                 else:
@@ -317,6 +372,8 @@ class ProductionAgent:
                     final_answer = llm_message.get("content", "No response")
                     self._log(f"Agent: {final_answer[:50]}...")
 
+                    self._record_loop_stats(guard)
+
                     # Save to memory
                     self.memory.save_context(
                         {"input": user_input},
@@ -331,11 +388,23 @@ class ProductionAgent:
                 return f"Error: {str(e)}"
 
         # Max iterations reached
+        self._record_loop_stats(guard)
         return "Error: Max iterations reached without final answer"
 
+    def _record_loop_stats(self, guard: LoopGuard):
+        """Add one run's loop-guard numbers to the agent statistics."""
+        loop_stats = guard.get_stats()
+        self.stats["repeated_tool_calls"] += loop_stats["repeated_calls"]
+        self.stats["wasted_iterations"] += loop_stats["wasted_iterations"]
+        self.stats["forced_answers"] += int(loop_stats["forced_answer"])
+
     def get_stats(self) -> Dict[str, Any]:
         """Get agent statistics."""
-        return self.stats.copy()
+        stats = self.stats.copy()
+        if self.tool_selector is not None:
+            stats["tool_selection"] = self.tool_selector.get_stats()
+        stats["tool_output"] = self.tool_compactor.get_stats()
+        return stats
 
     def reset_memory(self):
         """Clear conversation memory."""
@@ -367,7 +436,9 @@ def demo_tool_usage():
     print("DEMO 2: Tool Usage")
     print("="*70)
 
-    agent = ProductionAgent()
+    # Each question needs one tool - send only the most relevant schema
+    # (falls back to all tools if the model needs another one)
+    agent = ProductionAgent(tool_top_k=1)
 
     questions = [
         "Calculate 15 * 23",
@@ -380,6 +451,8 @@ def demo_tool_usage():
         answer = agent.chat(q)
         print(f"[A]: {answer[:100]}...")
 
+    print(f"\n[STATS]: {agent.get_stats()}")
+
 
 def demo_complex_query():
     """Demo: Complex multi-tool query."""
@@ -449,7 +522,7 @@ def main():
 if __name__ == "__main__":
     import requests
     try:
-        response = requests.get("http://localhost:11434/api/tags", timeout=5)
+        response = get_client().get("/api/tags", timeout=5)
         if response.status_code != 200:
             print("[WARNING] Ollama might not be running correctly")
     except:
@@ -31,6 +31,11 @@ Author: Beyhan MEYRALI
 from typing import TypedDict
 from langgraph.graph import StateGraph, END
 import requests
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from common.ollama_client import get_client
 
 # =============================================================================
 # STEP 1: Define State
@@ -71,8 +76,8 @@ def ask_llm_node(state: State) -> dict:
 
     try:
         # Call Ollama API
-        response = requests.post(
-            "http://localhost:11434/api/chat",
+        response = get_client().post(
+            "/api/chat",
             json={
                 "model": "qwen3:8b",
                 "messages": [
@@ -211,7 +216,7 @@ def main():
 if __name__ == "__main__":
     # Check Ollama
     try:
-        response = requests.get("http://localhost:11434/api/tags", timeout=5)
+        response = get_client().get("/api/tags", timeout=5)
         if response.status_code != 200:
             print("[WARNING] Ollama returned unexpected status")
     except requests.exceptions.RequestException:
@@ -30,6 +30,11 @@ from typing import TypedDict, Literal
 from langgraph.graph import StateGraph, END
 import requests
 import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from common.ollama_client import get_client
 
 # =============================================================================
 # STEP 1: Define State
@@ -113,8 +118,8 @@ def math_node(state: State) -> dict:
     ]
 
     try:
-        response = requests.post(
-            "http://localhost:11434/api/chat",
+        response = get_client().post(
+            "/api/chat",
             json={
                 "model": "qwen3:8b",
                 "messages": messages,
@@ -149,8 +154,8 @@ def general_node(state: State) -> dict:
     print(f"\n[GENERAL NODE] Handling general question...")
 
     try:
-        response = requests.post(
-            "http://localhost:11434/api/chat",
+        response = get_client().post(
+            "/api/chat",
             json={
                 "model": "qwen3:8b",
                 "messages": [{"role": "user", "content": state["question"]}],
@@ -377,7 +382,7 @@ def main():
 if __name__ == "__main__":
     # Check Ollama
     try:
-        response = requests.get("http://localhost:11434/api/tags", timeout=5)
+        response = get_client().get("/api/tags", timeout=5)
         if response.status_code != 200:
             print("[WARNING] Ollama returned unexpected status")
     except requests.exceptions.RequestException:
@@ -35,6 +35,11 @@ from langgraph.graph import StateGraph, END
 import requests
 import json
 import operator
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from common.ollama_client import get_client
 
 # =============================================================================
 # STEP 1: Define Tools (from Section 01)
@@ -178,8 +183,8 @@ def agent_node(state: AgentState) -> dict:
 
     try:
         # Call LLM with tools
-        response = requests.post(
-            "http://localhost:11434/api/chat",
+        response = get_client().post(
+            "/api/chat",
             json={
                 "model": "qwen3:8b",
                 "messages": messages,
@@ -419,7 +424,7 @@ def main():
 if __name__ == "__main__":
     # Check Ollama
     try:
-        response = requests.get("http://localhost:11434/api/tags", timeout=5)
+        response = get_client().get("/api/tags", timeout=5)
         if response.status_code != 200:
             print("[WARNING] Ollama returned unexpected status")
     except requests.exceptions.RequestException:
@@ -2,9 +2,15 @@ import requests
 import json
 import numpy as np
 from typing import List
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.ollama_client import get_client
 
 # Configuration
-OLLAMA_URL = "http://localhost:11434/api/embeddings"
+EMBEDDINGS_PATH = "/api/embeddings"  # relative to OLLAMA_BASE_URL
+EMBEDDING_TIMEOUT = 60  # seconds
 MODEL_NAME = "qwen3-embedding:0.6b"  # Or "nomic-embed-text"
 
 def get_embedding(text: str) -> List[float]:
@@ -17,7 +23,7 @@ def get_embedding(text: str) -> List[float]:
     }
     
     try:
-        response = requests.post(OLLAMA_URL, json=payload)
+        response = get_client().post(EMBEDDINGS_PATH, json=payload, timeout=EMBEDDING_TIMEOUT)
         response.raise_for_status()
         return response.json()["embedding"]
     except requests.exceptions.RequestException as e:
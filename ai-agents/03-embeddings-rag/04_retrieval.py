@@ -1,9 +1,14 @@
-import requests
 from qdrant_client import QdrantClient
 import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.ollama_client import get_client
 
 # Configuration
-OLLAMA_URL = "http://localhost:11434/api/embeddings"
+EMBEDDINGS_PATH = "/api/embeddings"  # relative to OLLAMA_BASE_URL
+EMBEDDING_TIMEOUT = 60  # seconds; a cold model load can take a while
 MODEL_NAME = "qwen3-embedding:0.6b"
 QDRANT_HOST = "localhost"
 QDRANT_PORT = 6333
@@ -12,7 +17,8 @@ COLLECTION_NAME = "ai_agents_knowledge"
 
 def get_embedding(text: str):
     try:
-        response = requests.post(OLLAMA_URL, json={"model": MODEL_NAME, "prompt": text})
+        response = get_client().post(EMBEDDINGS_PATH, json={"model": MODEL_NAME, "prompt": text},
+                                     timeout=EMBEDDING_TIMEOUT)
         response.raise_for_status()
         return response.json()["embedding"]
     except Exception as e:
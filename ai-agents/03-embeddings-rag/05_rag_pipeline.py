@@ -1,9 +1,15 @@
-import requests
 from qdrant_client import QdrantClient
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.ollama_client import get_client
 
 # Configuration
-OLLAMA_EMBED_URL = "http://localhost:11434/api/embeddings"
-OLLAMA_CHAT_URL = "http://localhost:11434/api/chat"
+EMBEDDINGS_PATH = "/api/embeddings"  # relative to OLLAMA_BASE_URL
+CHAT_PATH = "/api/chat"
+EMBEDDING_TIMEOUT = 60  # seconds
+CHAT_TIMEOUT = 300      # seconds; qwen3:8b answers with thinking can be slow
 EMBED_MODEL = "qwen3-embedding:0.6b"
 CHAT_MODEL = "qwen3:8b"
 QDRANT_HOST = "localhost"
@@ -12,7 +18,8 @@ QDRANT_API_KEY = "qdrant_pass"
 COLLECTION_NAME = "ai_agents_knowledge"
 
 def get_embedding(text: str):
-    response = requests.post(OLLAMA_EMBED_URL, json={"model": EMBED_MODEL, "prompt": text})
+    response = get_client().post(EMBEDDINGS_PATH, json={"model": EMBED_MODEL, "prompt": text},
+                                 timeout=EMBEDDING_TIMEOUT)
     return response.json()["embedding"]
 
 def retrieve_context(query: str, limit: int = 3) -> str:
@@ -53,7 +60,7 @@ Answer:"""
     }
     
     print("Generating answer...")
-    response = requests.post(OLLAMA_CHAT_URL, json=payload)
+    response = get_client().post(CHAT_PATH, json=payload, timeout=CHAT_TIMEOUT)
     return response.json()["message"]["content"]
 
 def rag_pipeline(query: str):
@@ -1,15 +1,20 @@
 import os
-import requests
 from crewai import Agent, Task, Crew, Process, LLM
 from crewai.tools import BaseTool
 from qdrant_client import QdrantClient
 from typing import Optional
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.ollama_client import get_client
 
 # Disable OpenAI requirement
 os.environ["OPENAI_API_KEY"] = "sk-dummy"
 
 # Configuration
-OLLAMA_EMBED_URL = "http://localhost:11434/api/embeddings"
+EMBEDDINGS_PATH = "/api/embeddings"  # relative to OLLAMA_BASE_URL
+EMBEDDING_TIMEOUT = 60  # seconds
 EMBED_MODEL = "qwen3-embedding:0.6b"
 QDRANT_HOST = "localhost"
 QDRANT_PORT = 6333
@@ -18,7 +23,8 @@ COLLECTION_NAME = "ai_agents_knowledge"
 def get_embedding(text: str):
     """Generate embedding for the query using Ollama."""
     try:
-        response = requests.post(OLLAMA_EMBED_URL, json={"model": EMBED_MODEL, "prompt": text})
+        response = get_client().post(EMBEDDINGS_PATH, json={"model": EMBED_MODEL, "prompt": text},
+                                     timeout=EMBEDDING_TIMEOUT)
         response.raise_for_status()
         return response.json()["embedding"]
     except Exception as e:
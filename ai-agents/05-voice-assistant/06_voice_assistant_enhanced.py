@@ -15,13 +15,17 @@ import time
 from collections import deque
 import threading
 import pyttsx3
-import requests
 from crewai import Agent, Task, Crew, LLM
 from crewai.tools import BaseTool
 from qdrant_client import QdrantClient
 from typing import Optional
 from tools_web_search import WebSearchTool
 from queue import Queue, Empty
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.ollama_client import get_client
 
 # Disable OpenAI requirement
 os.environ["OPENAI_API_KEY"] = "sk-dummy"
@@ -34,7 +38,8 @@ MIN_SILENCE_DURATION_MS = 500
 PRE_SPEECH_PAD_MS = 300
 
 # RAG Configuration
-OLLAMA_EMBED_URL = "http://localhost:11434/api/embeddings"
+EMBEDDINGS_PATH = "/api/embeddings"  # relative to OLLAMA_BASE_URL
+EMBEDDING_TIMEOUT = 60  # seconds
 EMBED_MODEL = "qwen3-embedding:0.6b"
 QDRANT_HOST = "localhost"
 QDRANT_PORT = 6333
@@ -45,7 +50,8 @@ COLLECTION_NAME = "ai_agents_knowledge"
 def get_embedding(text: str):
     """Generate embedding for the query using Ollama."""
     try:
-        response = requests.post(OLLAMA_EMBED_URL, json={"model": EMBED_MODEL, "prompt": text})
+        response = get_client().post(EMBEDDINGS_PATH, json={"model": EMBED_MODEL, "prompt": text},
+                                     timeout=EMBEDDING_TIMEOUT)
         response.raise_for_status()
         return response.json()["embedding"]
     except Exception as e:
@@ -17,7 +17,6 @@ import numpy as np
 import time
 import threading
 import pyttsx3
-import requests
 import json
 from collections import deque
 from queue import Queue, Empty
@@ -27,6 +26,13 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.ollama_client import get_client
+from common.admission import AdmissionRejected, PRIORITY_INTERACTIVE, get_admission_controller
+from common.metrics import instrument_app
 
 # Disable OpenAI requirement
 os.environ["OPENAI_API_KEY"] = "sk-dummy"
@@ -104,7 +110,10 @@ class HomeAutomationTools:
 class SimpleAgent:
     def __init__(self, model_name="ministral-3:3b"):
         self.model_name = model_name
-        self.api_url = "http://localhost:11434/api/chat"
+        self.api_url = "/api/chat"
+        self.client = get_client()  # shared keep-alive pool
+        # Voice is interactive: it jumps ahead of batch work waiting for Ollama
+        self.admission = get_admission_controller()
         self.tools = {
             "turn_on_ac": HomeAutomationTools.turn_on_ac,
             "turn_off_ac": HomeAutomationTools.turn_off_ac,
@@ -151,11 +160,13 @@ class SimpleAgent:
         ]
 
         try:
-            response = requests.post(self.api_url, json={
-                "model": self.model_name,
-                "messages": messages,
-                "stream": False
-            })
+            with self.admission.slot(tenant="voice", priority=PRIORITY_INTERACTIVE,
+                                     timeout=10):
+                response = self.client.post(self.api_url, json={
+                    "model": self.model_name,
+                    "messages": messages,
+                    "stream": False
+                })
             response.raise_for_status()
             result = response.json()["message"]["content"]
 
@@ -230,6 +241,9 @@ class SimpleAgent:
 
             return result
 
+        except AdmissionRejected:
+            # Better a quick spoken answer than 60 seconds of silence
+            return "Sorry, I'm busy right now. Please try again in a moment."
         except Exception as e:
             return f"Error: {e}"
 
@@ -402,6 +416,9 @@ class VoiceAssistantAgentic:
 # --- FastAPI Web Dashboard ---
 app = FastAPI()
 
+# GET /metrics for Prometheus: Ollama load/prompt/decode times, tokens/s, TTFT
+instrument_app(app)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -0,0 +1,11 @@
+"""
+Shared helpers for the AI Agents course
+=======================================
+
+Small, dependency-light building blocks that several sections reuse.
+Every script adds the `ai-agents/` folder to `sys.path` and imports from here:
+
+    from common.ollama_client import get_client
+
+Author: Beyhan MEYRALI
+"""
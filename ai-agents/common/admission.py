@@ -0,0 +1,340 @@
+"""
+Admission Control - Fair Queuing in Front of Ollama
+===================================================
+
+Ollama works on only OLLAMA_NUM_PARALLEL requests at a time. Everything
+else waits inside Ollama, invisible to us. Under a traffic spike:
+
+    100 requests forwarded blindly -> each one waits longer and longer
+                                   -> ALL of them hit the 60s timeout
+
+AdmissionController sits in front of Ollama and decides who goes next:
+
+- Concurrency limit: at most `max_concurrent` requests run at once
+- Bounded queue: at most `max_queue` wait; more -> rejected immediately (429)
+- Queue deadline: waiting longer than `queue_timeout` -> rejected (503)
+- Priority classes: interactive (voice) before default before batch
+- Per-tenant fairness: within a class, tenants take turns (round robin),
+  so one noisy user cannot starve everybody else
+
+Rejecting fast is a feature: the client can retry or show "busy" at once
+instead of waiting a minute for a timeout.
+
+Works from threads AND from asyncio code (both can share one controller):
+
+    admission = get_admission_controller()
+
+    with admission.slot(tenant="voice", priority=PRIORITY_INTERACTIVE):
+        response = client.post(...)                   # blocking code
+
+    async with admission.async_slot(tenant=session_id):
+        response = await async_client.post(...)       # FastAPI handlers
+
+Note: the limit is per process. Several servers sharing one Ollama should
+split OLLAMA_NUM_PARALLEL between them.
+
+Author: Beyhan MEYRALI
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Dict, Optional
+
+# Lower number = served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_DEFAULT = 5
+PRIORITY_BATCH = 10
+
+PRIORITIES = {
+    "interactive": PRIORITY_INTERACTIVE,
+    "default": PRIORITY_DEFAULT,
+    "batch": PRIORITY_BATCH,
+}
+
+DEFAULT_MAX_CONCURRENT = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
+DEFAULT_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+DEFAULT_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "30"))
+
+
+class AdmissionRejected(Exception):
+    """The request was not admitted; `status_code` is the HTTP status to return."""
+
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QueueFull(AdmissionRejected):
+    """Too many requests are already waiting (HTTP 429)."""
+
+    status_code = 429
+
+
+class QueueTimeout(AdmissionRejected):
+    """The request waited longer than its queue deadline (HTTP 503)."""
+
+    status_code = 503
+
+
+def parse_priority(value: Optional[str], trusted: bool = False) -> int:
+    """
+    'interactive' / 'default' / 'batch' (or a number) -> priority value.
+
+    The X-Priority header comes from the client: a number is only honoured
+    for a `trusted` caller (an internal service), and even then kept within
+    PRIORITY_INTERACTIVE..PRIORITY_BATCH - nobody can jump ahead of
+    interactive traffic with "-1000".
+    """
+    if value is None:
+        return PRIORITY_DEFAULT
+    value = str(value).strip().lower()
+    if value in PRIORITIES:
+        return PRIORITIES[value]
+    if not trusted:
+        return PRIORITY_DEFAULT
+    try:
+        return min(max(int(value), PRIORITY_INTERACTIVE), PRIORITY_BATCH)
+    except ValueError:
+        return PRIORITY_DEFAULT
+
+
+def _resolve(future: "asyncio.Future"):
+    if not future.done():
+        future.set_result(True)
+
+
+class _Waiter:
+    """One queued request (a thread OR an asyncio task)."""
+
+    __slots__ = ("tenant", "priority", "queued_at", "granted", "event", "future", "loop")
+
+    def __init__(self, tenant: str, priority: int,
+                 event: Optional[threading.Event] = None,
+                 future: Optional["asyncio.Future"] = None,
+                 loop: Optional["asyncio.AbstractEventLoop"] = None):
+        self.tenant = tenant
+        self.priority = priority
+        self.queued_at = time.monotonic()
+        self.granted = False
+        self.event = event
+        self.future = future
+        self.loop = loop
+
+    def grant(self):
+        self.granted = True
+        if self.event is not None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+class AdmissionController:
+    """Concurrency limiter with a bounded, priority + per-tenant fair queue."""
+
+    def __init__(self,
+                 max_concurrent: int = DEFAULT_MAX_CONCURRENT,
+                 max_queue: int = DEFAULT_MAX_QUEUE,
+                 queue_timeout: float = DEFAULT_QUEUE_TIMEOUT):
+        """
+        Args:
+            max_concurrent: Requests allowed to run at once (match OLLAMA_NUM_PARALLEL)
+            max_queue: Requests allowed to wait; beyond that -> QueueFull (429)
+            queue_timeout: Default max seconds in the queue -> QueueTimeout (503)
+        """
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        # priority -> OrderedDict(tenant -> deque of waiters); the tenant order
+        # is the round-robin order
+        self._queues: Dict[int, "OrderedDict[str, deque]"] = {}
+        self._active = 0
+        self._waiting = 0
+        self._granted_from_queue = 0
+        self._lock = threading.Lock()
+        self.stats = {"admitted": 0, "queued": 0, "rejected_full": 0,
+                      "rejected_timeout": 0, "total_wait": 0.0}
+
+    # -------------------------------------------------------------------------
+    # Blocking API (threads)
+    # -------------------------------------------------------------------------
+
+    def acquire(self, tenant: str = "default", priority: int = PRIORITY_DEFAULT,
+                timeout: Optional[float] = None):
+        """Wait for a slot; raises QueueFull / QueueTimeout when not admitted."""
+        waiter = _Waiter(tenant, priority, event=threading.Event())
+        with self._lock:
+            if self._admit_or_enqueue(waiter):
+                return
+
+        timeout = self.queue_timeout if timeout is None else timeout
+        if waiter.event.wait(timeout):
+            return
+        with self._lock:
+            if waiter.granted:
+                return
+            self._remove(waiter)
+            self.stats["rejected_timeout"] += 1
+        raise QueueTimeout(f"Waited more than {timeout}s for a free slot",
+                           retry_after=max(1, int(timeout)))
+
+    def release(self):
+        """Give the slot back and start the next waiter."""
+        with self._lock:
+            self._active -= 1
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, tenant: str = "default", priority: int = PRIORITY_DEFAULT,
+             timeout: Optional[float] = None):
+        """`with admission.slot(...):` - acquire + release around a block."""
+        self.acquire(tenant, priority, timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    # -------------------------------------------------------------------------
+    # asyncio API (FastAPI handlers)
+    # -------------------------------------------------------------------------
+
+    async def acquire_async(self, tenant: str = "default", priority: int = PRIORITY_DEFAULT,
+                            timeout: Optional[float] = None):
+        """Async version of acquire() - waits without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(tenant, priority, future=loop.create_future(), loop=loop)
+        with self._lock:
+            if self._admit_or_enqueue(waiter):
+                return
+
+        timeout = self.queue_timeout if timeout is None else timeout
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                if waiter.granted:
+                    return
+                self._remove(waiter)
+                self.stats["rejected_timeout"] += 1
+            raise QueueTimeout(f"Waited more than {timeout}s for a free slot",
+                               retry_after=max(1, int(timeout)))
+        except asyncio.CancelledError:
+            # The client went away while waiting
+            with self._lock:
+                if waiter.granted:
+                    self._active -= 1
+                    self._dispatch()
+                else:
+                    self._remove(waiter)
+            raise
+
+    @asynccontextmanager
+    async def async_slot(self, tenant: str = "default", priority: int = PRIORITY_DEFAULT,
+                         timeout: Optional[float] = None):
+        """`async with admission.async_slot(...):` - acquire + release around a block."""
+        await self.acquire_async(tenant, priority, timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    # -------------------------------------------------------------------------
+    # Scheduling (always called with the lock held)
+    # -------------------------------------------------------------------------
+
+    def _admit_or_enqueue(self, waiter: _Waiter) -> bool:
+        """True = admitted right away, False = queued. Raises QueueFull."""
+        # Only skip the queue when nobody is waiting (no overtaking)
+        if self._active < self.max_concurrent and self._waiting == 0:
+            self._active += 1
+            self.stats["admitted"] += 1
+            return True
+
+        if self._waiting >= self.max_queue:
+            self.stats["rejected_full"] += 1
+            raise QueueFull(f"Server busy: {self._waiting} requests already queued")
+
+        tenants = self._queues.setdefault(waiter.priority, OrderedDict())
+        tenants.setdefault(waiter.tenant, deque()).append(waiter)
+        self._waiting += 1
+        self.stats["queued"] += 1
+        return False
+
+    def _dispatch(self):
+        while self._active < self.max_concurrent and self._waiting > 0:
+            waiter = self._pop_next()
+            self._active += 1
+            self.stats["admitted"] += 1
+            self.stats["total_wait"] += time.monotonic() - waiter.queued_at
+            self._granted_from_queue += 1
+            waiter.grant()
+
+    def _pop_next(self) -> _Waiter:
+        """Highest priority class first; inside it, the next tenant in turn."""
+        for priority in sorted(self._queues):
+            tenants = self._queues[priority]
+            if not tenants:
+                continue
+            tenant, waiters = tenants.popitem(last=False)
+            waiter = waiters.popleft()
+            if waiters:
+                tenants[tenant] = waiters  # back of the line for this tenant
+            self._waiting -= 1
+            return waiter
+        raise RuntimeError("No waiter to dispatch")
+
+    def _remove(self, waiter: _Waiter):
+        tenants = self._queues.get(waiter.priority, {})
+        waiters = tenants.get(waiter.tenant)
+        if waiters is None or waiter not in waiters:
+            return
+        waiters.remove(waiter)
+        if not waiters:
+            del tenants[waiter.tenant]
+        self._waiting -= 1
+
+    # -------------------------------------------------------------------------
+    # Helpers
+    # -------------------------------------------------------------------------
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Counters plus the current number of running / waiting requests."""
+        with self._lock:
+            waited = self._granted_from_queue
+            return {
+                **{k: v for k, v in self.stats.items() if k != "total_wait"},
+                "active": self._active,
+                "waiting": self._waiting,
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "avg_queue_wait_ms": round(self.stats["total_wait"] / waited * 1000, 1)
+                if waited > 0 else 0.0,
+            }
+
+
+# =============================================================================
+# SHARED INSTANCE (one per process)
+# =============================================================================
+
+_default_controller: Optional[AdmissionController] = None
+_default_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    """
+    Return the process-wide controller (created on first use).
+
+    Sized from OLLAMA_NUM_PARALLEL / ADMISSION_MAX_QUEUE / ADMISSION_QUEUE_TIMEOUT,
+    so every caller in the process shares the same Ollama "budget".
+    """
+    global _default_controller
+    with _default_lock:
+        if _default_controller is None:
+            _default_controller = AdmissionController()
+        return _default_controller
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Agent Benchmark - Per-Iteration Framework Overhead From a Cassette
+==================================================================
+
+How much time does OUR agent code add per LLM round-trip? Message building,
+tool selection, tool dispatch, caching, parsing ... With a live model that
+number is hidden inside seconds of generation. This script records ONE run
+of an agent (common/cassette.py) and then replays it many times without a
+model:
+
+    overhead per iteration = (run time - replayed LLM time) / LLM calls
+
+Agents:
+    recursive    recursive_agent()                  01-tool-calling/03_recursive_agent.py
+    tool_bot     OllamaToolBot.ask_question()       01-tool-calling/01_basic_weather_tool.py
+    production   ProductionAgent.chat()             02-agent-frameworks/langchain/07_production_agent.py
+
+Typical use:
+    # 1. Record once (real Ollama, or the mock server)
+    python common/agent_benchmark.py --agent recursive --record \\
+        --cassette runs/recursive.jsonl --question "What's the weather in my manager's city?"
+
+    # 2. Replay: no model needed, deterministic, fast
+    python common/agent_benchmark.py --agent recursive --cassette runs/recursive.jsonl \\
+        --question "What's the weather in my manager's city?" --runs 200 --output before.json
+    ... change code ...
+    python common/agent_benchmark.py ... --runs 200 --compare before.json
+    python common/agent_benchmark.py ... --runs 50 --profile     # where does the time go?
+
+--timing replays with the recorded latencies (end-to-end numbers without a
+model); the overhead is still computed without the waiting.
+
+Author: Beyhan MEYRALI
+"""
+
+import argparse
+import contextlib
+import cProfile
+import importlib.util
+import io
+import json
+import pstats
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+from common.cassette import CassetteMiss, use_cassette
+from common.load_test import _summary, git_commit
+
+# Agent name -> (script, factory(module) -> run(question) -> answer). Every run
+# starts from a clean conversation, so every replay sends the recorded requests.
+AGENTS = {
+    "recursive": ("01-tool-calling/03_recursive_agent.py",
+                  lambda module: lambda question: module.recursive_agent(question, verbose=False)),
+    "tool_bot": ("01-tool-calling/01_basic_weather_tool.py",
+                 lambda module: lambda question: module.OllamaToolBot().ask_question(question)),
+    "production": ("02-agent-frameworks/langchain/07_production_agent.py",
+                   lambda module: _production_runner(module)),
+}
+
+
+def _production_runner(module) -> Callable[[str], str]:
+    agent = module.ProductionAgent(verbose=False)
+
+    def run(question: str) -> str:
+        agent.reset_memory()
+        return agent.chat(question)
+    return run
+
+
+def load_agent(name: str) -> Callable[[str], str]:
+    """Import the example script by path (file names start with digits)."""
+    script, factory = AGENTS[name]
+    path = ROOT / script
+    sys.path.insert(0, str(path.parent))
+    spec = importlib.util.spec_from_file_location(path.stem, path)
+    module = importlib.util.module_from_spec(spec)
+    with contextlib.redirect_stdout(io.StringIO()):
+        spec.loader.exec_module(module)
+        return factory(module)
+
+
+# =============================================================================
+# RECORD / REPLAY
+# =============================================================================
+
+def record(agent: str, question: str, cassette_path: str):
+    """One live run, every Ollama request/response appended to the cassette."""
+    run = load_agent(agent)
+    with use_cassette(cassette_path, mode="record") as cassette:
+        started = time.perf_counter()
+        answer = run(question)
+        elapsed = time.perf_counter() - started
+    stats = cassette.get_stats()
+    print(f"[OK] Recorded {stats['recorded']} request(s) {stats['paths']} "
+          f"in {elapsed:.2f}s -> {cassette_path}")
+    print(f"[INFO] Answer: {answer[:200]}")
+
+
+def replay(agent: str, question: str, cassette_path: str, runs: int, warmup: int,
+           timing: bool, profile: bool) -> Dict[str, Any]:
+    """Replay the cassette `runs` times and measure what our code adds."""
+    run = load_agent(agent)
+    profiler = cProfile.Profile() if profile else None
+    per_run, per_iteration, llm_calls = [], [], []
+    answers = set()
+
+    with use_cassette(cassette_path, mode="replay", timing=timing) as cassette:
+        for index in range(warmup + runs):
+            before = cassette.get_stats()
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):  # the agents print a lot
+                if profiler is not None and index >= warmup:
+                    answer = profiler.runcall(run, question)
+                else:
+                    answer = run(question)
+            elapsed = time.perf_counter() - started
+            after = cassette.get_stats()
+
+            if after["misses"] > before["misses"]:
+                raise CassetteMiss("The agent sent a request that is not in the cassette - "
+                                   "re-record it (did the code or the question change?)")
+            if index < warmup:
+                continue
+            waited = after["waited_seconds"] - before["waited_seconds"]
+            chat_calls = (after["paths"].get("/api/chat", 0) - before["paths"].get("/api/chat", 0)
+                          + after["paths"].get("/api/generate", 0)
+                          - before["paths"].get("/api/generate", 0))
+            overhead = elapsed - waited
+            per_run.append(elapsed)
+            per_iteration.append(overhead / max(chat_calls, 1))
+            llm_calls.append(chat_calls)
+            answers.add(answer)
+
+    if profiler is not None:
+        print("\n[PROFILE] Top functions by cumulative time (replayed runs):")
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(15)
+
+    return {
+        "agent": agent,
+        "question": question,
+        "cassette": cassette_path,
+        "runs": runs,
+        "timing": timing,
+        "commit": git_commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "llm_calls_per_run": max(set(llm_calls), key=llm_calls.count) if llm_calls else 0,
+        "deterministic": len(answers) == 1,
+        "run_ms": _summary([seconds * 1000 for seconds in per_run]),
+        "overhead_per_iteration_ms": _summary([seconds * 1000 for seconds in per_iteration]),
+    }
+
+
+# =============================================================================
+# REPORTING
+# =============================================================================
+
+def print_report(report: Dict[str, Any]):
+    print("\n" + "=" * 60)
+    print(f"AGENT BENCHMARK: {report['agent']} x {report['runs']} replayed runs "
+          f"(commit {report.get('commit') or '?'})")
+    print("=" * 60)
+    print(f"LLM calls/run: {report['llm_calls_per_run']}   "
+          f"timing: {'recorded' if report['timing'] else 'instant'}   "
+          f"same answer every run: {report['deterministic']}")
+    for name, label in (("run_ms", "RUN"), ("overhead_per_iteration_ms", "OVERHEAD/ITER")):
+        s = report[name]
+        print(f"{label:<14} p50={s['p50']:.3f}ms  p95={s['p95']:.3f}ms  "
+              f"p99={s['p99']:.3f}ms  mean={s['mean']:.3f}ms")
+
+
+def print_comparison(report: Dict[str, Any], baseline: Dict[str, Any]):
+    """Side by side with an earlier run (e.g. the previous commit)."""
+    print(f"\n[INFO] Compared with {baseline.get('commit') or 'baseline'} "
+          f"({baseline.get('started_at', '?')})")
+    for name in ("run_ms", "overhead_per_iteration_ms"):
+        for pct in ("p50", "p95", "mean"):
+            new, old = report[name][pct], (baseline.get(name) or {}).get(pct)
+            if new is None or old is None:
+                continue
+            change = f"{(new - old) / old:+.1%}" if old else "n/a"
+            print(f"  {name} {pct:<5} {old:>10.3f} -> {new:>10.3f}   ({change})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record/replay benchmark of agent-loop overhead")
+    parser.add_argument("--agent", choices=sorted(AGENTS), default="recursive")
+    parser.add_argument("--cassette", required=True, help="JSONL cassette file")
+    parser.add_argument("--question", default="What's the weather in my manager's city?")
+    parser.add_argument("--record", action="store_true",
+                        help="Run once against Ollama and record (appends to the cassette)")
+    parser.add_argument("--runs", type=int, default=50, help="Replayed runs to measure")
+    parser.add_argument("--warmup", type=int, default=2, help="Replayed runs not measured")
+    parser.add_argument("--timing", action="store_true", help="Replay with recorded latencies")
+    parser.add_argument("--profile", action="store_true", help="cProfile the replayed runs")
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    parser.add_argument("--compare", help="Earlier JSON report to compare against")
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.agent, args.question, args.cassette)
+        return
+
+    try:
+        report = replay(args.agent, args.question, args.cassette, args.runs, args.warmup,
+                        args.timing, args.profile)
+    except (FileNotFoundError, CassetteMiss) as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+    print_report(report)
+    if args.compare:
+        print_comparison(report, json.loads(Path(args.compare).read_text(encoding="utf-8")))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"\n[OK] Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,417 @@
+"""
+Backend Pool - Load Balancing Across Several Ollama Hosts
+=========================================================
+
+One Ollama box serves a few requests at a time. With several inference
+boxes we want ONE service to spread its load over all of them:
+
+    OllamaBot --> BackendPool --+--> http://gpu-1:11434   (2 in flight)
+                                +--> http://gpu-2:11434   (0 in flight)  <- next!
+                                +--> http://gpu-3:11434   (ejected, down)
+
+How a host is chosen:
+- Least outstanding requests: the host with the fewest calls in flight
+- Model affinity: prefer hosts that already have the model loaded
+  (loading qwen3:8b into VRAM takes seconds), learned from `/api/ps`
+- Health probes: a background thread polls every host; hosts that fail
+  `eject_after` probes or requests in a row are ejected until they answer
+  again
+- Failover: if the connection to a host could not even be opened (refused,
+  unknown host, connect timeout), the same request is retried on another
+  host - safe, the request never reached a model. A connection that breaks
+  AFTER the request was sent is NOT retried: the model may already be
+  generating, and running it twice is the caller's decision.
+
+BackendPool has the same API as OllamaClient (post / get / chat / stream /
+embeddings / is_alive), so any bot can use it instead of a single client:
+
+    pool = BackendPool(["http://gpu-1:11434", "http://gpu-2:11434"])
+    data = pool.chat({"model": "qwen3:8b", "messages": [...]})
+
+Stateful conversations (/api/generate + `context`, common/context_session.py)
+are pinned: `route(model, prefer=host)` keeps them on the host that holds
+their KV cache, and `host=...` sends a request there:
+
+    host = pool.route("qwen3:8b", prefer=session.host)
+    pool.post("/api/generate", json=payload, host=host)
+
+get_client() returns a pool automatically when it is given several hosts
+(a list or a comma separated string) or when OLLAMA_BASE_URLS is set:
+
+    OLLAMA_BASE_URLS=http://gpu-1:11434,http://gpu-2:11434
+
+Author: Beyhan MEYRALI
+"""
+
+import threading
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Union
+from urllib.parse import urlsplit
+
+import requests
+from urllib3.exceptions import ConnectTimeoutError
+
+from common.ollama_client import OllamaClient, get_async_client
+
+try:
+    import httpx  # Only needed for AsyncBackendPool (FastAPI services)
+    # httpx's counterpart of requests.exceptions.ConnectionError
+    _ASYNC_CONNECTION_ERRORS = (httpx.NetworkError, httpx.ConnectTimeout,
+                                httpx.RemoteProtocolError)
+except ImportError:
+    httpx = None
+
+
+def parse_urls(base_url: Union[str, Iterable[str]]) -> List[str]:
+    """"http://a:11434, http://b:11434" or a list -> ["http://a:11434", "http://b:11434"]."""
+    if isinstance(base_url, str):
+        base_url = base_url.split(",")
+    return [url.strip().rstrip("/") for url in base_url if url and url.strip()]
+
+
+def _api_path(path: str) -> str:
+    """Full URLs are reduced to their path, so the POOL decides the host."""
+    if "://" not in path:
+        return "/" + path.lstrip("/")
+    parts = urlsplit(path)
+    return parts.path + (f"?{parts.query}" if parts.query else "")
+
+
+class Backend:
+    """One Ollama host plus its routing state."""
+
+    def __init__(self, url: str):
+        self.url = url
+        # No same-host retries: on a connect error the POOL fails over instead
+        self.client = OllamaClient(base_url=url, max_retries=0)
+        self.outstanding = 0
+        self.healthy = True
+        self.failures = 0
+        self.loaded_models: set = set()
+        self.requests = 0
+        self.errors = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"url": self.url, "healthy": self.healthy, "outstanding": self.outstanding,
+                "requests": self.requests, "errors": self.errors,
+                "loaded_models": sorted(self.loaded_models)}
+
+
+def never_connected(error: BaseException) -> bool:
+    """
+    True if the request never left this machine: safe to send elsewhere.
+
+    requests wraps urllib3's reason (NewConnectionError is a
+    ConnectTimeoutError); "Connection aborted" / RemoteDisconnected are not.
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if httpx is not None and isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout)):
+        return True
+    reason = error.args[0] if error.args else None
+    reason = getattr(reason, "reason", reason)  # MaxRetryError -> its cause
+    return isinstance(reason, ConnectTimeoutError)
+
+
+class BackendPool:
+    """Least-outstanding, model-aware router over several Ollama hosts."""
+
+    def __init__(self,
+                 urls: Union[str, Iterable[str]],
+                 health_interval: Optional[float] = 10.0,
+                 eject_after: int = 2,
+                 probe_timeout: float = 2.0,
+                 affinity_slack: int = 4):
+        """
+        Args:
+            urls: Ollama hosts (list or comma separated string)
+            health_interval: Seconds between health probes (None = no probe thread)
+            eject_after: Failed probes / connections in a row before a host is ejected
+            probe_timeout: Timeout for one `/api/ps` probe
+            affinity_slack: A host with the model loaded is preferred while it has
+                at most this many more requests in flight than the least busy host
+        """
+        self.backends = [Backend(url) for url in parse_urls(urls)]
+        if not self.backends:
+            raise ValueError("BackendPool needs at least one Ollama URL")
+        self.base_url = self.backends[0].url
+        self.health_interval = health_interval
+        self.eject_after = eject_after
+        self.probe_timeout = probe_timeout
+        self.affinity_slack = affinity_slack
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.stats = {"requests": 0, "failovers": 0, "ejections": 0}
+
+        self._prober = None
+        if health_interval:
+            self._prober = threading.Thread(target=self._probe_loop, daemon=True,
+                                            name="ollama-health-probe")
+            self._prober.start()
+
+    # -------------------------------------------------------------------------
+    # Routing
+    # -------------------------------------------------------------------------
+
+    def _choose(self, model: Optional[str], exclude: Iterable[Backend] = (),
+                host: Optional[str] = None) -> Backend:
+        """The best host (caller holds the lock); `host` wins while it is healthy."""
+        exclude = set(exclude)
+        candidates = [b for b in self.backends if b.healthy and b not in exclude]
+        if not candidates:
+            # Everything is ejected - trying a "dead" host beats failing outright
+            candidates = [b for b in self.backends if b not in exclude]
+        if not candidates:
+            raise requests.exceptions.ConnectionError("No Ollama backend left to try")
+
+        if host:
+            pinned = [b for b in candidates if b.url == host.rstrip("/")]
+            if pinned:
+                return pinned[0]
+
+        load = lambda b: (b.outstanding, b.requests)
+        backend = min(candidates, key=load)
+        if model:
+            warm = [b for b in candidates if model in b.loaded_models]
+            if warm:
+                best_warm = min(warm, key=load)
+                if best_warm.outstanding - backend.outstanding <= self.affinity_slack:
+                    backend = best_warm
+        return backend
+
+    def route(self, model: Optional[str] = None, prefer: Optional[str] = None) -> str:
+        """
+        URL of the host the next request would go to (nothing is counted).
+
+        `prefer` (e.g. the host holding a conversation's context) is kept
+        while it is healthy - otherwise a different URL comes back, and the
+        caller can notice that the host changed.
+        """
+        with self._lock:
+            return self._choose(model, host=prefer).url
+
+    def pick(self, model: Optional[str] = None, exclude: Iterable[Backend] = (),
+             host: Optional[str] = None) -> Backend:
+        """Choose a host for the next request (and count it as outstanding)."""
+        with self._lock:
+            backend = self._choose(model, exclude, host)
+            backend.outstanding += 1
+            backend.requests += 1
+            self.stats["requests"] += 1
+            return backend
+
+    def _done(self, backend: Backend, model: Optional[str] = None, ok: bool = True):
+        with self._lock:
+            backend.outstanding -= 1
+            if ok:
+                backend.failures = 0
+                if model:
+                    backend.loaded_models.add(model)  # it is loaded there now
+
+    def _failed(self, backend: Backend, error: BaseException) -> bool:
+        """
+        Count a connection error; `eject_after` of them in a row eject the host.
+        Returns True if the request may be retried on another host.
+        """
+        failover = never_connected(error)
+        with self._lock:
+            backend.errors += 1
+            backend.failures += 1
+            if backend.healthy and backend.failures >= self.eject_after:
+                backend.healthy = False
+                self.stats["ejections"] += 1
+                print(f"[WARNING] Ollama backend {backend.url} ejected ({error})")
+            if failover:
+                self.stats["failovers"] += 1
+        if failover:
+            print(f"[WARNING] Ollama backend {backend.url} unreachable - trying another host")
+        return failover
+
+    # -------------------------------------------------------------------------
+    # OllamaClient-compatible API
+    # -------------------------------------------------------------------------
+
+    def request(self, method: str, path: str, model: Optional[str] = None,
+                host: Optional[str] = None, **kwargs) -> requests.Response:
+        """Send a request to the best host (or `host`), failing over on connect errors."""
+        path = _api_path(path)
+        tried: List[Backend] = []
+        while True:
+            backend = self.pick(model, exclude=tried, host=host)
+            try:
+                response = backend.client.request(method, path, **kwargs)
+            except requests.exceptions.ConnectionError as e:
+                self._done(backend, ok=False)
+                tried.append(backend)
+                if not self._failed(backend, e) or len(tried) >= len(self.backends):
+                    raise
+                continue
+            except Exception:
+                self._done(backend, ok=False)
+                raise
+            self._done(backend, model, ok=response.status_code < 400)
+            return response
+
+    def post(self, path: str, json: Optional[Dict[str, Any]] = None, **kwargs) -> requests.Response:
+        """POST helper - the "model" field of the payload drives model affinity."""
+        return self.request("POST", path, model=(json or {}).get("model"), json=json, **kwargs)
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request("GET", path, **kwargs)
+
+    def stream(self, path: str, payload: Dict[str, Any], host: Optional[str] = None,
+               **kwargs) -> Iterator[Dict[str, Any]]:
+        """Like OllamaClient.stream(); fails over only before the first chunk."""
+        path = _api_path(path)
+        model = payload.get("model")
+        tried: List[Backend] = []
+        while True:
+            backend = self.pick(model, exclude=tried, host=host)
+            started = False
+            ok = False
+            try:
+                for chunk in backend.client.stream(path, payload, **kwargs):
+                    started = True
+                    yield chunk
+                ok = True
+                return
+            except requests.exceptions.ConnectionError as e:
+                tried.append(backend)
+                if not self._failed(backend, e) or started or len(tried) >= len(self.backends):
+                    raise
+            finally:
+                self._done(backend, model, ok=ok)
+
+    def chat(self, payload: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        """Call /api/chat (non-streaming) and return the parsed JSON."""
+        response = self.post("/api/chat", json={**payload, "stream": False}, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    def embeddings(self, model: str, prompt: str, **kwargs) -> list:
+        """Call /api/embeddings and return the embedding vector."""
+        response = self.post("/api/embeddings", json={"model": model, "prompt": prompt}, **kwargs)
+        response.raise_for_status()
+        return response.json()["embedding"]
+
+    def is_alive(self, timeout: float = 5) -> bool:
+        """True if at least one host answers."""
+        return any(backend.client.is_alive(timeout) for backend in self.backends)
+
+    def close(self):
+        """Stop the probe thread and close all connections."""
+        self._stop.set()
+        for backend in self.backends:
+            backend.client.close()
+
+    # -------------------------------------------------------------------------
+    # Health probes
+    # -------------------------------------------------------------------------
+
+    def probe(self):
+        """Probe every host once: health + which models are loaded (/api/ps)."""
+        for backend in self.backends:
+            try:
+                response = backend.client.get("/api/ps", timeout=self.probe_timeout)
+                if response.status_code == 404:
+                    models = None  # older Ollama without /api/ps: alive, models unknown
+                else:
+                    response.raise_for_status()
+                    models = {m.get("name") or m.get("model")
+                              for m in response.json().get("models", [])}
+            except (requests.exceptions.RequestException, ValueError):
+                with self._lock:
+                    backend.failures += 1
+                    if backend.healthy and backend.failures >= self.eject_after:
+                        backend.healthy = False
+                        self.stats["ejections"] += 1
+                        print(f"[WARNING] Ollama backend {backend.url} ejected (health check failed)")
+                continue
+
+            with self._lock:
+                if not backend.healthy:
+                    print(f"[INFO] Ollama backend {backend.url} is back")
+                backend.healthy = True
+                backend.failures = 0
+                if models is not None:
+                    backend.loaded_models = models
+
+    def _probe_loop(self):
+        while not self._stop.wait(self.health_interval):
+            self.probe()
+
+    # -------------------------------------------------------------------------
+    # Helpers
+    # -------------------------------------------------------------------------
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Pool counters plus the state of every host."""
+        with self._lock:
+            return {**self.stats, "backends": [b.to_dict() for b in self.backends]}
+
+
+class AsyncBackendPool:
+    """
+    asyncio view of a BackendPool (same routing state, httpx transport).
+
+    Has the AsyncOllamaClient API (post / chat / stream), so AsyncOllamaBot
+    can use it unchanged. Health probes run in the BackendPool's thread.
+    """
+
+    def __init__(self, pool: BackendPool):
+        if httpx is None:
+            raise ImportError("AsyncBackendPool needs httpx: pip install httpx")
+        self.pool = pool
+        self.base_url = pool.base_url
+
+    async def post(self, path: str, json: Optional[Dict[str, Any]] = None,
+                   host: Optional[str] = None, **kwargs) -> "httpx.Response":
+        path = _api_path(path)
+        model = (json or {}).get("model")
+        tried: List[Backend] = []
+        while True:
+            backend = self.pool.pick(model, exclude=tried, host=host)
+            try:
+                response = await get_async_client(backend.url).post(path, json=json, **kwargs)
+            except _ASYNC_CONNECTION_ERRORS as e:
+                self.pool._done(backend, ok=False)
+                tried.append(backend)
+                if not self.pool._failed(backend, e) or len(tried) >= len(self.pool.backends):
+                    raise
+                continue
+            except BaseException:
+                self.pool._done(backend, ok=False)
+                raise
+            self.pool._done(backend, model, ok=response.status_code < 400)
+            return response
+
+    async def chat(self, payload: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        response = await self.post("/api/chat", json={**payload, "stream": False}, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    async def stream(self, path: str, payload: Dict[str, Any], host: Optional[str] = None,
+                     **kwargs) -> AsyncIterator[Dict[str, Any]]:
+        path = _api_path(path)
+        model = payload.get("model")
+        tried: List[Backend] = []
+        while True:
+            backend = self.pool.pick(model, exclude=tried, host=host)
+            started = False
+            ok = False
+            try:
+                async for chunk in get_async_client(backend.url).stream(path, payload, **kwargs):
+                    started = True
+                    yield chunk
+                ok = True
+                return
+            except _ASYNC_CONNECTION_ERRORS as e:
+                tried.append(backend)
+                if (not self.pool._failed(backend, e) or started
+                        or len(tried) >= len(self.pool.backends)):
+                    raise
+            finally:
+                self.pool._done(backend, model, ok=ok)
+
+    async def aclose(self):
+        """Nothing to close: the per-host clients are closed by aclose_all()."""
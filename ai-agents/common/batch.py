@@ -0,0 +1,172 @@
+"""
+Batch Runner - Thousands of Prompts, Concurrently, Resumable
+============================================================
+
+An evaluation set of 5,000 prompts asked one after another takes hours,
+although Ollama can work on several requests at once (OLLAMA_NUM_PARALLEL).
+This module runs a batch with a bounded number of requests in flight:
+
+    prompts.jsonl ---> [ N requests in flight ] ---> answers.jsonl
+                          (completion order)
+
+- Results are written AS THEY FINISH (completion order, not input order),
+  one JSON line each, flushed immediately.
+- Every line carries the prompt `id`, so a second run with the same output
+  file skips what is already answered: Ctrl+C (or a crash) loses at most
+  the requests that were in flight.
+- Failed prompts are written with an "error" and retried on the next run.
+  If an id appears twice in the output, the LAST line wins.
+
+Input (one JSON object per line; "id" defaults to the line number):
+    {"id": "q1", "prompt": "What is the capital of France?"}
+    {"prompt": "What is 2+2?"}
+
+Output:
+    {"id": "q1", "prompt": "...", "answer": "Paris...", "error": null, "seconds": 1.8}
+
+Usage:
+    results = iter_completed(ask, prompts, max_concurrency=8)   # any ask(prompt) -> str
+    run_batch(bot.ask_many, "prompts.jsonl", "answers.jsonl", max_concurrency=8)
+
+    python 00-llm-basics/01_basic_chat.py --batch prompts.jsonl --output answers.jsonl
+
+Author: Beyhan MEYRALI
+"""
+
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+DEFAULT_MAX_CONCURRENCY = 4
+
+
+def iter_completed(ask: Callable[[str], Any], prompts: Iterable[str],
+                   max_concurrency: int = DEFAULT_MAX_CONCURRENCY) -> Iterator[Dict[str, Any]]:
+    """
+    Call `ask(prompt)` for every prompt with at most `max_concurrency` running.
+
+    Yields {"index", "prompt", "answer", "error", "seconds"} in COMPLETION
+    order. Prompts are read lazily - only `max_concurrency` are submitted at a
+    time, so a generator of millions is fine. Closing the iterator (break,
+    Ctrl+C) cancels everything that has not started yet.
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+
+    def run(index: int, prompt: str) -> Dict[str, Any]:
+        started = time.perf_counter()
+        answer, error = None, None
+        try:
+            answer = ask(prompt)
+        except Exception as e:  # one bad prompt must not stop the batch
+            error = f"{type(e).__name__}: {e}"
+        return {"index": index, "prompt": prompt, "answer": answer, "error": error,
+                "seconds": round(time.perf_counter() - started, 3)}
+
+    pending = set()
+    source = enumerate(prompts)
+    executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="batch")
+    try:
+        while True:
+            # Keep the window full
+            for index, prompt in source:
+                pending.add(executor.submit(run, index, prompt))
+                if len(pending) >= max_concurrency:
+                    break
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+# =============================================================================
+# JSONL IN / OUT WITH RESUME
+# =============================================================================
+
+def read_prompts(path: str) -> List[Tuple[str, str]]:
+    """(id, prompt) pairs from a JSONL file. Plain-text lines are prompts too."""
+    items = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                record = line
+            if isinstance(record, str):
+                record = {"prompt": record}
+            prompt = record.get("prompt") or record.get("question")
+            if not prompt:
+                raise ValueError(f"{path}:{line_number}: no 'prompt' field")
+            items.append((str(record.get("id", line_number)), prompt))
+    return items
+
+
+def completed_ids(path: str) -> Set[str]:
+    """Ids already answered WITHOUT error in an earlier (interrupted) run."""
+    status: Dict[str, bool] = {}
+    if not Path(path).exists():
+        return set()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # half-written last line of a killed run
+            status[str(record.get("id"))] = record.get("error") is None
+    return {id_ for id_, ok in status.items() if ok}
+
+
+def run_batch(ask_many: Callable[..., Iterator[Dict[str, Any]]], input_path: str,
+              output_path: str, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+              on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+              **extra: Any) -> Dict[str, Any]:
+    """
+    Answer every prompt of `input_path` that `output_path` does not have yet.
+
+    Args:
+        ask_many: e.g. OllamaBot.ask_many - (prompts, max_concurrency) -> results
+        on_result: Called with every written record (progress output)
+        extra: Added to every output line (e.g. model="qwen3:8b")
+
+    Returns:
+        {"total", "skipped", "ok", "failed", "seconds"}
+    """
+    items = read_prompts(input_path)
+    done = completed_ids(output_path)
+    todo = [(id_, prompt) for id_, prompt in items if id_ not in done]
+    summary = {"total": len(items), "skipped": len(items) - len(todo), "ok": 0, "failed": 0}
+    started = time.perf_counter()
+
+    output = Path(output_path)
+    if output.exists() and output.stat().st_size:
+        with open(output, "rb") as f:
+            f.seek(-1, 2)
+            torn_line = f.read(1) != b"\n"
+    else:
+        torn_line = False
+
+    with open(output, "a", encoding="utf-8") as f:
+        if torn_line:
+            f.write("\n")  # the killed run stopped mid-line; start a fresh one
+        for result in ask_many([prompt for _, prompt in todo], max_concurrency=max_concurrency):
+            record = {"id": todo[result["index"]][0], "prompt": result["prompt"],
+                      "answer": result["answer"], "error": result["error"],
+                      "seconds": result["seconds"], **extra}
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()  # on disk now -> survives Ctrl+C
+            summary["failed" if record["error"] else "ok"] += 1
+            if on_result is not None:
+                on_result(record)
+
+    summary["seconds"] = round(time.perf_counter() - started, 2)
+    return summary
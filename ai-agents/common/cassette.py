@@ -0,0 +1,303 @@
+"""
+Cassette - Record Ollama Traffic Once, Replay It Without a Model
+================================================================
+
+An agent run mixes two kinds of time:
+
+    |--LLM 2.1s--|-ours-|--LLM 1.8s--|-ours-|--LLM 0.9s--|
+                   ^^^^                ^^^^
+                   message building, tool dispatch, parsing, caching ...
+
+With a real model, OUR part drowns in generation time - a 5 ms regression
+in the loop is invisible. A cassette captures every Ollama request and
+response of a run (like VCR tapes for HTTP tests):
+
+    record:  agent -> OllamaClient -> [cassette] -> Ollama        (writes JSONL)
+    replay:  agent -> OllamaClient -> [cassette]                  (no Ollama at all)
+
+It plugs in as a `requests` transport adapter on the shared client's
+session, so every caller of get_client() is covered without code changes:
+recursive_agent, OllamaToolBot, ProductionAgent, the tool selector's
+embeddings, health checks ...
+
+Replay is deterministic:
+- A request is matched on method + path + canonical JSON body.
+- Identical requests get their recorded responses in recorded order; when
+  they run out, replay starts again at the first one (so one recording can
+  be replayed many times by a benchmark).
+- A request that was never recorded raises CassetteMiss (a
+  RequestException, so agents report it like a connection error).
+- `timing=True` waits like the original server did (time to first chunk,
+  then every streamed chunk at its recorded offset). `timing=False` answers
+  instantly - what is left is OUR code.
+
+While recording, a streamed answer reaches the caller in one piece (the
+cassette reads it to note every chunk's arrival time).
+
+Usage:
+    with use_cassette("runs/manager.jsonl", mode="record"):
+        recursive_agent("What's the weather in my manager's city?")
+
+    with use_cassette("runs/manager.jsonl", mode="replay", timing=False) as cassette:
+        recursive_agent("What's the weather in my manager's city?")
+        print(cassette.get_stats())
+
+    # Or for any example, from the environment (read by get_client()):
+    OLLAMA_CASSETTE=runs/x.jsonl OLLAMA_CASSETTE_MODE=record python 01-tool-calling/03_recursive_agent.py
+
+Author: Beyhan MEYRALI
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+MODES = ("record", "replay")
+
+
+class CassetteMiss(requests.exceptions.RequestException):
+    """
+    Replay found no recorded response for a request.
+
+    Deliberately NOT a ConnectionError: a BackendPool would take it for a
+    dead host, eject it and try the next one.
+    """
+
+
+def _request_key(method: str, url: str, body: Any) -> str:
+    """method + path + canonical JSON body ("stream": true and false stay different)."""
+    if isinstance(body, bytes):
+        body = body.decode("utf-8")
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True, ensure_ascii=False) if body else ""
+    except ValueError:
+        pass  # not JSON - match the text as it is
+    return f"{method} {urlsplit(url).path} {body}"
+
+
+class _ReplayBody:
+    """File-like response body that hands out recorded chunks (optionally on time)."""
+
+    def __init__(self, chunks: List[Tuple[float, str]], started: float, cassette: "Cassette"):
+        self._chunks = list(chunks)
+        self._started = started
+        self._cassette = cassette
+
+    def read(self, amt: Optional[int] = None, **kwargs) -> bytes:
+        if not self._chunks:
+            return b""
+        offset, text = self._chunks.pop(0)
+        if self._cassette.timing:
+            self._cassette._wait_until(self._started + offset)
+        return text.encode("utf-8")
+
+    def close(self):
+        self._chunks = []
+
+
+class Cassette:
+    """A JSONL file of Ollama interactions, recorded or replayed through an adapter."""
+
+    def __init__(self, path: str, mode: str = "replay", timing: bool = False):
+        """
+        Args:
+            path: JSONL file, one interaction per line
+            mode: "record" (append real traffic) or "replay" (no network)
+            timing: Replay only - reproduce the recorded latencies
+        """
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}, got {mode!r}")
+        self.path = Path(path)
+        self.mode = mode
+        self.timing = timing
+        self._lock = threading.Lock()
+        self._recorded: Dict[str, List[Dict[str, Any]]] = {}
+        self._cursor: Dict[str, int] = {}
+        self._installed: List[Tuple[Any, str, Any]] = []  # (session, prefix, previous adapter)
+        self.stats = {"requests": 0, "recorded": 0, "replayed": 0, "misses": 0,
+                      "recorded_seconds": 0.0, "waited_seconds": 0.0}
+        self.paths: Dict[str, int] = {}  # "/api/chat" -> requests
+        if mode == "replay":
+            self._load()
+
+    # -------------------------------------------------------------------------
+    # File
+    # -------------------------------------------------------------------------
+
+    def _load(self):
+        if not self.path.exists():
+            raise FileNotFoundError(f"No cassette at {self.path} - record one first")
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    interaction = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # half-written last line of a killed recording
+                self._recorded.setdefault(interaction["key"], []).append(interaction)
+
+    def _append(self, interaction: Dict[str, Any]):
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(interaction, ensure_ascii=False) + "\n")
+
+    # -------------------------------------------------------------------------
+    # Install on a client
+    # -------------------------------------------------------------------------
+
+    def install(self, client: Any):
+        """Route a client's traffic through the cassette (OllamaClient or BackendPool)."""
+        for backend in getattr(client, "backends", []):
+            self.install(backend.client)
+        session = getattr(client, "session", None)
+        if session is None:
+            return
+        prefix = client.base_url.rstrip("/") + "/"
+        adapter = _CassetteAdapter(self, session.get_adapter(prefix))
+        self._installed.append((session, prefix, session.adapters.get(prefix)))
+        session.mount(prefix, adapter)
+
+    def uninstall(self):
+        """Put the original transport back on every installed client."""
+        for session, prefix, previous in reversed(self._installed):
+            if previous is not None:
+                session.adapters[prefix] = previous
+            else:
+                session.adapters.pop(prefix, None)
+        self._installed = []
+
+    # -------------------------------------------------------------------------
+    # Record / replay
+    # -------------------------------------------------------------------------
+
+    def _wait_until(self, moment: float):
+        delay = moment - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+            with self._lock:
+                self.stats["waited_seconds"] += delay
+
+    def record(self, request: requests.PreparedRequest, inner: BaseAdapter,
+               **kwargs) -> requests.Response:
+        kwargs["stream"] = True  # read it ourselves to time every chunk
+        started = time.perf_counter()
+        response = inner.send(request, **kwargs)
+        chunks = [[round(time.perf_counter() - started, 4), line.decode("utf-8", "replace") + "\n"]
+                  for line in response.iter_lines()]
+        elapsed = time.perf_counter() - started
+        response.close()
+
+        interaction = {
+            "key": _request_key(request.method, request.url, request.body),
+            "status": response.status_code,
+            "reason": response.reason,
+            "content_type": response.headers.get("Content-Type", "application/json"),
+            "chunks": chunks,
+            "seconds": round(elapsed, 4),
+        }
+        self._append(interaction)
+        with self._lock:
+            self._count_path(request.url)
+            self.stats["recorded"] += 1
+            self.stats["recorded_seconds"] += elapsed
+        # The caller gets the recorded copy (the real body has been read)
+        return self._build(request, interaction, timing=False)
+
+    def replay(self, request: requests.PreparedRequest) -> requests.Response:
+        key = _request_key(request.method, request.url, request.body)
+        with self._lock:
+            self._count_path(request.url)
+            recorded = self._recorded.get(key)
+            if not recorded:
+                self.stats["misses"] += 1
+                raise CassetteMiss(f"No recorded response for {key[:200]}", request=request)
+            index = self._cursor.get(key, 0)
+            self._cursor[key] = (index + 1) % len(recorded)
+            self.stats["replayed"] += 1
+            self.stats["recorded_seconds"] += recorded[index]["seconds"]
+        return self._build(request, recorded[index], timing=self.timing)
+
+    def _build(self, request: requests.PreparedRequest, interaction: Dict[str, Any],
+               timing: bool) -> requests.Response:
+        response = requests.Response()
+        response.status_code = interaction["status"]
+        response.reason = interaction.get("reason") or ""
+        response.headers = CaseInsensitiveDict({"Content-Type": interaction["content_type"]})
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        chunks = interaction["chunks"] if timing else [[0.0, text] for _, text in interaction["chunks"]]
+        response.raw = _ReplayBody(chunks, time.perf_counter(), self)
+        return response
+
+    def _count_path(self, url: str):
+        path = urlsplit(url).path
+        self.paths[path] = self.paths.get(path, 0) + 1
+        self.stats["requests"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "paths": dict(self.paths),
+                    "recorded_seconds": round(self.stats["recorded_seconds"], 4),
+                    "waited_seconds": round(self.stats["waited_seconds"], 4)}
+
+
+class _CassetteAdapter(BaseAdapter):
+    """requests transport: record through the original adapter, or replay."""
+
+    def __init__(self, cassette: Cassette, inner: BaseAdapter):
+        super().__init__()
+        self.cassette = cassette
+        self.inner = inner
+
+    def send(self, request, **kwargs):
+        if self.cassette.mode == "record":
+            return self.cassette.record(request, self.inner, **kwargs)
+        return self.cassette.replay(request)
+
+    def close(self):
+        self.inner.close()
+
+
+# =============================================================================
+# CONVENIENCE
+# =============================================================================
+
+@contextmanager
+def use_cassette(path: str, mode: str = "replay", timing: bool = False,
+                 base_url: Any = None) -> Iterator[Cassette]:
+    """Record or replay everything sent through get_client(base_url) in this block."""
+    from common.ollama_client import get_client  # ollama_client imports this module lazily
+
+    cassette = Cassette(path, mode=mode, timing=timing)
+    cassette.install(get_client(base_url))
+    try:
+        yield cassette
+    finally:
+        cassette.uninstall()
+
+
+_env_cassette: Optional[Cassette] = None
+_env_lock = threading.Lock()
+
+
+def install_from_env(client: Any):
+    """Called by get_client(): OLLAMA_CASSETTE=path [OLLAMA_CASSETTE_MODE=record|replay]."""
+    global _env_cassette
+    with _env_lock:
+        if _env_cassette is None:
+            _env_cassette = Cassette(
+                os.environ["OLLAMA_CASSETTE"],
+                mode=os.getenv("OLLAMA_CASSETTE_MODE", "replay"),
+                timing=os.getenv("OLLAMA_CASSETTE_TIMING", "0") == "1",
+            )
+        _env_cassette.install(client)
@@ -0,0 +1,156 @@
+"""
+Context Session - Reuse Ollama's Conversation Context Between Turns
+===================================================================
+
+With /api/chat the client re-sends the WHOLE conversation every turn:
+
+    turn 1:  [user]                                  -> Ollama tokenises 1 message
+    turn 10: [user, ai, user, ai, ... , user]        -> Ollama tokenises 19 messages
+
+/api/generate can do better. Its final response carries a `context` array:
+the token ids of the conversation so far. Send it back with the next prompt
+and Ollama only has to tokenise the NEW message:
+
+    turn 1:  {"prompt": "Hi, I'm Alice", "system": "..."}     -> context [..]
+    turn 2:  {"prompt": "What is my name?", "context": [..]}  -> context [....]
+
+ContextSession keeps that array and decides, before every turn, whether it
+is still valid. It falls back to a normal /api/chat call when:
+
+- the model changed (token ids belong to ONE model's tokenizer)
+- the Ollama host changed (its KV cache is somewhere else). With several
+  hosts the bot asks the BackendPool to route() the turn to the host that
+  served the previous one; only if that host is down does `host` change
+- the history was edited (reset, a failed turn left an unanswered
+  question, ...)
+- the context grew past `max_context_tokens` (then the bot's HistoryPolicy
+  window takes over again)
+
+Once it falls back, the session stays on /api/chat until the conversation
+is reset: /api/chat returns no context to pick up from.
+
+Usage:
+    session = ContextSession()
+    payload = session.build(model, host, messages, stream=False)
+    if payload:   POST /api/generate with payload
+    else:         POST /api/chat as usual
+    session.update(model, host, messages, final_response)  # after the answer
+
+Author: Beyhan MEYRALI
+"""
+
+from typing import Any, Dict, List, Optional
+
+DEFAULT_MAX_CONTEXT_TOKENS = 6000
+
+
+class ContextSession:
+    """Tracks the /api/generate `context` of one conversation."""
+
+    def __init__(self, max_context_tokens: int = DEFAULT_MAX_CONTEXT_TOKENS):
+        """
+        Args:
+            max_context_tokens: Stop reusing the context beyond this many tokens
+                (keep it below the model's num_ctx, or Ollama truncates silently)
+        """
+        self.max_context_tokens = max_context_tokens
+        self.context: Optional[List[int]] = None
+        self.model: Optional[str] = None
+        self.host: Optional[str] = None
+        self.covered = 0        # messages the context already contains
+        self.broken = False     # fell back to /api/chat -> no context to continue
+        self.stats = {"seeded": 0, "reused": 0, "fallbacks": 0, "prompt_tokens": 0}
+
+    def build(self, model: str, host: str, messages: List[Dict[str, Any]],
+              stream: bool = False, options: Optional[Dict[str, Any]] = None
+              ) -> Optional[Dict[str, Any]]:
+        """
+        The /api/generate payload for the next turn, or None = use /api/chat.
+
+        `messages` must already end with the new user message.
+        """
+        if not messages or messages[-1].get("role") != "user":
+            return None
+
+        payload: Dict[str, Any] = {"model": model, "prompt": messages[-1]["content"],
+                                   "stream": stream}
+        if options:
+            payload["options"] = options
+
+        if self.context is None and not self.broken:
+            # First turn: [system?, user] is all /api/generate needs
+            history = messages[:-1]
+            if len(history) > 1 or (history and history[0].get("role") != "system"):
+                self._fall_back()
+                return None
+            if history:
+                payload["system"] = history[0]["content"]
+            return payload
+
+        if self.broken or not self._still_valid(model, host, messages):
+            self._fall_back()
+            return None
+
+        payload["context"] = self.context
+        return payload
+
+    def update(self, model: str, host: str, messages: List[Dict[str, Any]],
+               data: Optional[Dict[str, Any]]):
+        """
+        Remember the context after a turn.
+
+        Args:
+            messages: History INCLUDING the answer that was just added
+            data: Final response JSON (the `done` chunk for streams); a reply
+                  from /api/chat has no `context` and ends the reuse
+        """
+        context = (data or {}).get("context")
+        if not context:
+            if self.context is not None:
+                self._fall_back()
+            return
+
+        self.stats["reused" if self.context is not None else "seeded"] += 1
+        self.stats["prompt_tokens"] += (data or {}).get("prompt_eval_count") or 0
+        self.context = context
+        self.model = model
+        self.host = host
+        self.covered = len(messages)
+
+    def reset(self):
+        """New conversation: the next turn seeds a fresh context."""
+        self.context = None
+        self.covered = 0
+        self.broken = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Everything needed to continue the context later (e.g. after a disk spill)."""
+        return {"context": self.context, "model": self.model, "host": self.host,
+                "covered": self.covered, "broken": self.broken}
+
+    def load_dict(self, data: Dict[str, Any]):
+        """Continue from to_dict(); build() still checks model, host and history."""
+        self.context = data.get("context")
+        self.model = data.get("model")
+        self.host = data.get("host")
+        self.covered = data.get("covered", 0)
+        self.broken = data.get("broken", False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "active": self.context is not None,
+                "context_tokens": len(self.context) if self.context else 0}
+
+    # -------------------------------------------------------------------------
+
+    def _still_valid(self, model: str, host: str, messages: List[Dict[str, Any]]) -> bool:
+        return (self.context is not None
+                and model == self.model
+                and host == self.host
+                and len(messages) == self.covered + 1          # only the new question is new
+                and len(self.context) < self.max_context_tokens)
+
+    def _fall_back(self):
+        if not self.broken:
+            self.stats["fallbacks"] += 1
+        self.context = None
+        self.broken = True
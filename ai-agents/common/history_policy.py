@@ -0,0 +1,249 @@
+"""
+History Policy - Token-Budgeted Conversation Window
+===================================================
+
+OllamaBot sends the WHOLE conversation on every turn. That is how the LLM
+"remembers", but it has a cost:
+
+    turn 1:   200 tokens   -> fast
+    turn 20: 6000 tokens   -> prompt evaluation gets slower every turn
+    turn 80: context overflow -> the model silently forgets the beginning
+
+HistoryPolicy builds a smaller window to send instead:
+
+    [system prompt]                      <- always pinned
+    [summary of older turns]             <- one short system message
+    [older turns that still fit budget]
+    [the most recent turns]              <- always pinned
+
+Turns that fall out of the window are folded into the running summary by a
+background thread, AFTER the answer was returned - the user never waits for
+summarisation. Until a fold finishes, those turns are simply left out.
+
+The full history stays in `bot.messages`; only the payload gets smaller.
+
+Usage:
+    policy = HistoryPolicy(max_tokens=2000, keep_recent=6,
+                           summarizer=OllamaSummarizer(model="qwen3:8b"))
+    window = policy.build(bot.messages)     # send this instead of bot.messages
+    policy.after_turn(bot.messages)         # schedule folding in the background
+
+Author: Beyhan MEYRALI
+"""
+
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from common.ollama_client import get_client
+from common.tokens import count_message_tokens
+
+Summarizer = Callable[[str, List[Dict]], str]
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+# One small worker pool shared by ALL policies (one per session would mean
+# hundreds of idle threads on a busy server)
+_FOLD_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="history-fold")
+
+
+# =============================================================================
+# SUMMARIZER (one extra LLM call, off the critical path)
+# =============================================================================
+
+class OllamaSummarizer:
+    """Incrementally updates a running summary with an Ollama model."""
+
+    def __init__(self, model: str = "qwen3:8b", base_url: Optional[str] = None,
+                 max_words: int = 150):
+        self.model = model
+        self.client = get_client(base_url)
+        self.max_words = max_words
+
+    def __call__(self, summary: str, messages: List[Dict]) -> str:
+        transcript = "\n".join(f"{m['role']}: {m.get('content', '')}" for m in messages)
+        prompt = (
+            f"Current summary:\n{summary or '(empty)'}\n\n"
+            f"New conversation turns:\n{transcript}\n\n"
+            f"Update the summary so it includes the important facts from the new "
+            f"turns (names, preferences, decisions, open questions). "
+            f"Use at most {self.max_words} words. Reply with the summary only. /no_think"
+        )
+        data = self.client.chat({
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "options": {"temperature": 0.0}
+        }, timeout=120)
+        text = data.get("message", {}).get("content", "")
+        return re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL).strip()
+
+
+# =============================================================================
+# THE POLICY
+# =============================================================================
+
+class HistoryPolicy:
+    """
+    Keeps the prompt under a token budget while remembering older turns.
+
+    Attributes:
+        summary: The running summary of folded turns
+        stats: tokens_full / tokens_sent totals and number of folds
+    """
+
+    def __init__(self,
+                 max_tokens: int = 2000,
+                 keep_recent: int = 6,
+                 summarizer: Optional[Summarizer] = None,
+                 min_fold: int = 2,
+                 background: bool = True):
+        """
+        Args:
+            max_tokens: Token budget for the history sent to the model
+            keep_recent: Number of most recent messages that are always sent
+            summarizer: fn(summary, new_messages) -> new summary (None = just drop)
+            min_fold: Fold only when at least this many messages fell out
+            background: Run the summarizer in a worker thread (False = inline)
+        """
+        self.max_tokens = max_tokens
+        self.keep_recent = keep_recent
+        self.summarizer = summarizer
+        self.min_fold = min_fold
+        self.background = background
+
+        self.summary = ""
+        self.stats = {"turns": 0, "tokens_full": 0, "tokens_sent": 0, "folds": 0}
+
+        self._folded = 0        # body messages already merged into the summary
+        self._overflow_end = 0  # body messages that fell out of the last window
+        self._generation = 0    # bumped on reset, so stale folds are ignored
+        self._lock = threading.Lock()
+        self._running = False
+
+    # -------------------------------------------------------------------------
+    # Building the window (critical path - must be fast!)
+    # -------------------------------------------------------------------------
+
+    @staticmethod
+    def _split_head(messages: List[Dict]):
+        """Leading system messages are pinned, the rest is the conversation body."""
+        head_size = 0
+        while head_size < len(messages) and messages[head_size].get("role") == "system":
+            head_size += 1
+        return messages[:head_size], messages[head_size:]
+
+    def build(self, messages: List[Dict]) -> List[Dict]:
+        """Return the messages to send for this turn."""
+        head, body = self._split_head(messages)
+
+        with self._lock:
+            if len(body) < self._folded:
+                # The history was cleared or replaced - start over
+                self._reset_locked()
+            summary = self.summary
+            unfolded = body[self._folded:]
+
+        summary_messages = [{"role": "system", "content": SUMMARY_PREFIX + summary}] if summary else []
+        budget = self.max_tokens - count_message_tokens(head + summary_messages)
+
+        split = max(0, len(unfolded) - self.keep_recent)
+        older, recent = unfolded[:split], unfolded[split:]
+        used = count_message_tokens(recent)
+
+        # Walk backwards and keep as many older messages as still fit
+        kept_from = len(older)
+        while kept_from > 0:
+            size = count_message_tokens([older[kept_from - 1]])
+            if used + size > budget:
+                break
+            used += size
+            kept_from -= 1
+
+        # Never start the window with tool results whose call was dropped
+        while kept_from < len(older) and older[kept_from].get("role") == "tool":
+            kept_from += 1
+
+        with self._lock:
+            self._overflow_end = max(self._overflow_end, self._folded + kept_from)
+
+        window = head + summary_messages + older[kept_from:] + recent
+        self.stats["turns"] += 1
+        self.stats["tokens_full"] += count_message_tokens(messages)
+        self.stats["tokens_sent"] += count_message_tokens(window)
+        return window
+
+    # -------------------------------------------------------------------------
+    # Folding (off the critical path)
+    # -------------------------------------------------------------------------
+
+    def after_turn(self, messages: List[Dict]):
+        """Call after the answer was stored; folds overflowed turns if needed."""
+        _, body = self._split_head(messages)
+
+        with self._lock:
+            start, end = self._folded, self._overflow_end
+            if self._running or end - start < self.min_fold:
+                return
+            if self.summarizer is None:
+                # No summarizer: the overflow is simply forgotten
+                self._folded = end
+                return
+            self._running = True
+            job = (self._generation, self.summary, list(body[start:end]), end)
+
+        if self.background:
+            _FOLD_EXECUTOR.submit(self._fold, *job)
+        else:
+            self._fold(*job)
+
+    def _fold(self, generation: int, summary: str, new_messages: List[Dict], end: int):
+        try:
+            new_summary = self.summarizer(summary, new_messages)
+        except Exception as e:
+            print(f"[WARNING] History summarisation failed: {e}")
+            new_summary = None
+
+        with self._lock:
+            self._running = False
+            if generation != self._generation or new_summary is None:
+                return
+            self.summary = new_summary
+            self._folded = end
+            self.stats["folds"] += 1
+
+    # -------------------------------------------------------------------------
+    # Helpers
+    # -------------------------------------------------------------------------
+
+    def reset(self):
+        """Forget the summary (call when the conversation is reset)."""
+        with self._lock:
+            self._reset_locked()
+
+    def _reset_locked(self):
+        self.summary = ""
+        self._folded = 0
+        self._overflow_end = 0
+        self._generation += 1
+
+    def to_dict(self) -> Dict:
+        """The summary and how far it reaches - saved with a spilled session."""
+        with self._lock:
+            return {"summary": self.summary, "folded": self._folded,
+                    "overflow_end": self._overflow_end}
+
+    def load_dict(self, data: Dict):
+        """Continue from to_dict() (the messages must be restored as well)."""
+        with self._lock:
+            self._reset_locked()
+            self.summary = data.get("summary", "")
+            self._folded = data.get("folded", 0)
+            self._overflow_end = data.get("overflow_end", self._folded)
+
+    def get_stats(self) -> Dict:
+        """Token totals, plus how many tokens the window saved."""
+        return {**self.stats,
+                "tokens_saved": self.stats["tokens_full"] - self.stats["tokens_sent"],
+                "summary_tokens": count_message_tokens(
+                    [{"content": self.summary}]) if self.summary else 0}
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Load Test - Latency Benchmark for the Chat / Tool FastAPI Services
+==================================================================
+
+"How many users can /chat handle?" needs a number, not a feeling.
+
+This tool sends requests at a fixed ARRIVAL RATE (open loop): a new request
+starts every 1/rate seconds, no matter if the previous ones finished. That is
+how real users behave - they do not wait for each other. (A closed loop, "send
+the next one when the last one is done", hides queueing: the slower the server,
+the less load it gets.)
+
+It reports, per run:
+    latency p50 / p95 / p99      whole request, seconds
+    TTFT p50 / p95 / p99         first token (streaming endpoint only)
+    throughput                   successful requests per second
+    error rate                   by HTTP status (429/503 = admission control);
+                                 "backend_error" = HTTP 200, but the answer is
+                                 the bot's "Connection error: ..." message
+
+Targets:
+    chat     GET  /chat/{query}           00-llm-basics/02_streaming_chat.py
+    stream   GET  /chat/stream/{query}    same app, Server-Sent Events
+    tool     POST /chat                   01-tool-calling/01_basic_weather_tool.py
+
+Typical run (against the mock Ollama, so only OUR code is measured):
+    python common/mock_ollama.py --port 11435 &
+    OLLAMA_BASE_URL=http://localhost:11435 uvicorn --app-dir 00-llm-basics 02_streaming_chat:app --port 8002 &
+    python common/load_test.py --target stream --rate 20 --duration 30 --output before.json
+    ... change code ...
+    python common/load_test.py --target stream --rate 20 --duration 30 --compare before.json
+
+    # --target tool: the weather tool app instead
+    OLLAMA_BASE_URL=http://localhost:11435 uvicorn --app-dir 01-tool-calling 01_basic_weather_tool:app --port 8002 &
+
+Author: Beyhan MEYRALI
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import subprocess
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote
+
+import httpx
+
+DEFAULT_QUERIES = [
+    "What is the capital of France?",
+    "What is the weather in Tokyo?",
+    "Tell me a short joke",
+    "Explain recursion in one sentence",
+]
+
+DEFAULT_URL = "http://localhost:8002"  # the port the apps document
+
+# The bots report a failed Ollama call IN the answer, with HTTP 200
+BACKEND_ERROR_PREFIXES = ("Connection error:", "Ollama API Error:",
+                          "Error getting final response:", "Error in final response:")
+
+TARGETS = {
+    "chat": ("GET", "/chat/{query}"),
+    "stream": ("GET", "/chat/stream/{query}"),
+    "tool": ("POST", "/chat"),
+}
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile (pct in 0..100); None for no values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def _summary(values: List[float]) -> Dict[str, Optional[float]]:
+    rounded = lambda v: round(v, 4) if v is not None else None
+    return {
+        "p50": rounded(percentile(values, 50)),
+        "p95": rounded(percentile(values, 95)),
+        "p99": rounded(percentile(values, 99)),
+        "mean": rounded(sum(values) / len(values)) if values else None,
+        "max": rounded(max(values)) if values else None,
+    }
+
+
+def git_commit() -> Optional[str]:
+    """Current commit, stored with the results so runs can be compared."""
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       cwd=Path(__file__).parent,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# =============================================================================
+# ONE REQUEST
+# =============================================================================
+
+def is_backend_error(answer: Any) -> bool:
+    """True for an in-band error answer ("Connection error: ...")."""
+    return isinstance(answer, str) and answer.lstrip().startswith(BACKEND_ERROR_PREFIXES)
+
+
+def _answer(response: httpx.Response) -> Any:
+    try:
+        return response.json().get("ai_response")
+    except (ValueError, AttributeError):
+        return None
+
+
+async def send_one(client: httpx.AsyncClient, target: str, query: str,
+                   session_id: Optional[str], priority: Optional[str]) -> Dict[str, Any]:
+    """Send one request; returns status, latency and (for streams) TTFT."""
+    method, path = TARGETS[target]
+    params = {"session_id": session_id} if session_id else None
+    headers = {"X-Priority": priority} if priority else None
+    started = time.perf_counter()
+    result: Dict[str, Any] = {"status": None, "latency": None, "ttft": None}
+
+    try:
+        if target == "stream":
+            async with client.stream(method, path.format(query=quote(query, safe="")),
+                                     params=params, headers=headers) as response:
+                result["status"] = response.status_code
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:") or '"token"' not in line:
+                        continue
+                    try:
+                        token = json.loads(line[5:]).get("token")
+                    except ValueError:
+                        token = None
+                    if is_backend_error(token):
+                        result["status"] = "backend_error"
+                    # The first `data:` line carrying a token = the first word on screen
+                    elif result["ttft"] is None:
+                        result["ttft"] = time.perf_counter() - started
+        else:
+            if target == "tool":
+                response = await client.post(path, json={"query": query}, headers=headers)
+            else:
+                response = await client.get(path.format(query=quote(query, safe="")),
+                                            params=params, headers=headers)
+            result["status"] = response.status_code
+            if response.status_code == 200 and is_backend_error(_answer(response)):
+                result["status"] = "backend_error"
+    except httpx.TimeoutException:
+        result["status"] = "timeout"
+    except httpx.HTTPError as e:
+        result["status"] = type(e).__name__
+
+    result["latency"] = time.perf_counter() - started
+    return result
+
+
+# =============================================================================
+# THE OPEN-LOOP DRIVER
+# =============================================================================
+
+async def run_load(base_url: str, target: str, rate: float, duration: float,
+                   queries: List[str], unique: bool = False, sessions: int = 0,
+                   poisson: bool = False, priority: Optional[str] = None,
+                   timeout: float = 120.0, seed: int = 0) -> Dict[str, Any]:
+    """
+    Fire requests at `rate` per second for `duration` seconds, then wait for
+    the stragglers and summarise.
+
+    Args:
+        unique: Make every query distinct (defeats caching / request coalescing)
+        sessions: Spread requests over this many session ids (0 = no session)
+        poisson: Random (exponential) gaps instead of a fixed interval
+    """
+    rng = random.Random(seed)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=100)
+    tasks: List[asyncio.Task] = []
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        started = time.perf_counter()
+        next_at = started
+        sent = 0
+        while next_at - started < duration:
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            query = queries[sent % len(queries)]
+            if unique:
+                query = f"{query} (#{sent})"
+            session_id = f"load-{sent % sessions}" if sessions else None
+            # Fire and forget: the next request does NOT wait for this one
+            tasks.append(asyncio.ensure_future(
+                send_one(client, target, query, session_id, priority)))
+            sent += 1
+
+            gap = rng.expovariate(rate) if poisson else 1.0 / rate
+            next_at += gap
+
+        send_window = time.perf_counter() - started
+        results = await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    return summarise(results, target, rate, duration, send_window, elapsed)
+
+
+def summarise(results: List[Dict[str, Any]], target: str, rate: float, duration: float,
+              send_window: float, elapsed: float) -> Dict[str, Any]:
+    """Turn raw per-request results into the report dict (what gets saved as JSON)."""
+    ok = [r for r in results if r["status"] == 200]
+    statuses: Dict[str, int] = {}
+    for r in results:
+        statuses[str(r["status"])] = statuses.get(str(r["status"]), 0) + 1
+
+    total = len(results)
+    return {
+        "target": target,
+        "offered_rate": rate,
+        "duration": duration,
+        "requests": total,
+        "achieved_rate": round(total / send_window, 2) if send_window else None,
+        "ok": len(ok),
+        "throughput": round(len(ok) / elapsed, 2) if elapsed else None,
+        "error_rate": round(1 - len(ok) / total, 4) if total else None,
+        "statuses": statuses,
+        "latency": _summary([r["latency"] for r in ok]),
+        "ttft": _summary([r["ttft"] for r in ok if r["ttft"] is not None]),
+        "wall_time": round(elapsed, 2),
+    }
+
+
+# =============================================================================
+# REPORTING
+# =============================================================================
+
+def print_report(report: Dict[str, Any]):
+    print("\n" + "=" * 60)
+    print(f"LOAD TEST: {report['target']} @ {report['offered_rate']} req/s "
+          f"for {report['duration']}s  (commit {report.get('commit') or '?'})")
+    print("=" * 60)
+    print(f"Requests:    {report['requests']}  (achieved {report['achieved_rate']} req/s)")
+    print(f"Successful:  {report['ok']}  -> throughput {report['throughput']} req/s")
+    print(f"Error rate:  {report['error_rate']:.2%}" if report["error_rate"] is not None
+          else "Error rate:  -")
+    print(f"Statuses:    {report['statuses']}")
+    for name in ("latency", "ttft"):
+        s = report[name]
+        if s["p50"] is None:
+            continue
+        print(f"{name.upper():<12} p50={s['p50']:.3f}s  p95={s['p95']:.3f}s  "
+              f"p99={s['p99']:.3f}s  max={s['max']:.3f}s")
+
+
+def print_comparison(report: Dict[str, Any], baseline: Dict[str, Any]):
+    """Side by side with an earlier run (e.g. the previous commit)."""
+    print(f"\n[INFO] Compared with {baseline.get('commit') or 'baseline'} "
+          f"({baseline.get('started_at', '?')})")
+
+    def row(label, new, old):
+        if new is None or old is None:
+            return
+        change = f"{(new - old) / old:+.1%}" if old else "n/a"
+        print(f"  {label:<16} {old:>10.3f} -> {new:>10.3f}   ({change})")
+
+    row("throughput", report["throughput"], baseline.get("throughput"))
+    row("error_rate", report["error_rate"], baseline.get("error_rate"))
+    for name in ("latency", "ttft"):
+        for pct in ("p50", "p95", "p99"):
+            row(f"{name} {pct}", report[name][pct], (baseline.get(name) or {}).get(pct))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop load test for the chat/tool APIs")
+    parser.add_argument("--url", default=DEFAULT_URL, help="Service base URL")
+    parser.add_argument("--target", choices=sorted(TARGETS), default="chat")
+    parser.add_argument("--rate", type=float, default=5.0, help="Requests per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of sending")
+    parser.add_argument("--query", action="append", help="Query to send (repeatable)")
+    parser.add_argument("--unique", action="store_true",
+                        help="Make every query distinct (no cache / coalescing hits)")
+    parser.add_argument("--sessions", type=int, default=0, help="Spread over N session ids")
+    parser.add_argument("--poisson", action="store_true", help="Random arrival gaps")
+    parser.add_argument("--priority", help="X-Priority header (interactive/default/batch)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Earlier JSON result to compare against")
+    args = parser.parse_args()
+
+    started_at = datetime.now(timezone.utc).isoformat()
+    print(f"[INFO] {args.target} @ {args.rate} req/s for {args.duration}s against {args.url}")
+    report = asyncio.run(run_load(args.url, args.target, args.rate, args.duration,
+                                  args.query or DEFAULT_QUERIES, unique=args.unique,
+                                  sessions=args.sessions, poisson=args.poisson,
+                                  priority=args.priority, timeout=args.timeout, seed=args.seed))
+    report.update({"commit": git_commit(), "started_at": started_at, "url": args.url,
+                   "unique": args.unique, "sessions": args.sessions, "poisson": args.poisson})
+    print_report(report)
+
+    if args.compare:
+        print_comparison(report, json.loads(Path(args.compare).read_text(encoding="utf-8")))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"\n[OK] Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Loop Guard - Stop Agents From Repeating Themselves
+==================================================
+
+A confused model can call the same tool with the same arguments again and
+again:
+
+    iteration 1: get_my_manager()      -> {"manager_name": "Alice", ...}
+    iteration 2: get_my_manager()      -> same result
+    iteration 3: get_my_manager()      -> same result
+    ...                                   until max_iterations (5-10 LLM calls!)
+
+Each repeat costs a full LLM round-trip and produces nothing new. LoopGuard
+watches the tool calls of ONE agent run:
+
+1. Fingerprint every call: (tool name, canonical arguments).
+2. A repeated call is NOT executed again - the earlier result is re-used.
+3. An iteration where every call was a repeat (or only returned results we
+   had already seen) is "wasted". The agent then adds a corrective system
+   message: "you already have this - answer the user".
+4. After `max_wasted` wasted iterations, the guard forces the final answer:
+   the next LLM call is made WITHOUT tools.
+
+Metrics:
+    agent_repeated_tool_calls_total{agent}
+    agent_wasted_iterations_total{agent}
+    agent_forced_answers_total{agent}
+
+Usage (inside the agent loop, one guard per run):
+    guard = LoopGuard(agent="recursive_agent")
+    ...
+    contents = guard.run(tool_calls, execute_calls)   # execute_calls(calls) -> [str]
+    messages.extend({"role": "tool", "content": c} for c in contents)
+    nudge = guard.nudge()
+    if nudge:
+        messages.append(nudge)
+    if guard.force_answer:
+        ... call the LLM once more without tools ...
+
+Author: Beyhan MEYRALI
+"""
+
+import hashlib
+from typing import Any, Callable, Dict, List, Optional
+
+from common.metrics import REGISTRY
+from common.parallel_tools import parse_tool_call
+from common.tool_cache import ToolCache
+
+REPEATED_CALLS = REGISTRY.counter(
+    "agent_repeated_tool_calls_total", "Tool calls repeated with identical arguments", ("agent",))
+WASTED_ITERATIONS = REGISTRY.counter(
+    "agent_wasted_iterations_total", "Agent iterations that produced no new information", ("agent",))
+FORCED_ANSWERS = REGISTRY.counter(
+    "agent_forced_answers_total", "Runs where the loop guard forced a final answer", ("agent",))
+
+NUDGE = ("You already called {calls} with exactly these arguments and the results are "
+         "above. Calling again will not give new information. Use the results you have "
+         "and answer the user now, or call a DIFFERENT tool if something is missing.")
+FORCE_NUDGE = ("You are repeating tool calls without getting new information. "
+               "Stop calling tools and give your final answer with what you know.")
+
+
+class LoopGuard:
+    """Per-run detector for repeated tool calls and iterations without progress."""
+
+    def __init__(self, max_wasted: int = 2, agent: str = "agent"):
+        """
+        Args:
+            max_wasted: Wasted iterations before the final answer is forced
+            agent: Label for the metrics
+        """
+        self.max_wasted = max_wasted
+        self.agent = agent
+        self._results: Dict[str, str] = {}   # call fingerprint -> result
+        self._seen_results = set()           # hashes of every result so far
+        self._last_repeats: List[str] = []
+        self._last_wasted = False
+        self.force_answer = False
+        self.stats = {"iterations": 0, "repeated_calls": 0, "wasted_iterations": 0,
+                      "forced_answer": False}
+
+    @staticmethod
+    def fingerprint(name: str, arguments: Dict[str, Any]) -> str:
+        return ToolCache.make_key(name, arguments)
+
+    def run(self, tool_calls: List[Dict[str, Any]],
+            execute_calls: Callable[[List[Dict[str, Any]]], List[str]]) -> List[str]:
+        """
+        Execute the NEW calls of one message; repeats get their earlier result.
+
+        Returns one result string per call, in call order.
+        """
+        self.stats["iterations"] += 1
+        parsed = [parse_tool_call(call) for call in tool_calls]
+        keys = [self.fingerprint(name, arguments) for name, arguments in parsed]
+
+        # First occurrence of each new fingerprint runs; duplicates inside
+        # the same message share that one execution
+        fresh_keys = list(dict.fromkeys(key for key in keys if key not in self._results))
+        fresh_calls = [tool_calls[keys.index(key)] for key in fresh_keys]
+        repeats = [name for (name, _), key in zip(parsed, keys) if key in self._results]
+
+        new_information = False
+        if fresh_calls:
+            for key, content in zip(fresh_keys, execute_calls(fresh_calls)):
+                self._results[key] = content
+                digest = hashlib.sha256(str(content).encode("utf-8")).hexdigest()
+                if digest not in self._seen_results:
+                    self._seen_results.add(digest)
+                    new_information = True
+
+        if repeats:
+            self.stats["repeated_calls"] += len(repeats)
+            REPEATED_CALLS.inc(len(repeats), agent=self.agent)
+        self._last_repeats = repeats
+        self._last_wasted = not new_information
+        if self._last_wasted:
+            self.stats["wasted_iterations"] += 1
+            WASTED_ITERATIONS.inc(agent=self.agent)
+            if self.stats["wasted_iterations"] >= self.max_wasted and not self.force_answer:
+                self.force_answer = True
+                self.stats["forced_answer"] = True
+                FORCED_ANSWERS.inc(agent=self.agent)
+
+        return [self._results[key] for key in keys]
+
+    def nudge(self) -> Optional[Dict[str, str]]:
+        """A corrective system message after a wasted iteration, else None."""
+        if self.force_answer:
+            return {"role": "system", "content": FORCE_NUDGE}
+        if not self._last_wasted:
+            return None
+        calls = ", ".join(sorted(set(self._last_repeats))) or "these tools"
+        return {"role": "system", "content": NUDGE.format(calls=calls)}
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats)
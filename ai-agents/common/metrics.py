@@ -0,0 +1,270 @@
+"""
+Metrics - Ollama Performance Telemetry (Prometheus Format)
+==========================================================
+
+"The chat is slow" can mean three very different things:
+
+    cold start   -> load_duration is high     (model loaded into VRAM first)
+    long prompt  -> prompt_eval_duration high (history too big, see HistoryPolicy)
+    slow decode  -> eval_duration high        (model too big for the GPU)
+
+Ollama reports all of this in every response (in NANOseconds):
+
+    {"total_duration": ..., "load_duration": ...,
+     "prompt_eval_count": 26, "prompt_eval_duration": ...,
+     "eval_count": 290, "eval_duration": ..., "done": true}
+
+common/ollama_client.py records these numbers for EVERY call (plus the
+client-side time to first token for streams) in a small metrics registry.
+FastAPI apps publish it for Prometheus/Grafana with one line:
+
+    from common.metrics import instrument_app
+    instrument_app(app)        # adds GET /metrics + per-route request timing
+
+No extra dependency: the Prometheus text format is simple enough to write
+by hand.
+
+Author: Beyhan MEYRALI
+"""
+
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TOKENS_PER_SECOND_BUCKETS = (1, 5, 10, 20, 40, 80, 160, 320, 640, 1280)
+NANOSECONDS = 1e9
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+# =============================================================================
+# METRIC TYPES
+# =============================================================================
+
+class Counter:
+    """A value that only goes up (requests, tokens, ...)."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> Iterable[str]:
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                yield f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+
+
+class Histogram:
+    """Counts observations per bucket, plus their sum and count (latencies, ...)."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DURATION_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Tuple[str, ...], list] = {}  # key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = [0] * len(self.buckets) + [0.0, 0]
+                self._values[key] = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> Iterable[str]:
+        with self._lock:
+            for key, series in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, series):
+                    labels = _format_labels(self.labelnames, key, 'le="%s"' % bound)
+                    yield f"{self.name}_bucket{labels} {count}"
+                labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+                yield f"{self.name}_bucket{labels} {series[-1]}"
+                labels = _format_labels(self.labelnames, key)
+                yield f"{self.name}_sum{labels} {series[-2]}"
+                yield f"{self.name}_count{labels} {series[-1]}"
+
+
+class MetricsRegistry:
+    """A named collection of metrics that renders to the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, *args, **kwargs)
+                self._metrics[name] = metric
+            return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help_text, labelnames)
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DURATION_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, labelnames, buckets)
+
+    def render(self) -> str:
+        """The whole registry in Prometheus exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+# =============================================================================
+# OLLAMA METRICS
+# =============================================================================
+
+LABELS = ("model", "endpoint")
+
+OLLAMA_REQUESTS = REGISTRY.counter(
+    "ollama_requests_total", "Calls to the Ollama API", LABELS + ("status",))
+OLLAMA_REQUEST_SECONDS = REGISTRY.histogram(
+    "ollama_request_duration_seconds", "Client-side wall time of an Ollama call", LABELS)
+OLLAMA_TTFT_SECONDS = REGISTRY.histogram(
+    "ollama_time_to_first_token_seconds", "Streaming: request sent -> first token", LABELS)
+OLLAMA_LOAD_SECONDS = REGISTRY.histogram(
+    "ollama_load_duration_seconds", "Time Ollama spent loading the model", LABELS)
+OLLAMA_PROMPT_EVAL_SECONDS = REGISTRY.histogram(
+    "ollama_prompt_eval_duration_seconds", "Time Ollama spent reading the prompt", LABELS)
+OLLAMA_EVAL_SECONDS = REGISTRY.histogram(
+    "ollama_eval_duration_seconds", "Time Ollama spent generating the answer", LABELS)
+OLLAMA_PROMPT_TOKENS = REGISTRY.counter(
+    "ollama_prompt_tokens_total", "Prompt tokens evaluated", LABELS)
+OLLAMA_COMPLETION_TOKENS = REGISTRY.counter(
+    "ollama_completion_tokens_total", "Tokens generated", LABELS)
+OLLAMA_PROMPT_TPS = REGISTRY.histogram(
+    "ollama_prompt_tokens_per_second", "Prompt evaluation speed", LABELS,
+    buckets=TOKENS_PER_SECOND_BUCKETS)
+OLLAMA_DECODE_TPS = REGISTRY.histogram(
+    "ollama_decode_tokens_per_second", "Generation (decode) speed", LABELS,
+    buckets=TOKENS_PER_SECOND_BUCKETS)
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "FastAPI request handling time",
+    ("method", "route", "status"))
+
+
+def record_ollama_call(endpoint: str, model: Optional[str], elapsed: float,
+                       status: str = "200", data: Optional[Dict[str, Any]] = None):
+    """
+    Record one finished Ollama call.
+
+    Args:
+        endpoint: API path, e.g. "/api/chat"
+        model: Model name from the payload
+        elapsed: Client-side seconds for the whole call
+        status: HTTP status code, or "error" when no response arrived
+        data: The final response JSON (the `done` chunk for streams)
+    """
+    labels = {"model": model or "", "endpoint": endpoint}
+    OLLAMA_REQUESTS.inc(status=status, **labels)
+    OLLAMA_REQUEST_SECONDS.observe(elapsed, **labels)
+    if not data:
+        return
+
+    if data.get("load_duration") is not None:
+        OLLAMA_LOAD_SECONDS.observe(data["load_duration"] / NANOSECONDS, **labels)
+
+    prompt_tokens = data.get("prompt_eval_count") or 0
+    prompt_ns = data.get("prompt_eval_duration") or 0
+    if prompt_ns:
+        OLLAMA_PROMPT_EVAL_SECONDS.observe(prompt_ns / NANOSECONDS, **labels)
+        if prompt_tokens:
+            OLLAMA_PROMPT_TPS.observe(prompt_tokens / (prompt_ns / NANOSECONDS), **labels)
+    if prompt_tokens:
+        OLLAMA_PROMPT_TOKENS.inc(prompt_tokens, **labels)
+
+    eval_tokens = data.get("eval_count") or 0
+    eval_ns = data.get("eval_duration") or 0
+    if eval_ns:
+        OLLAMA_EVAL_SECONDS.observe(eval_ns / NANOSECONDS, **labels)
+        if eval_tokens:
+            OLLAMA_DECODE_TPS.observe(eval_tokens / (eval_ns / NANOSECONDS), **labels)
+    if eval_tokens:
+        OLLAMA_COMPLETION_TOKENS.inc(eval_tokens, **labels)
+
+
+def record_time_to_first_token(endpoint: str, model: Optional[str], seconds: float):
+    """Streaming only: seconds from sending the request to the first token."""
+    OLLAMA_TTFT_SECONDS.observe(seconds, model=model or "", endpoint=endpoint)
+
+
+def chunk_text(chunk: Dict[str, Any]) -> str:
+    """The generated text inside one stream chunk (/api/chat or /api/generate)."""
+    return (chunk.get("message") or {}).get("content") or chunk.get("response") or ""
+
+
+# =============================================================================
+# FASTAPI INTEGRATION
+# =============================================================================
+
+def instrument_app(app):
+    """Add GET /metrics and request timing per route to a FastAPI app."""
+    from fastapi import Request
+    from fastapi.responses import Response
+
+    @app.middleware("http")
+    async def _time_requests(request: Request, call_next):
+        start = time.perf_counter()
+        status = "500"
+        try:
+            response = await call_next(request)
+            status = str(response.status_code)
+            return response
+        finally:
+            # Route template ("/chat/{query}"), not the raw path: keeps the label set small.
+            # For streaming responses this is the time until the headers were sent.
+            route = request.scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, method=request.method,
+                                         route=getattr(route, "path", "unmatched"),
+                                         status=status)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        """Prometheus scrape endpoint."""
+        return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+    return app
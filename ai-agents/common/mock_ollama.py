@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+Mock Ollama - A Deterministic Stand-In Server for Tests and Benchmarks
+======================================================================
+
+Every test_runner.py needs a real Ollama with a real model. That is great
+for checking answers, but useless for measuring OUR code: a 3 second
+generation hides a 3 millisecond client-side regression completely.
+
+This server speaks the Ollama HTTP API with scripted answers:
+
+    /api/chat, /api/generate      (NDJSON streaming or one JSON response)
+    /api/embeddings, /api/embed   (deterministic bag-of-words vectors)
+    /api/tags, /api/ps, /api/version
+
+Timing is configurable and reproducible:
+
+    ttft          seconds before the first token
+    token_delay   seconds between tokens
+    load_time     extra delay for the FIRST request per model (a "cold load")
+    error_rate    fraction of requests answered with `error_status`
+    seed          random seed, so injected errors are the same on every run
+
+Run it:
+    python common/mock_ollama.py --port 11435 --script common/mock_scripts/tool_calling.json
+
+Point any example at it (get_client() and the test runners read OLLAMA_BASE_URL,
+LangChain's ChatOllama/OllamaLLM read OLLAMA_HOST):
+    OLLAMA_BASE_URL=http://localhost:11435 OLLAMA_HOST=http://localhost:11435 python test_runner.py
+
+Script format (JSON, first matching rule wins):
+    {
+      "ttft": 0.05, "token_delay": 0.01,
+      "rules": [
+        {"match": "weather in (\\w+)", "requires_tools": true,
+         "tool_calls": [{"name": "get_weather", "arguments": {"city": "\\1"}}]},
+        {"after_tool": true, "content": "Here you go: {tool_result}"},
+        {"match": "capital of France", "thinking": "Easy one.", "content": "Paris."},
+        {"match": "crash", "error": 500}
+      ]
+    }
+
+Rule keys: match (regex on the last user message), after_tool (last message
+is a tool result), tool_match (regex on that tool result), requires_tools
+(true, or the name of a tool the request must offer), model, content,
+thinking, tool_calls, error, ttft, token_delay. Regex groups (\\1) work in
+content and string tool arguments; {question} and {tool_result} too.
+Tool calls are streamed one chunk per call, each after the token_delay its
+JSON would take to generate.
+
+Author: Beyhan MEYRALI
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DEFAULT_MODELS = ["qwen3:8b", "qwen3:4b", "ministral-3:3b", "qwen3-embedding:0.6b"]
+TOKEN_PATTERN = re.compile(r"\s*\S+|\s+")
+NANOSECONDS = 1_000_000_000
+
+
+# =============================================================================
+# CONFIGURATION + SCRIPT
+# =============================================================================
+
+class MockConfig:
+    """Timing, error injection and the scripted rules of one mock server."""
+
+    def __init__(self,
+                 rules: Optional[List[Dict[str, Any]]] = None,
+                 ttft: float = 0.05,
+                 token_delay: float = 0.01,
+                 load_time: float = 0.0,
+                 error_rate: float = 0.0,
+                 error_status: int = 500,
+                 seed: int = 0,
+                 embedding_dim: int = 1024,
+                 models: Optional[List[str]] = None):
+        self.rules = rules or []
+        self.ttft = ttft
+        self.token_delay = token_delay
+        self.load_time = load_time
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.seed = seed
+        self.embedding_dim = embedding_dim
+        self.models = models or list(DEFAULT_MODELS)
+
+    @classmethod
+    def from_file(cls, path: str, **overrides) -> "MockConfig":
+        """Load a script file; keyword overrides (e.g. from the CLI) win."""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        options = {key: value for key, value in data.items()
+                   if key in ("ttft", "token_delay", "load_time", "error_rate", "error_status",
+                              "seed", "embedding_dim", "models")}
+        options.update({key: value for key, value in overrides.items() if value is not None})
+        return cls(rules=data.get("rules", []), **options)
+
+
+def _last_content(messages: List[Dict[str, Any]], role: str) -> str:
+    for message in reversed(messages):
+        if message.get("role") == role:
+            return message.get("content") or ""
+    return ""
+
+
+def _expand(value: Any, match: Optional[re.Match], values: Dict[str, str]) -> Any:
+    """Fill regex groups (\\1) and {question}/{tool_result} into strings (recursively)."""
+    if isinstance(value, str):
+        if match is not None:
+            value = match.expand(value)
+        for key, text in values.items():
+            value = value.replace("{" + key + "}", text)
+        return value
+    if isinstance(value, dict):
+        return {key: _expand(item, match, values) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_expand(item, match, values) for item in value]
+    return value
+
+
+def build_reply(config: MockConfig, model: str, messages: List[Dict[str, Any]],
+                tools: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Pick the first matching rule and turn it into a reply description."""
+    question = _last_content(messages, "user")
+    last_role = messages[-1].get("role") if messages else "user"
+    tool_result = messages[-1].get("content", "") if last_role == "tool" else ""
+    tool_names = {tool.get("function", {}).get("name") for tool in tools}
+    values = {"question": question, "tool_result": tool_result}
+
+    for rule in config.rules:
+        if rule.get("model") and rule["model"] != model:
+            continue
+        required = rule.get("requires_tools")
+        if required and (not tools or (isinstance(required, str) and required not in tool_names)):
+            continue
+        if "after_tool" in rule and bool(rule["after_tool"]) != (last_role == "tool"):
+            continue
+        match = None
+        if rule.get("match"):
+            match = re.search(rule["match"], question, re.IGNORECASE)
+            if match is None:
+                continue
+        if rule.get("tool_match"):
+            # Chain tool calls: regex groups come from the last tool result
+            match = re.search(rule["tool_match"], tool_result) if last_role == "tool" else None
+            if match is None:
+                continue
+        reply = _expand({key: rule[key] for key in ("content", "thinking", "tool_calls")
+                         if key in rule}, match, values)
+        reply.update({key: rule[key] for key in ("error", "ttft", "token_delay") if key in rule})
+        return reply
+
+    # No rule matched: a predictable default answer
+    if last_role == "tool":
+        return {"content": f"Based on the tool result: {tool_result}"}
+    return {"content": f"Mock answer to: {question}"}
+
+
+def embed_text(text: str, dim: int) -> List[float]:
+    """
+    Deterministic bag-of-words embedding.
+
+    Texts that share words get similar vectors, so retrieval demos still
+    return sensible neighbours without a real embedding model.
+    """
+    vector = [0.0] * dim
+    for word in re.findall(r"\w+", text.lower()):
+        digest = hashlib.sha256(word.encode("utf-8")).digest()
+        index = int.from_bytes(digest[:4], "big") % dim
+        vector[index] += 1.0 if digest[4] % 2 == 0 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector))
+    if norm == 0:
+        vector[0] = 1.0
+        return vector
+    return [v / norm for v in vector]
+
+
+# =============================================================================
+# THE SERVER
+# =============================================================================
+
+def create_app(config: Optional[MockConfig] = None) -> FastAPI:
+    """Build the mock Ollama FastAPI app (also usable in-process with httpx)."""
+    config = config or MockConfig()
+    app = FastAPI(title="Mock Ollama")
+    rng = random.Random(config.seed)
+    loaded_models: Dict[str, float] = {}
+    app.state.config = config
+    app.state.stats = {"requests": 0, "errors_injected": 0}
+
+    def load_delay(model: str) -> float:
+        if model in loaded_models:
+            return 0.0
+        loaded_models[model] = time.time()
+        return config.load_time
+
+    def injected_error(reply: Dict[str, Any]) -> Optional[JSONResponse]:
+        app.state.stats["requests"] += 1
+        status = reply.get("error")
+        if status is None and config.error_rate and rng.random() < config.error_rate:
+            status = config.error_status
+        if status is None:
+            return None
+        app.state.stats["errors_injected"] += 1
+        return JSONResponse({"error": f"mock error {status}"}, status_code=int(status))
+
+    def visible_parts(reply: Dict[str, Any], think: Optional[bool]):
+        """(thinking field, content text) the way Ollama returns them."""
+        thinking = reply.get("thinking")
+        content = reply.get("content", "")
+        if not thinking or think is False:
+            return None, content
+        if think:
+            return thinking, content       # separate "thinking" field
+        return None, f"<think>{thinking}</think>\n\n{content}"  # qwen3 default: inline tags
+
+    def stats(model: str, prompt_text: str, tokens: int, ttft: float, token_delay: float,
+              load: float) -> Dict[str, Any]:
+        prompt_tokens = max(1, len(prompt_text) // 4)
+        eval_ns = int(tokens * token_delay * NANOSECONDS)
+        prompt_ns = int(ttft * NANOSECONDS)
+        load_ns = int(load * NANOSECONDS)
+        return {"model": model, "created_at": datetime.now(timezone.utc).isoformat(),
+                "done": True, "done_reason": "stop",
+                "total_duration": load_ns + prompt_ns + eval_ns, "load_duration": load_ns,
+                "prompt_eval_count": prompt_tokens, "prompt_eval_duration": prompt_ns,
+                "eval_count": tokens, "eval_duration": eval_ns}
+
+    async def respond(body: Dict[str, Any], messages: List[Dict[str, Any]], generate: bool):
+        model = body.get("model", "")
+        reply = build_reply(config, model, messages, body.get("tools") or [])
+        error = injected_error(reply)
+        if error is not None:
+            return error
+
+        load = load_delay(model)
+        prompt_time = reply.get("ttft", config.ttft)
+        ttft = load + prompt_time
+        token_delay = reply.get("token_delay", config.token_delay)
+        thinking, content = visible_parts(reply, body.get("think"))
+        tool_calls = [{"function": {"name": call["name"], "arguments": call.get("arguments", {})}}
+                      for call in reply.get("tool_calls", [])]
+        tokens = TOKEN_PATTERN.findall((thinking or "") + content)
+        # A model "writes" each tool call's JSON too - that takes decode time
+        call_tokens = [len(TOKEN_PATTERN.findall(json.dumps(call["function"]))) for call in tool_calls]
+        final = stats(model, json.dumps(messages), len(tokens), prompt_time, token_delay, load)
+        if generate:
+            # Fake token ids that grow turn by turn, like the real `context`
+            start = len(body.get("context") or [])
+            final["context"] = list(body.get("context") or []) + list(
+                range(start, start + final["prompt_eval_count"] + len(tokens)))
+
+        def message(text: str = "", **extra) -> Dict[str, Any]:
+            if generate:
+                return {"response": text, **extra}
+            return {"message": {"role": "assistant", "content": text, **extra}}
+
+        if body.get("stream", True) is False:
+            await asyncio.sleep(ttft + token_delay * (len(tokens) + sum(call_tokens)))
+            extra = {}
+            if thinking:
+                extra["thinking"] = thinking
+            if tool_calls and not generate:
+                extra["tool_calls"] = tool_calls
+            return JSONResponse({**final, **message(content, **extra)})
+
+        async def ndjson():
+            await asyncio.sleep(ttft)
+            if thinking:
+                for token in TOKEN_PATTERN.findall(thinking):
+                    yield json.dumps({"model": model, "done": False,
+                                      **message("", thinking=token)}) + "\n"
+                    await asyncio.sleep(token_delay)
+            for token in TOKEN_PATTERN.findall(content):
+                yield json.dumps({"model": model, "done": False, **message(token)}) + "\n"
+                await asyncio.sleep(token_delay)
+            if not generate:
+                # Like Ollama: one chunk per tool call, as soon as it is complete
+                for call, count in zip(tool_calls, call_tokens):
+                    await asyncio.sleep(token_delay * count)
+                    yield json.dumps({"model": model, "done": False,
+                                      **message("", tool_calls=[call])}) + "\n"
+            yield json.dumps({**final, **message("")}) + "\n"
+
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    @app.post("/api/chat")
+    async def chat(request: Request):
+        body = await request.json()
+        return await respond(body, body.get("messages", []), generate=False)
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        body = await request.json()
+        messages = []
+        if body.get("system"):
+            messages.append({"role": "system", "content": body["system"]})
+        messages.append({"role": "user", "content": body.get("prompt", "")})
+        return await respond(body, messages, generate=True)
+
+    @app.post("/api/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        return {"embedding": embed_text(body.get("prompt", ""), config.embedding_dim)}
+
+    @app.post("/api/embed")
+    async def embed(request: Request):
+        body = await request.json()
+        inputs = body.get("input", "")
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        return {"model": body.get("model", ""),
+                "embeddings": [embed_text(text, config.embedding_dim) for text in inputs]}
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [{"name": name, "model": name, "size": 0, "digest": "mock",
+                            "modified_at": "2025-01-01T00:00:00Z"} for name in config.models]}
+
+    @app.get("/api/ps")
+    async def ps():
+        return {"models": [{"name": name, "model": name, "size": 0} for name in loaded_models]}
+
+    @app.get("/api/version")
+    async def version():
+        return {"version": "0.0.0-mock"}
+
+    @app.get("/")
+    async def root():
+        return "Ollama is running"
+
+    return app
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Deterministic mock Ollama server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--script", help="JSON file with scripted rules")
+    parser.add_argument("--ttft", type=float, help="Seconds before the first token")
+    parser.add_argument("--token-delay", type=float, help="Seconds between tokens")
+    parser.add_argument("--load-time", type=float, help="Extra delay on the first call per model")
+    parser.add_argument("--error-rate", type=float, help="Fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, help="HTTP status for injected errors")
+    parser.add_argument("--seed", type=int, help="Random seed for error injection")
+    args = parser.parse_args()
+
+    overrides = {"ttft": args.ttft, "token_delay": args.token_delay, "load_time": args.load_time,
+                 "error_rate": args.error_rate, "error_status": args.error_status,
+                 "seed": args.seed}
+    if args.script:
+        config = MockConfig.from_file(args.script, **overrides)
+    else:
+        config = MockConfig(**{key: value for key, value in overrides.items() if value is not None})
+
+    print(f"[OK] Mock Ollama on http://{args.host}:{args.port} "
+          f"(ttft={config.ttft}s, token_delay={config.token_delay}s, "
+          f"error_rate={config.error_rate}, rules={len(config.rules)})")
+    print(f"[INFO] Use it with: OLLAMA_BASE_URL=http://{args.host}:{args.port}")
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
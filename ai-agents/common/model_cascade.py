@@ -0,0 +1,219 @@
+"""
+Model Cascade - Small Model First, Big Model Only When Needed
+=============================================================
+
+Most questions are easy: "What is the capital of France?" does not need an
+8B model. A cascade asks a SMALL model first and only escalates when the
+answer looks unreliable:
+
+    question --> ministral-3:3b --> looks fine? --> answer   (fast path)
+                                         |
+                                         no (refusal, empty, cut off,
+                                         low self-reported confidence)
+                                         v
+                                     qwen3:8b ------------> answer   (slow path)
+
+How "looks fine" is judged (cheap heuristics, no extra LLM call):
+- empty answer (whitespace only - "4" is a perfectly good answer)
+- the answer was cut off (done_reason == "length")
+- refusal / "I'm not sure" phrases
+- optional: the small model rates its own confidence ("Confidence: 4/10")
+
+Every decision is recorded in common/metrics.py:
+
+    cascade_requests_total{model}                  which model answered
+    cascade_escalations_total{model, reason}       why a model was skipped
+    cascade_estimated_seconds_saved_total          vs. always using the big model
+
+Usage (same call as OllamaClient.chat):
+    cascade = ModelCascade(["ministral-3:3b", "qwen3:8b"])
+    data = cascade.chat({"messages": [{"role": "user", "content": "2+2?"}]})
+    data["message"]["content"], data["cascade"]["model"]
+
+Author: Beyhan MEYRALI
+"""
+
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import requests
+
+from common.metrics import REGISTRY
+from common.ollama_client import get_client
+
+DEFAULT_MODELS = ("ministral-3:3b", "qwen3:8b")
+
+REFUSAL_PATTERN = re.compile(
+    r"\b(?:I (?:do not|don't) know|I(?:'m| am) not (?:sure|certain)|"
+    r"I (?:cannot|can't|am unable to|'m unable to) (?:answer|help|determine|provide)|"
+    r"as an AI|I have no (?:information|idea)|unclear to me)\b",
+    re.IGNORECASE,
+)
+CONFIDENCE_PATTERN = re.compile(r"\n*\s*Confidence:\s*(\d+(?:\.\d+)?)\s*/\s*10\s*\.?\s*$",
+                                re.IGNORECASE)
+CONFIDENCE_INSTRUCTION = ("After your answer, add one last line exactly like "
+                          "'Confidence: N/10' rating how sure you are.")
+THINK_PATTERN = re.compile(r"<think>.*?</think>", re.DOTALL)
+
+Judge = Callable[[str, Dict[str, Any], Optional[float]], Optional[str]]
+
+CASCADE_REQUESTS = REGISTRY.counter(
+    "cascade_requests_total", "Cascade answers by the model that answered", ("model",))
+CASCADE_ESCALATIONS = REGISTRY.counter(
+    "cascade_escalations_total", "Answers rejected by the cascade (model skipped)",
+    ("model", "reason"))
+CASCADE_SECONDS_SAVED = REGISTRY.counter(
+    "cascade_estimated_seconds_saved_total",
+    "Estimated seconds saved by not calling the largest model")
+
+
+def judge_answer(text: str, data: Dict[str, Any], confidence: Optional[float] = None,
+                 min_chars: int = 1, min_confidence: float = 7) -> Optional[str]:
+    """
+    Default confidence check. Returns the escalation reason, or None = accept.
+
+    Args:
+        text: Answer without <think> blocks and without the confidence line
+        data: The full Ollama response (done_reason, eval_count, ...)
+        confidence: Self-reported 0-10 score, if it was asked for
+        min_chars: Shorter answers (after stripping whitespace) escalate
+    """
+    if len(text.strip()) < min_chars:
+        return "empty"
+    if data.get("done_reason") == "length":
+        return "truncated"
+    if REFUSAL_PATTERN.search(text):
+        return "refusal"
+    if confidence is not None and confidence < min_confidence:
+        return "low_confidence"
+    return None
+
+
+class ModelCascade:
+    """Try models from cheapest to most capable; stop at the first good answer."""
+
+    def __init__(self,
+                 models: Sequence[str] = DEFAULT_MODELS,
+                 client: Any = None,
+                 self_report: bool = False,
+                 min_confidence: float = 7,
+                 judge: Optional[Judge] = None):
+        """
+        Args:
+            models: Cheapest first; the LAST model's answer is always accepted
+            client: OllamaClient / BackendPool (default: get_client())
+            self_report: Ask the smaller models for a "Confidence: N/10" line
+            min_confidence: Escalate below this self-reported score
+            judge: Custom check (text, data, confidence) -> reason or None
+        """
+        if not models:
+            raise ValueError("ModelCascade needs at least one model")
+        self.models = list(models)
+        self.client = client or get_client()
+        self.self_report = self_report
+        self.min_confidence = min_confidence
+        self.judge = judge or (lambda text, data, confidence: judge_answer(
+            text, data, confidence, min_confidence=self.min_confidence))
+
+        self._lock = threading.Lock()
+        self._avg_seconds: Dict[str, float] = {}  # moving average latency per model
+        self.stats = {"requests": 0, "escalations": 0, "seconds_saved": 0.0,
+                      "answered_by": {model: 0 for model in self.models}}
+
+    def chat(self, payload: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        """
+        Like OllamaClient.chat(), but walks the cascade.
+
+        The returned JSON has an extra "cascade" field:
+            {"model": "ministral-3:3b", "escalations": [], "seconds": 0.4}
+        """
+        started = time.monotonic()
+        escalations: List[Dict[str, str]] = []
+
+        for index, model in enumerate(self.models):
+            last = index == len(self.models) - 1
+            ask_confidence = self.self_report and not last
+            request = self._request(payload, model, ask_confidence)
+
+            call_started = time.monotonic()
+            try:
+                data = self.client.chat(request, **kwargs)
+            except requests.exceptions.RequestException:
+                if last:
+                    raise
+                self._escalate(model, "error", escalations)  # e.g. model not pulled
+                continue
+            self._observe(model, time.monotonic() - call_started)
+
+            text, confidence = self._answer_text(data, strip_confidence=ask_confidence)
+            reason = None if last else self.judge(text, data, confidence)
+            if reason is not None:
+                self._escalate(model, reason, escalations)
+                continue
+
+            elapsed = time.monotonic() - started
+            self._accept(model, last, elapsed)
+            data["cascade"] = {"model": model, "escalations": escalations,
+                               "confidence": confidence, "seconds": round(elapsed, 3)}
+            return data
+
+        raise RuntimeError("unreachable: the last model always answers")
+
+    # -------------------------------------------------------------------------
+    # Helpers
+    # -------------------------------------------------------------------------
+
+    def _request(self, payload: Dict[str, Any], model: str, ask_confidence: bool) -> Dict[str, Any]:
+        request = {**payload, "model": model}
+        if ask_confidence:
+            request["messages"] = list(payload.get("messages", [])) + [
+                {"role": "system", "content": CONFIDENCE_INSTRUCTION}]
+        return request
+
+    @staticmethod
+    def _answer_text(data: Dict[str, Any], strip_confidence: bool):
+        """Visible answer (no <think>) + self-reported confidence (also removed from data)."""
+        message = data.get("message") or {}
+        content = message.get("content") or ""
+        confidence = None
+        if strip_confidence:
+            match = CONFIDENCE_PATTERN.search(content)
+            if match:
+                confidence = float(match.group(1))
+                content = content[:match.start()].rstrip()
+                message["content"] = content
+        return THINK_PATTERN.sub("", content).strip(), confidence
+
+    def _observe(self, model: str, seconds: float):
+        with self._lock:
+            previous = self._avg_seconds.get(model)
+            self._avg_seconds[model] = seconds if previous is None else 0.8 * previous + 0.2 * seconds
+
+    def _escalate(self, model: str, reason: str, escalations: List[Dict[str, str]]):
+        escalations.append({"model": model, "reason": reason})
+        CASCADE_ESCALATIONS.inc(model=model, reason=reason)
+        with self._lock:
+            self.stats["escalations"] += 1
+
+    def _accept(self, model: str, last: bool, elapsed: float):
+        CASCADE_REQUESTS.inc(model=model)
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["answered_by"][model] += 1
+            big = self._avg_seconds.get(self.models[-1])
+            if not last and big is not None and big > elapsed:
+                # Estimate: what the big model usually takes, minus what we spent
+                self.stats["seconds_saved"] += big - elapsed
+                CASCADE_SECONDS_SAVED.inc(big - elapsed)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Who answered, how often we escalated and the estimated time saved."""
+        with self._lock:
+            requests_count = self.stats["requests"]
+            small = requests_count - self.stats["answered_by"][self.models[-1]]
+            return {**self.stats, "answered_by": dict(self.stats["answered_by"]),
+                    "seconds_saved": round(self.stats["seconds_saved"], 2),
+                    "small_model_rate": round(small / requests_count, 3) if requests_count else 0.0,
+                    "avg_seconds": {m: round(s, 3) for m, s in self._avg_seconds.items()}}
@@ -0,0 +1,508 @@
+"""
+Shared Ollama HTTP Client - Pooled Keep-Alive Connections
+=========================================================
+
+Every example used to call `requests.post(...)` directly. That works, but each
+call opens a brand new TCP connection and closes it again afterwards.
+For short answers the connection setup is a noticeable part of the latency!
+
+This module keeps ONE pooled `requests.Session` per Ollama host and shares it
+with every caller in the course.
+
+What you get:
+- Keep-alive connections (re-used between turns)
+- Configurable pool size (how many parallel connections per host)
+- Automatic retries for connection errors and 502/503/504
+- Per-call deadlines (a hard wall-clock limit for the whole call)
+- An asyncio twin (AsyncOllamaClient, built on httpx) for FastAPI apps
+- Telemetry for every call (load / prompt / decode time, tokens/s, time to
+  first token) in common/metrics.py
+
+Usage:
+    from common.ollama_client import get_client
+
+    ollama = get_client()                       # shared client for OLLAMA_BASE_URL
+    response = ollama.post("/api/chat", json=payload, timeout=60)
+    data = ollama.chat(payload, deadline=30)    # raises on HTTP errors
+
+    for chunk in ollama.stream("/api/chat", payload):   # NDJSON streaming
+        print(chunk["message"]["content"], end="")
+
+Several Ollama hosts? Pass a list (or "url1,url2") or set OLLAMA_BASE_URLS,
+and get_client() returns a load-balancing BackendPool (common/backend_pool.py)
+with the same API.
+
+Configuration (environment variables, see ai-agents/.env.example):
+    OLLAMA_BASE_URL     default host       (http://localhost:11434)
+    OLLAMA_BASE_URLS    several hosts, comma separated (optional)
+    OLLAMA_POOL_SIZE    connections/host   (10)
+    OLLAMA_MAX_RETRIES  retry attempts     (2)
+    OLLAMA_TIMEOUT      read timeout in s  (60)
+    OLLAMA_CASSETTE     record/replay all traffic to this JSONL file (common/cassette.py)
+
+Author: Beyhan MEYRALI
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple, Union
+
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from common.metrics import chunk_text, record_ollama_call, record_time_to_first_token
+
+try:
+    import httpx  # Only needed for AsyncOllamaClient (FastAPI services)
+except ImportError:
+    httpx = None
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+DEFAULT_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+DEFAULT_BASE_URLS = os.getenv("OLLAMA_BASE_URLS", "")
+DEFAULT_POOL_SIZE = int(os.getenv("OLLAMA_POOL_SIZE", "10"))
+DEFAULT_MAX_RETRIES = int(os.getenv("OLLAMA_MAX_RETRIES", "2"))
+DEFAULT_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", "60"))
+DEFAULT_CONNECT_TIMEOUT = 5.0
+
+Timeout = Union[None, float, Tuple[float, float]]
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """Raised when a call runs past its per-call deadline."""
+
+
+# =============================================================================
+# TELEMETRY HELPERS
+# =============================================================================
+
+def _endpoint(path: str) -> str:
+    """API path used as the metrics label ("http://host/api/chat" -> "/api/chat")."""
+    return urlsplit(path).path if "://" in path else "/" + path.lstrip("/")
+
+
+def _record_response(path: str, payload: Optional[Dict[str, Any]], response, elapsed: float,
+                     read_body: bool = True):
+    """Record a finished call; the timing stats come from the JSON body."""
+    data = None
+    if read_body and payload is not None and response.status_code == 200:
+        try:
+            data = response.json()
+        except ValueError:
+            # Streamed NDJSON ("stream" not set to false): the last line has the stats
+            lines = response.text.strip().splitlines()
+            try:
+                data = json.loads(lines[-1]) if lines else None
+            except ValueError:
+                data = None
+    record_ollama_call(_endpoint(path), (payload or {}).get("model"), elapsed,
+                       str(response.status_code), data if isinstance(data, dict) else None)
+
+
+# =============================================================================
+# THE CLIENT
+# =============================================================================
+
+class OllamaClient:
+    """
+    Thin wrapper around a pooled `requests.Session` for one Ollama host.
+
+    It returns normal `requests.Response` objects, so existing code that checks
+    `response.status_code` or catches `requests.exceptions.RequestException`
+    keeps working unchanged.
+    """
+
+    def __init__(self,
+                 base_url: Optional[str] = None,
+                 pool_size: int = DEFAULT_POOL_SIZE,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 backoff_factor: float = 0.3,
+                 timeout: float = DEFAULT_TIMEOUT,
+                 connect_timeout: float = DEFAULT_CONNECT_TIMEOUT):
+        """
+        Create a client with its own connection pool.
+
+        Args:
+            base_url: Ollama host (default: OLLAMA_BASE_URL or http://localhost:11434)
+            pool_size: Max keep-alive connections kept open to the host
+            max_retries: Retries for connect errors and 502/503/504 responses
+            backoff_factor: Sleep between retries = backoff_factor * 2^(retry-1)
+            timeout: Default read timeout in seconds
+            connect_timeout: Timeout for establishing the TCP connection
+        """
+        self.base_url = (base_url or DEFAULT_BASE_URL).rstrip("/")
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+
+        # Retry only when the request never reached the model (connect errors)
+        # or the server said "try again" - never on read timeouts, because a
+        # slow generation would otherwise be started twice.
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=0,
+            status=max_retries,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET", "POST"}),
+            backoff_factor=backoff_factor,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                              max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    # -------------------------------------------------------------------------
+    # Low-level HTTP helpers
+    # -------------------------------------------------------------------------
+
+    def url(self, path: str) -> str:
+        """Turn "/api/chat" into a full URL (full URLs are passed through)."""
+        if "://" in path:
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def _timeout(self, timeout: Timeout, deadline_at: Optional[float]) -> Tuple[float, float]:
+        """Build a (connect, read) timeout tuple that respects the deadline."""
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+        else:
+            connect, read = self.connect_timeout, timeout or self.timeout
+
+        if deadline_at is not None:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceeded("Deadline exceeded before the request was sent")
+            connect, read = min(connect, remaining), min(read, remaining)
+        return connect, read
+
+    def request(self, method: str, path: str,
+                timeout: Timeout = None,
+                deadline: Optional[float] = None,
+                **kwargs) -> requests.Response:
+        """
+        Send a request through the pooled session.
+
+        Args:
+            method: "GET" or "POST"
+            path: API path ("/api/chat") or a full URL
+            timeout: Read timeout (or a (connect, read) tuple); default self.timeout
+            deadline: Hard limit in seconds for the WHOLE call, including retries
+            **kwargs: Passed to requests (json=..., stream=..., ...)
+        """
+        deadline_at = time.monotonic() + deadline if deadline is not None else None
+        started = time.monotonic()
+        try:
+            response = self.session.request(
+                method, self.url(path),
+                timeout=self._timeout(timeout, deadline_at),
+                **kwargs
+            )
+        except requests.exceptions.RequestException as e:
+            record_ollama_call(_endpoint(path), (kwargs.get("json") or {}).get("model"),
+                               time.monotonic() - started, "error")
+            if (isinstance(e, requests.exceptions.Timeout) and deadline_at is not None
+                    and time.monotonic() >= deadline_at):
+                raise DeadlineExceeded(f"Deadline of {deadline}s exceeded") from e
+            raise
+
+        _record_response(path, kwargs.get("json"), response, time.monotonic() - started,
+                         read_body=not kwargs.get("stream"))
+
+        if deadline_at is not None and time.monotonic() > deadline_at:
+            response.close()
+            raise DeadlineExceeded(f"Deadline of {deadline}s exceeded")
+        return response
+
+    def post(self, path: str, json: Optional[Dict[str, Any]] = None, **kwargs) -> requests.Response:
+        """POST helper - same signature style as `requests.post`."""
+        return self.request("POST", path, json=json, **kwargs)
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        """GET helper - same signature style as `requests.get`."""
+        return self.request("GET", path, **kwargs)
+
+    # -------------------------------------------------------------------------
+    # Convenience API wrappers
+    # -------------------------------------------------------------------------
+
+    def stream(self, path: str, payload: Dict[str, Any],
+               deadline: Optional[float] = None,
+               timeout: Timeout = None) -> Iterator[Dict[str, Any]]:
+        """
+        POST with "stream": true and yield each NDJSON chunk as a dict.
+
+        Ollama streams one JSON object per line:
+            {"message": {"content": "Hel"}, "done": false}
+            {"message": {"content": "lo"}, "done": false}
+            {"done": true, "eval_count": 42, ...}
+
+        The deadline is checked between chunks, so a runaway generation
+        is cut off even while tokens keep arriving.
+        """
+        deadline_at = time.monotonic() + deadline if deadline is not None else None
+        payload = {**payload, "stream": True}
+        endpoint, model = _endpoint(path), payload.get("model")
+        started = time.monotonic()
+        try:
+            response = self.session.post(
+                self.url(path), json=payload, stream=True,
+                timeout=self._timeout(timeout, deadline_at)
+            )
+        except requests.exceptions.RequestException:
+            record_ollama_call(endpoint, model, time.monotonic() - started, "error")
+            raise
+
+        status, final_chunk, first_token = str(response.status_code), None, True
+        try:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if deadline_at is not None and time.monotonic() > deadline_at:
+                    raise DeadlineExceeded(f"Deadline of {deadline}s exceeded while streaming")
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    raise requests.exceptions.HTTPError(chunk["error"], response=response)
+                if first_token and chunk_text(chunk):
+                    first_token = False
+                    record_time_to_first_token(endpoint, model, time.monotonic() - started)
+                yield chunk
+                if chunk.get("done"):
+                    final_chunk = chunk
+                    break
+        except Exception:
+            status = "error" if status == "200" else status
+            raise
+        finally:
+            response.close()
+            record_ollama_call(endpoint, model, time.monotonic() - started, status, final_chunk)
+
+    def chat(self, payload: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        """Call /api/chat (non-streaming) and return the parsed JSON."""
+        payload = {**payload, "stream": False}
+        response = self.post("/api/chat", json=payload, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    def embeddings(self, model: str, prompt: str, **kwargs) -> list:
+        """Call /api/embeddings and return the embedding vector."""
+        response = self.post("/api/embeddings", json={"model": model, "prompt": prompt}, **kwargs)
+        response.raise_for_status()
+        return response.json()["embedding"]
+
+    def is_alive(self, timeout: float = 5) -> bool:
+        """Quick health check against /api/tags."""
+        try:
+            return self.get("/api/tags", timeout=timeout).status_code == 200
+        except requests.exceptions.RequestException:
+            return False
+
+    def close(self):
+        """Close all pooled connections."""
+        self.session.close()
+
+
+# =============================================================================
+# THE ASYNC CLIENT (for FastAPI / asyncio code)
+# =============================================================================
+
+class AsyncOllamaClient:
+    """
+    asyncio version of OllamaClient built on `httpx.AsyncClient`.
+
+    Inside an `async def` FastAPI handler you must NOT call the blocking
+    `requests` library - it freezes the event loop and every other client
+    waits. httpx awaits the network instead, so one uvicorn worker can serve
+    many chats at the same time.
+    """
+
+    def __init__(self,
+                 base_url: Optional[str] = None,
+                 pool_size: int = DEFAULT_POOL_SIZE,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 timeout: float = DEFAULT_TIMEOUT,
+                 connect_timeout: float = DEFAULT_CONNECT_TIMEOUT):
+        """Same options as OllamaClient (retries cover connect errors only)."""
+        if httpx is None:
+            raise ImportError("AsyncOllamaClient needs httpx: pip install httpx")
+
+        self.base_url = (base_url or DEFAULT_BASE_URL).rstrip("/")
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.http = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_size,
+                                max_keepalive_connections=pool_size),
+            transport=httpx.AsyncHTTPTransport(retries=max_retries),
+        )
+
+    def _timeout(self, timeout: Optional[float], deadline_at: Optional[float]):
+        read = timeout or self.timeout
+        connect = self.connect_timeout
+        if deadline_at is not None:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceeded("Deadline exceeded before the request was sent")
+            connect, read = min(connect, remaining), min(read, remaining)
+        return httpx.Timeout(read, connect=connect)
+
+    async def post(self, path: str, json: Optional[Dict[str, Any]] = None,
+                   timeout: Optional[float] = None,
+                   deadline: Optional[float] = None) -> "httpx.Response":
+        """POST through the pooled async client (path or full URL)."""
+        deadline_at = time.monotonic() + deadline if deadline is not None else None
+        started = time.monotonic()
+        try:
+            response = await self.http.post(path, json=json,
+                                            timeout=self._timeout(timeout, deadline_at))
+        except httpx.HTTPError as e:
+            record_ollama_call(_endpoint(path), (json or {}).get("model"),
+                               time.monotonic() - started, "error")
+            if (isinstance(e, httpx.TimeoutException) and deadline_at is not None
+                    and time.monotonic() >= deadline_at):
+                raise DeadlineExceeded(f"Deadline of {deadline}s exceeded") from e
+            raise
+        _record_response(path, json, response, time.monotonic() - started)
+        return response
+
+    async def chat(self, payload: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        """Call /api/chat (non-streaming) and return the parsed JSON."""
+        response = await self.post("/api/chat", json={**payload, "stream": False}, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    async def stream(self, path: str, payload: Dict[str, Any],
+                     deadline: Optional[float] = None,
+                     timeout: Optional[float] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Async version of OllamaClient.stream() - yields NDJSON chunks as dicts."""
+        deadline_at = time.monotonic() + deadline if deadline is not None else None
+        payload = {**payload, "stream": True}
+        endpoint, model = _endpoint(path), payload.get("model")
+        started = time.monotonic()
+        status, final_chunk, first_token = "error", None, True
+        try:
+            async with self.http.stream("POST", path, json=payload,
+                                        timeout=self._timeout(timeout, deadline_at)) as response:
+                status = str(response.status_code)
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if deadline_at is not None and time.monotonic() > deadline_at:
+                        raise DeadlineExceeded(f"Deadline of {deadline}s exceeded while streaming")
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if "error" in chunk:
+                        raise httpx.HTTPStatusError(chunk["error"], request=response.request,
+                                                    response=response)
+                    if first_token and chunk_text(chunk):
+                        first_token = False
+                        record_time_to_first_token(endpoint, model, time.monotonic() - started)
+                    yield chunk
+                    if chunk.get("done"):
+                        final_chunk = chunk
+                        break
+        except Exception:
+            status = "error" if status == "200" else status
+            raise
+        finally:
+            record_ollama_call(endpoint, model, time.monotonic() - started, status, final_chunk)
+
+    async def aclose(self):
+        """Close all pooled connections."""
+        await self.http.aclose()
+
+
+# =============================================================================
+# SHARED INSTANCES (one per host)
+# =============================================================================
+
+_clients: Dict[str, Any] = {}
+_clients_lock = threading.Lock()
+
+
+def _client_key(base_url: Union[None, str, List[str]]) -> str:
+    """Normalise one host, a list of hosts or "url1,url2" to a cache key."""
+    if base_url is None:
+        base_url = DEFAULT_BASE_URLS or DEFAULT_BASE_URL
+    if not isinstance(base_url, str):
+        base_url = ",".join(base_url)
+    return ",".join(url.strip().rstrip("/") for url in base_url.split(",") if url.strip())
+
+
+def get_client(base_url: Union[None, str, List[str]] = None) -> OllamaClient:
+    """
+    Return the shared client for `base_url` (created on first use).
+
+    All bots talking to the same host share one connection pool,
+    so creating many bots does NOT create many pools.
+
+    Several hosts (a list or "url1,url2") give a load-balancing BackendPool.
+    """
+    key = _client_key(base_url)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            if "," in key:
+                from common.backend_pool import BackendPool  # imports this module
+                client = BackendPool(key)
+            else:
+                client = OllamaClient(base_url=key)
+            if os.getenv("OLLAMA_CASSETTE"):
+                # Record / replay all traffic of this client (common/cassette.py)
+                from common.cassette import install_from_env
+                install_from_env(client)
+            _clients[key] = client
+        return client
+
+
+def close_all():
+    """Close every shared client (useful in tests and on shutdown)."""
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+
+_async_clients: Dict[str, Any] = {}
+
+
+def get_async_client(base_url: Union[None, str, List[str]] = None) -> AsyncOllamaClient:
+    """
+    Return the shared AsyncOllamaClient for `base_url`.
+
+    Call it from inside the running event loop (e.g. a FastAPI handler);
+    close the clients with `await aclose_all()` on shutdown.
+    Several hosts give an AsyncBackendPool sharing get_client()'s routing state.
+    """
+    key = _client_key(base_url)
+    client = _async_clients.get(key)
+    if client is None:
+        if "," in key:
+            from common.backend_pool import AsyncBackendPool
+            client = AsyncBackendPool(get_client(key))
+        else:
+            client = AsyncOllamaClient(base_url=key)
+        _async_clients[key] = client
+    return client
+
+
+async def aclose_all():
+    """Close every shared async client (FastAPI shutdown hook)."""
+    clients = list(_async_clients.values())
+    _async_clients.clear()
+    for client in clients:
+        await client.aclose()
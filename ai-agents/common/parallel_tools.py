@@ -0,0 +1,141 @@
+"""
+Parallel Tools - Run a Message's Tool Calls Concurrently
+========================================================
+
+A model can ask for several tools in ONE message:
+
+    "What's the weather in London and Paris?"
+    -> tool_calls: [get_current_weather(London), get_current_weather(Paris)]
+
+Running them one after another costs the SUM of their latencies. Real tools
+(weather APIs, HR lookups, web search) mostly wait on the network, so
+running them in threads costs only the SLOWEST one:
+
+    sequential:  |--London 0.8s--|--Paris 0.7s--|          1.5s
+    parallel:    |--London 0.8s--|
+                 |--Paris 0.7s--|                          0.8s
+
+Rules that keep the agent correct:
+- Results come back in the ORIGINAL call order, so the transcript (and the
+  model's next answer) is the same no matter which tool finished first.
+- Every call has a timeout. A tool that hangs gets an error result instead
+  of stalling the whole agent (Python cannot kill a thread: it finishes in
+  the background and its result is dropped). A slow call whose result is
+  already there when we get to it is kept - the limit caps the WAIT.
+- A tool that raises is the tool's problem: `execute` is expected to return
+  an error string; anything it still raises becomes an error result here.
+
+Metrics (common/metrics.py):
+    tool_call_duration_seconds{tool}
+    tool_call_timeouts_total{tool}
+
+Usage:
+    results = execute_tool_calls(message["tool_calls"], execute_tool,
+                                 timeout=10, timeouts={"search_web": 20})
+    for r in results:
+        messages.append({"role": "tool", "content": r["content"]})
+
+Author: Beyhan MEYRALI
+"""
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, List, Optional
+
+from common.metrics import DURATION_BUCKETS, REGISTRY
+
+DEFAULT_TOOL_TIMEOUT = 30.0
+MAX_WORKERS = 8
+
+TOOL_DURATION = REGISTRY.histogram(
+    "tool_call_duration_seconds", "Tool execution time", ("tool",), buckets=DURATION_BUCKETS)
+TOOL_TIMEOUTS = REGISTRY.counter(
+    "tool_call_timeouts_total", "Tool calls abandoned after their timeout", ("tool",))
+
+# One pool for the whole process: threads are re-used across agent iterations
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="tool")
+        return _executor
+
+
+def parse_tool_call(tool_call: Dict[str, Any]):
+    """(name, arguments dict) from an Ollama/OpenAI style tool call."""
+    function_data = tool_call.get("function", {})
+    arguments = function_data.get("arguments") or {}
+    if isinstance(arguments, str):  # OpenAI-compatible APIs send a JSON string
+        try:
+            arguments = json.loads(arguments)
+        except json.JSONDecodeError:
+            arguments = {}
+    return function_data.get("name"), arguments
+
+
+def execute_tool_calls(tool_calls: List[Dict[str, Any]],
+                       execute: Callable[[str, Dict[str, Any]], str],
+                       timeout: float = DEFAULT_TOOL_TIMEOUT,
+                       timeouts: Optional[Dict[str, float]] = None,
+                       parallel: bool = True) -> List[Dict[str, Any]]:
+    """
+    Run every tool call of one assistant message.
+
+    Args:
+        tool_calls: message["tool_calls"]
+        execute: execute(name, arguments) -> result string
+        timeout: Seconds per call (default for tools not in `timeouts`)
+        timeouts: Per-tool overrides, e.g. {"search_web": 20}
+        parallel: False = one after another (no timeouts), for comparison
+
+    Returns:
+        One dict per call, IN CALL ORDER:
+        {"name", "arguments", "content", "seconds", "timed_out"}
+    """
+    calls = [parse_tool_call(tool_call) for tool_call in tool_calls]
+    timeouts = timeouts or {}
+
+    def run(name: str, arguments: Dict[str, Any]):
+        started = time.perf_counter()
+        try:
+            content = execute(name, arguments)
+        except Exception as e:
+            content = json.dumps({"error": f"Error executing {name}: {e}"})
+        seconds = time.perf_counter() - started
+        TOOL_DURATION.observe(seconds, tool=name)
+        return content, seconds
+
+    if not parallel:
+        results = []
+        for name, arguments in calls:
+            content, seconds = run(name, arguments)
+            results.append({"name": name, "arguments": arguments, "content": content,
+                            "seconds": seconds, "timed_out": False})
+        return results
+
+    executor = _get_executor()
+    started = time.perf_counter()
+    futures = [executor.submit(run, name, arguments) for name, arguments in calls]
+
+    results = []
+    for (name, arguments), future in zip(calls, futures):
+        limit = timeouts.get(name, timeout)
+        # All calls started together: wait only for what is left of THIS call's budget
+        remaining = max(0.0, limit - (time.perf_counter() - started))
+        try:
+            content, seconds = future.result(timeout=remaining)
+            timed_out = False
+        except FutureTimeout:
+            future.cancel()  # only helps if it has not started yet
+            TOOL_TIMEOUTS.inc(tool=name)
+            content = json.dumps({"error": f"{name} timed out after {limit:g}s"})
+            seconds, timed_out = limit, True
+        results.append({"name": name, "arguments": arguments, "content": content,
+                        "seconds": seconds, "timed_out": timed_out})
+    return results
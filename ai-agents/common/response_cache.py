@@ -0,0 +1,227 @@
+"""
+Response Cache - Exact-Match Caching for Deterministic Prompts
+==============================================================
+
+"What are your opening hours?" asked 500 times a day at temperature 0.1
+gives (almost) the same answer every time - yet every call re-runs a
+multi-second generation.
+
+ResponseCache stores answers keyed on EVERYTHING that influences them:
+
+    (model, normalised messages, options, tools)  ->  answer
+
+Two tiers:
+- Memory (LRU): microseconds, lost on restart
+- SQLite on disk (optional): survives restarts, shared by processes
+
+Safety rules:
+- Only cache when temperature <= max_temperature (creative answers SHOULD vary)
+- Entries expire after `ttl` seconds
+- The disk file is trimmed to `max_disk_bytes` (least recently used first)
+
+Usage:
+    cache = ResponseCache(path="response_cache.sqlite", ttl=24 * 3600)
+    key = cache.make_key(model, messages, options)
+    if cache.is_cacheable(options):
+        answer = cache.get(key)
+        ...
+        cache.set(key, answer)
+    print(cache.get_stats())   # hits / misses / hit_rate / bypassed ...
+
+Author: Beyhan MEYRALI
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+# Ollama's default temperature when the request does not set one
+OLLAMA_DEFAULT_TEMPERATURE = 0.8
+
+
+def _normalise_text(text: str) -> str:
+    """Collapse whitespace so "Hi  there\n" and "Hi there" share one entry."""
+    return " ".join(str(text).split())
+
+
+class ResponseCache:
+    """Two-tier (memory LRU + SQLite) exact-match cache for LLM responses."""
+
+    def __init__(self,
+                 path: Optional[str] = None,
+                 max_entries: int = 1000,
+                 max_disk_bytes: int = 50 * 1024 * 1024,
+                 ttl: Optional[float] = 24 * 3600,
+                 max_temperature: float = 0.3):
+        """
+        Args:
+            path: SQLite file for the disk tier (None = memory only)
+            max_entries: Size of the in-memory LRU tier
+            max_disk_bytes: Size cap for the stored values on disk
+            ttl: Seconds before an entry expires (None = never)
+            max_temperature: Requests above this temperature bypass the cache
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl = ttl
+        self.max_temperature = max_temperature
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (created, value)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "memory_hits": 0, "disk_hits": 0,
+                      "misses": 0, "bypassed": 0, "sets": 0, "evictions": 0}
+
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " created REAL NOT NULL, last_access REAL NOT NULL, size INTEGER NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_cache_access ON cache(last_access)")
+            self._db.commit()
+
+    # -------------------------------------------------------------------------
+    # Keys and cacheability
+    # -------------------------------------------------------------------------
+
+    @staticmethod
+    def make_key(model: str,
+                 messages: List[Dict],
+                 options: Optional[Dict] = None,
+                 tools: Optional[List[Dict]] = None) -> str:
+        """Stable hash of everything that influences the answer."""
+        normalised = [
+            {
+                "role": message.get("role"),
+                "content": _normalise_text(message.get("content") or ""),
+                "tool_calls": message.get("tool_calls"),
+            }
+            for message in messages
+        ]
+        material = json.dumps(
+            {"model": model, "messages": normalised,
+             "options": options or {}, "tools": tools or []},
+            sort_keys=True, ensure_ascii=False, default=str,
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def is_cacheable(self, options: Optional[Dict] = None) -> bool:
+        """Only low-temperature (near-deterministic) requests are cached."""
+        temperature = (options or {}).get("temperature", OLLAMA_DEFAULT_TEMPERATURE)
+        if temperature > self.max_temperature:
+            with self._lock:
+                self.stats["bypassed"] += 1
+            return False
+        return True
+
+    # -------------------------------------------------------------------------
+    # Get / set
+    # -------------------------------------------------------------------------
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value, or None on a miss."""
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                created, value = item
+                if not self._expired(created):
+                    self._memory.move_to_end(key)
+                    self.stats["hits"] += 1
+                    self.stats["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, created FROM cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value_json, created = row
+                    if not self._expired(created):
+                        self._db.execute("UPDATE cache SET last_access = ? WHERE key = ?",
+                                         (time.time(), key))
+                        self._db.commit()
+                        value = json.loads(value_json)
+                        self._remember(key, created, value)
+                        self.stats["hits"] += 1
+                        self.stats["disk_hits"] += 1
+                        return value
+                    self._db.execute("DELETE FROM cache WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.stats["misses"] += 1
+            return None
+
+    def set(self, key: str, value: Any):
+        """Store a value (must be JSON-serialisable for the disk tier)."""
+        now = time.time()
+        with self._lock:
+            self.stats["sets"] += 1
+            self._remember(key, now, value)
+
+            if self._db is not None:
+                value_json = json.dumps(value, ensure_ascii=False)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, created, last_access, size)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (key, value_json, now, now, len(value_json.encode("utf-8")))
+                )
+                self._trim_disk()
+                self._db.commit()
+
+    def _remember(self, key: str, created: float, value: Any):
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _trim_disk(self):
+        """Drop expired rows, then least recently used rows until under the size cap."""
+        if self.ttl is not None:
+            self._db.execute("DELETE FROM cache WHERE created < ?", (time.time() - self.ttl,))
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+        rows = self._db.execute("SELECT key, size FROM cache ORDER BY last_access").fetchall()
+        for key, size in rows:
+            if total <= self.max_disk_bytes:
+                break
+            self._db.execute("DELETE FROM cache WHERE key = ?", (key,))
+            total -= size
+            self.stats["evictions"] += 1
+
+    # -------------------------------------------------------------------------
+    # Helpers
+    # -------------------------------------------------------------------------
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters plus the hit rate."""
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {**self.stats,
+                    "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+                    "memory_entries": len(self._memory)}
+
+    def clear(self):
+        """Remove every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM cache")
+                self._db.commit()
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,255 @@
+"""
+Session Manager - Bounded Multi-User Memory
+===========================================
+
+A web chat service needs one conversation per user. The naive fix is a
+global dict:
+
+    sessions = {}
+    bot = sessions.setdefault(session_id, OllamaBot())
+
+That dict grows FOREVER - every visitor adds a bot that is never removed,
+until the server runs out of memory.
+
+SessionManager keeps the same "get the bot for this session" API, but:
+- LRU: at most `max_sessions` bots in memory (least recently used go first)
+- Idle TTL: sessions untouched for `idle_ttl` seconds are evicted
+- Memory cap: the total stored history is limited to `max_tokens`
+- Optional spill to disk: evicted sessions are saved as JSON and
+  rehydrated lazily the next time that session id shows up (with the
+  HistoryPolicy summary and the ContextSession state, if the bot has them)
+- Sessions in use (`with sessions.use(...)`) are never evicted: a request
+  that is still answering keeps its bot; eviction waits until it is done
+
+Any object with a `messages` list works (OllamaBot, AsyncOllamaBot, ...).
+
+Usage:
+    sessions = SessionManager(lambda: OllamaBot(), max_sessions=100,
+                              idle_ttl=1800, spill_dir="sessions")
+    with sessions.use("user-42") as bot:
+        bot.ask_question("Hi, I'm Alice")
+
+Author: Beyhan MEYRALI
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from common.tokens import count_message_tokens
+
+# Bot attributes saved next to the messages (objects with to_dict / load_dict)
+_SPILLED_STATE = ("history_policy", "context_session")
+
+
+class _Entry:
+    """One in-memory session plus the bookkeeping used for eviction."""
+
+    __slots__ = ("bot", "last_access", "tokens", "message_count", "in_use")
+
+    def __init__(self, bot: Any):
+        self.bot = bot
+        self.last_access = time.monotonic()
+        self.tokens = 0
+        self.message_count = -1
+        self.in_use = 0  # requests currently working with this bot
+
+
+class SessionManager:
+    """LRU + idle-TTL registry of conversational bots with an optional disk spill."""
+
+    def __init__(self,
+                 factory: Callable[[], Any],
+                 max_sessions: int = 100,
+                 idle_ttl: Optional[float] = 1800,
+                 max_tokens: Optional[int] = 200_000,
+                 spill_dir: Optional[str] = None):
+        """
+        Args:
+            factory: Creates a fresh bot for a new session
+            max_sessions: Max sessions kept in memory
+            idle_ttl: Seconds of inactivity before a session is evicted (None = never)
+            max_tokens: Cap on the total stored history of all sessions (None = no cap)
+            spill_dir: Folder where evicted sessions are saved (None = discard them)
+        """
+        self.factory = factory
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_tokens = max_tokens
+        self.spill_dir = spill_dir
+
+        self._sessions: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"created": 0, "hits": 0, "evicted": 0, "spilled": 0, "rehydrated": 0}
+
+    # -------------------------------------------------------------------------
+    # Public API
+    # -------------------------------------------------------------------------
+
+    def get(self, session_id: str) -> Any:
+        """Return the bot for `session_id` (created or rehydrated on demand)."""
+        with self._lock:
+            return self._checkout(session_id, hold=False).bot
+
+    @contextmanager
+    def use(self, session_id: str) -> Iterator[Any]:
+        """`with sessions.use(id) as bot:` - get(), and no eviction until the block ends."""
+        with self._lock:
+            entry = self._checkout(session_id, hold=True)
+        try:
+            yield entry.bot
+        finally:
+            with self._lock:
+                entry.in_use -= 1
+                entry.last_access = time.monotonic()
+                if self._sessions.get(session_id) is entry:
+                    self._sessions.move_to_end(session_id)
+                    # Evictions that were deferred while it was in use
+                    self._enforce_limits(keep=None)
+
+    def _checkout(self, session_id: str, hold: bool) -> _Entry:
+        self._evict_idle()
+
+        entry = self._sessions.get(session_id)
+        if entry is not None:
+            self._sessions.move_to_end(session_id)
+            self.stats["hits"] += 1
+        else:
+            entry = _Entry(self.factory())
+            if self._rehydrate(session_id, entry.bot):
+                self.stats["rehydrated"] += 1
+            else:
+                self.stats["created"] += 1
+            self._sessions[session_id] = entry
+
+        entry.last_access = time.monotonic()
+        entry.in_use += int(hold)
+        self._enforce_limits(keep=session_id)
+        return entry
+
+    def drop(self, session_id: str):
+        """Forget a session completely (memory AND disk)."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            path = self._spill_path(session_id)
+            if path and os.path.exists(path):
+                os.remove(path)
+
+    def total_tokens(self) -> int:
+        """Estimated tokens stored across all in-memory sessions."""
+        with self._lock:
+            return sum(self._refresh_tokens(entry) for entry in self._sessions.values())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Counters plus the current size of the registry."""
+        with self._lock:
+            return {
+                **self.stats,
+                "active_sessions": len(self._sessions),
+                "in_use": sum(1 for e in self._sessions.values() if e.in_use),
+                "stored_tokens": sum(self._refresh_tokens(e) for e in self._sessions.values()),
+            }
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    # -------------------------------------------------------------------------
+    # Eviction
+    # -------------------------------------------------------------------------
+
+    def _refresh_tokens(self, entry: _Entry) -> int:
+        """Re-count tokens only when the history actually changed."""
+        messages = entry.bot.messages
+        if len(messages) != entry.message_count:
+            entry.tokens = count_message_tokens(messages)
+            entry.message_count = len(messages)
+        return entry.tokens
+
+    def _evict_idle(self):
+        if self.idle_ttl is None:
+            return
+        cutoff = time.monotonic() - self.idle_ttl
+        # OrderedDict is in LRU order, so idle sessions are at the front
+        for session_id, entry in list(self._sessions.items()):
+            if entry.last_access > cutoff:
+                break
+            if not entry.in_use:
+                self._evict(session_id)
+
+    def _evictable(self, keep: Optional[str]):
+        """Session ids in LRU order, without `keep` and the sessions in use."""
+        return [session_id for session_id, entry in self._sessions.items()
+                if session_id != keep and not entry.in_use]
+
+    def _enforce_limits(self, keep: Optional[str]):
+        # If every candidate is in use, the limit is exceeded for a moment;
+        # use() enforces it again when a request is done
+        for session_id in self._evictable(keep):
+            if len(self._sessions) <= self.max_sessions:
+                break
+            self._evict(session_id)
+
+        if self.max_tokens is None:
+            return
+        total = sum(self._refresh_tokens(e) for e in self._sessions.values())
+        for session_id in self._evictable(keep):
+            if total <= self.max_tokens:
+                break
+            total -= self._sessions[session_id].tokens
+            self._evict(session_id)
+
+    def _evict(self, session_id: str):
+        entry = self._sessions.pop(session_id)
+        self.stats["evicted"] += 1
+        if self._spill(session_id, entry.bot):
+            self.stats["spilled"] += 1
+
+    # -------------------------------------------------------------------------
+    # Disk spill
+    # -------------------------------------------------------------------------
+
+    def _spill_path(self, session_id: str) -> Optional[str]:
+        if not self.spill_dir:
+            return None
+        # Hash the id so any string is a safe file name
+        digest = hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.spill_dir, f"{digest}.json")
+
+    def _spill(self, session_id: str, bot: Any) -> bool:
+        path = self._spill_path(session_id)
+        if not path or not bot.messages:
+            return False
+        data = {"session_id": session_id, "messages": bot.messages}
+        # Without the summary, folded turns would be forgotten after a reload
+        for name in _SPILLED_STATE:
+            state = getattr(bot, name, None)
+            if state is not None:
+                data[name] = state.to_dict()
+        os.makedirs(self.spill_dir, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+        return True
+
+    def _rehydrate(self, session_id: str, bot: Any) -> bool:
+        path = self._spill_path(session_id)
+        if not path or not os.path.exists(path):
+            return False
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        bot.messages = data.get("messages", [])
+        for name in _SPILLED_STATE:
+            state = getattr(bot, name, None)
+            if state is not None and data.get(name):
+                state.load_dict(data[name])
+        os.remove(path)
+        return True
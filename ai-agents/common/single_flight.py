@@ -0,0 +1,153 @@
+"""
+Single-Flight - Coalesce Identical In-Flight Requests
+=====================================================
+
+A popular question hits the server from 50 clients at the same moment:
+
+    without single-flight:  50 identical generations run on the GPU
+    with single-flight:      1 generation runs, 49 requests wait for it
+
+The FIRST request for a key becomes the "leader" and starts the work.
+Requests with the same key that arrive while it is still running attach
+to it and receive the same result. As soon as the work finishes the key
+is forgotten, so the next request starts fresh - unlike a cache, there
+is no risk of serving a stale answer.
+
+For streaming, every waiter gets the full token stream: chunks that were
+already produced are replayed, then new chunks are fanned out live.
+
+Usage (inside FastAPI / asyncio):
+    inflight = SingleFlight()
+
+    response = await inflight.do(payload_key(payload),
+                                 lambda: client.post("/api/chat", json=payload))
+
+    async for chunk in inflight.stream(payload_key(payload),
+                                       lambda: client.stream("/api/chat", payload)):
+        ...
+
+Author: Beyhan MEYRALI
+"""
+
+import asyncio
+import hashlib
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional
+
+
+def payload_key(payload: Dict[str, Any]) -> str:
+    """Exact hash of a request payload (same payload -> same key)."""
+    material = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class _StreamFlight:
+    """One running stream plus everything its subscribers need."""
+
+    def __init__(self):
+        self.chunks: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.changed = asyncio.Condition()
+        self.task: Optional[asyncio.Task] = None
+
+
+class SingleFlight:
+    """asyncio single-flight group for one-shot calls and token streams."""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._streams: Dict[Hashable, _StreamFlight] = {}
+        self.stats = {"leaders": 0, "coalesced": 0}
+
+    # -------------------------------------------------------------------------
+    # One-shot calls
+    # -------------------------------------------------------------------------
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run `fn()` once per key; concurrent callers share its result (or error)."""
+        task = self._calls.get(key)
+        if task is None:
+            self.stats["leaders"] += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._forget_call(key, t))
+        else:
+            self.stats["coalesced"] += 1
+
+        # shield(): if THIS client disconnects, the others still get the answer
+        return await asyncio.shield(task)
+
+    def _forget_call(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # mark as retrieved (waiters already re-raise it)
+
+    # -------------------------------------------------------------------------
+    # Streams
+    # -------------------------------------------------------------------------
+
+    async def stream(self, key: Hashable,
+                     stream_fn: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """Consume `stream_fn()` once per key and fan its items out to every caller."""
+        flight = self._streams.get(key)
+        if flight is None:
+            self.stats["leaders"] += 1
+            flight = _StreamFlight()
+            self._streams[key] = flight
+            flight.task = asyncio.ensure_future(self._pump(key, flight, stream_fn))
+        else:
+            self.stats["coalesced"] += 1
+
+        flight.subscribers += 1
+        index = 0
+        try:
+            while True:
+                async with flight.changed:
+                    await flight.changed.wait_for(
+                        lambda: index < len(flight.chunks) or flight.done)
+                    new_chunks = flight.chunks[index:]
+                    finished = flight.done
+
+                for chunk in new_chunks:
+                    yield chunk
+                index += len(new_chunks)
+
+                if finished and index >= len(flight.chunks):
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                # Every listener is gone - stop generating for nobody
+                flight.task.cancel()
+
+    async def _pump(self, key: Hashable, flight: _StreamFlight,
+                    stream_fn: Callable[[], AsyncIterator[Any]]):
+        try:
+            async for chunk in stream_fn():
+                async with flight.changed:
+                    flight.chunks.append(chunk)
+                    flight.changed.notify_all()
+        except asyncio.CancelledError:
+            flight.error = ConnectionAbortedError("Stream cancelled")
+        except Exception as e:
+            flight.error = e
+        finally:
+            if self._streams.get(key) is flight:
+                del self._streams[key]
+            async with flight.changed:
+                flight.done = True
+                flight.changed.notify_all()
+
+    # -------------------------------------------------------------------------
+    # Helpers
+    # -------------------------------------------------------------------------
+
+    def get_stats(self) -> Dict[str, int]:
+        """How many requests started work vs. joined an in-flight one."""
+        return {**self.stats,
+                "in_flight": len(self._calls) + len(self._streams)}
@@ -0,0 +1,142 @@
+"""
+Speculative Tools - Start Tool Calls While the Model Is Still Writing
+=====================================================================
+
+Without speculation, a multi-tool turn looks like this:
+
+    model:  |--writes call 1--|--writes call 2--|--writes call 3--|
+    tools:                                                         |--run all--|
+
+A streamed reply contains each tool call as soon as the model has finished
+writing it (Ollama sends one chunk per complete call). Read-only tools can
+start right away, while the model is still writing the next call:
+
+    model:  |--writes call 1--|--writes call 2--|--writes call 3--|
+    tools:                    |--run 1--|       |--run 2--|       |--run 3--|
+
+The gain is largest when the calls would otherwise run one after another,
+or when the early calls are the slow ones: the LAST call can only start when
+the message is complete, with or without speculation.
+
+The agent then executes the FINAL message as usual; a call that was already
+started just waits for its result. Rules that keep it safe:
+
+- Only tools that `is_safe(name)` allows are started early - read-only ones
+  (by default: the tools the ToolCache may cache). Anything with a side
+  effect waits for the finished message.
+- Results are matched on (tool name, canonical arguments). A started call
+  that the final message does not contain (the reply was retried, the
+  arguments changed) is discarded - it was read-only, so nothing happened.
+
+Metrics: tool_speculative_calls_total{tool, result="used"|"discarded"}
+
+Usage (one instance per agent run):
+    speculation = SpeculativeTools(execute_tool, is_safe=TOOL_CACHE.is_cacheable)
+    for chunk in stream:
+        for call in chunk["message"].get("tool_calls") or []:
+            speculation.start(call)
+    results = execute_tool_calls(message["tool_calls"], speculation.execute)
+    speculation.finish()   # drop what the final message did not ask for
+
+Author: Beyhan MEYRALI
+"""
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from common.metrics import REGISTRY
+from common.parallel_tools import parse_tool_call
+from common.tool_cache import ToolCache
+
+MAX_WORKERS = 4
+
+SPECULATIVE_CALLS = REGISTRY.counter(
+    "tool_speculative_calls_total", "Tool calls started before the model finished its message",
+    ("tool", "result"))
+
+# Own pool: execute() may wait for these futures from a parallel_tools thread
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="speculative")
+        return _executor
+
+
+class SpeculativeTools:
+    """Early execution of read-only tool calls from a streaming reply."""
+
+    def __init__(self, execute: Callable[[str, Dict[str, Any]], str],
+                 is_safe: Callable[[str], bool]):
+        """
+        Args:
+            execute: execute(name, arguments) -> result string
+            is_safe: True for tools without side effects (may run early)
+        """
+        self._execute = execute
+        self.is_safe = is_safe
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Any] = {}  # fingerprint -> (name, started, future)
+        self.stats = {"started": 0, "used": 0, "discarded": 0, "seconds_overlapped": 0.0}
+
+    def _run(self, name: str, arguments: Dict[str, Any]):
+        try:
+            content = self._execute(name, arguments)
+        except Exception as e:
+            content = json.dumps({"error": f"Error executing {name}: {e}"})
+        return content, time.perf_counter()
+
+    def start(self, tool_call: Dict[str, Any]) -> bool:
+        """Start a complete tool call in the background. True if it was started."""
+        name, arguments = parse_tool_call(tool_call)
+        if not name or not self.is_safe(name):
+            return False
+        key = ToolCache.make_key(name, arguments)
+        with self._lock:
+            if key in self._pending:
+                return False
+            future = _get_executor().submit(self._run, name, arguments)
+            self._pending[key] = (name, time.perf_counter(), future)
+            self.stats["started"] += 1
+        return True
+
+    def execute(self, name: str, arguments: Dict[str, Any]) -> str:
+        """Drop-in for `execute`: the early result if there is one, else run now."""
+        key = ToolCache.make_key(name, arguments)
+        with self._lock:
+            pending = self._pending.pop(key, None)
+        if pending is None:
+            return self._execute(name, arguments)
+
+        _, started, future = pending
+        claimed = time.perf_counter()
+        content, finished = future.result()
+        # Tool time spent while the model was still writing (the wall-clock
+        # gain is smaller when calls run in parallel anyway)
+        overlapped = max(0.0, min(claimed, finished) - started)
+        with self._lock:
+            self.stats["used"] += 1
+            self.stats["seconds_overlapped"] += overlapped
+        SPECULATIVE_CALLS.inc(tool=name, result="used")
+        return content
+
+    def finish(self) -> int:
+        """Discard started calls the final message did not contain. Returns how many."""
+        with self._lock:
+            leftovers, self._pending = list(self._pending.values()), {}
+            self.stats["discarded"] += len(leftovers)
+        for name, _, future in leftovers:
+            future.cancel()  # only helps if it has not started yet
+            SPECULATIVE_CALLS.inc(tool=name, result="discarded")
+        return len(leftovers)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "seconds_overlapped": round(self.stats["seconds_overlapped"], 3)}
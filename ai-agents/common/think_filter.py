@@ -0,0 +1,113 @@
+"""
+Incremental <think> Filter for Streaming Responses
+==================================================
+
+Reasoning models like qwen3 start their answer with a thinking block:
+
+    <think>Let me calculate... 2+2 is 4</think>The answer is 4
+
+With a non-streaming call you can remove it afterwards with one regex.
+With STREAMING the text arrives in small chunks, and a tag can be split
+anywhere:
+
+    "<thi"  "nk>Let me"  " calculate...</th"  "ink>The answer"  " is 4"
+
+ThinkFilter is a tiny state machine that you feed chunk by chunk.
+It returns only the visible text and holds back a few characters when
+a chunk ends with something that MIGHT be the start of a tag.
+
+Usage:
+    think_filter = ThinkFilter()
+    for token in stream:
+        visible = think_filter.feed(token)
+        print(visible, end="", flush=True)
+    print(think_filter.flush())
+
+Author: Beyhan MEYRALI
+"""
+
+OPEN_TAG = "<think>"
+CLOSE_TAG = "</think>"
+
+
+def _partial_tag_length(text: str, tag: str) -> int:
+    """
+    Length of the longest suffix of `text` that is a prefix of `tag`.
+
+    Example: _partial_tag_length("Hello </th", "</think>") == 4
+    """
+    for size in range(min(len(text), len(tag) - 1), 0, -1):
+        if text.endswith(tag[:size]):
+            return size
+    return 0
+
+
+class ThinkFilter:
+    """
+    Stateful <think>...</think> stripper that works across chunk boundaries.
+
+    Attributes:
+        in_think: True while we are inside a thinking block
+        thinking_chars: How many characters of thinking were discarded
+    """
+
+    def __init__(self, strip_leading_whitespace: bool = True):
+        """
+        Args:
+            strip_leading_whitespace: Drop the blank lines models usually emit
+                right after </think>, so the first visible token is real text
+        """
+        self.in_think = False
+        self.thinking_chars = 0
+        self.strip_leading_whitespace = strip_leading_whitespace
+        self._buffer = ""
+        self._started = False
+
+    def feed(self, chunk: str) -> str:
+        """Add a chunk of streamed text and return the part that is safe to show."""
+        self._buffer += chunk
+        visible = []
+
+        while self._buffer:
+            tag = CLOSE_TAG if self.in_think else OPEN_TAG
+            index = self._buffer.find(tag)
+
+            if index >= 0:
+                # A complete tag: everything before it belongs to the current state
+                self._emit(self._buffer[:index], visible)
+                self._buffer = self._buffer[index + len(tag):]
+                self.in_think = not self.in_think
+                continue
+
+            # No complete tag - keep back a possible partial tag at the end
+            keep = _partial_tag_length(self._buffer, tag)
+            self._emit(self._buffer[:len(self._buffer) - keep], visible)
+            self._buffer = self._buffer[len(self._buffer) - keep:]
+            break
+
+        return self._visible("".join(visible))
+
+    def flush(self) -> str:
+        """Call once the stream is finished to release any held-back text."""
+        remainder = "" if self.in_think else self._buffer
+        if self.in_think:
+            self.thinking_chars += len(self._buffer)
+        self._buffer = ""
+        return self._visible(remainder)
+
+    def reset(self):
+        """Prepare the filter for a new response."""
+        self.__init__(self.strip_leading_whitespace)
+
+    def _emit(self, text: str, visible: list):
+        if self.in_think:
+            self.thinking_chars += len(text)
+        else:
+            visible.append(text)
+
+    def _visible(self, text: str) -> str:
+        if self.strip_leading_whitespace and not self._started:
+            text = text.lstrip()
+        if text:
+            self._started = True
+        return text
@@ -0,0 +1,206 @@
+"""
+Thinking Budget - Control How Much qwen3 Reasons Before Answering
+=================================================================
+
+qwen3 thinks before it answers:
+
+    <think>Okay, the user asks for the capital of France. Let me recall...
+    (300 tokens later)</think>The capital of France is Paris.
+
+clean_response() throws the <think> block away - AFTER we waited for every
+one of those tokens. For voice and simple Q&A that is pure latency.
+
+ThinkingPolicy decides per request how much reasoning we pay for:
+
+    off     no thinking at all: Ollama's `"think": false`
+            (or the "/no_think" soft switch for older Ollama versions)
+    capped  thinking allowed up to `max_thinking_tokens`. While STREAMING,
+            a runaway block is aborted at the cap (closing the stream stops
+            the generation) and the question is re-asked with thinking off
+    full    unchanged behaviour
+
+Thinking tokens spent, tokens saved (against the average uncapped thinking
+length seen for the model) and aborts are exported on /metrics:
+
+    ollama_thinking_tokens_total{model, mode}
+    ollama_thinking_tokens_saved{model, mode}      (histogram, per request)
+    ollama_thinking_aborts_total{model}
+
+Usage:
+    policy = ThinkingPolicy("capped", max_thinking_tokens=200)
+    payload = policy.apply(payload)
+    budget = policy.budget(model)
+    for chunk in client.stream("/api/chat", payload):
+        if budget.feed(chunk):
+            break          # over the cap -> re-ask with ThinkingPolicy("off")
+    budget.finish()
+
+Author: Beyhan MEYRALI
+"""
+
+import re
+import threading
+from typing import Any, Dict, Optional, Union
+
+from common.metrics import REGISTRY
+from common.tokens import count_tokens
+
+THINK_OFF = "off"
+THINK_CAPPED = "capped"
+THINK_FULL = "full"
+THINK_MODES = (THINK_OFF, THINK_CAPPED, THINK_FULL)
+
+DEFAULT_MAX_THINKING_TOKENS = 512
+NO_THINK_SWITCH = " /no_think"
+INLINE_THINK = re.compile(r"<think>(.*?)(?:</think>|$)", re.DOTALL)
+
+TOKEN_BUCKETS = (0, 16, 64, 128, 256, 512, 1024, 2048, 4096)
+
+THINKING_TOKENS = REGISTRY.counter(
+    "ollama_thinking_tokens_total", "Reasoning tokens generated", ("model", "mode"))
+THINKING_TOKENS_SAVED = REGISTRY.histogram(
+    "ollama_thinking_tokens_saved", "Reasoning tokens saved per request (vs. uncapped average)",
+    ("model", "mode"), buckets=TOKEN_BUCKETS)
+THINKING_ABORTS = REGISTRY.counter(
+    "ollama_thinking_aborts_total", "Streams aborted because thinking hit the cap", ("model",))
+
+# Average uncapped thinking length per model - the baseline for "tokens saved"
+_baseline: Dict[str, float] = {}
+_baseline_lock = threading.Lock()
+
+
+def _observe_baseline(model: str, tokens: int):
+    with _baseline_lock:
+        previous = _baseline.get(model)
+        _baseline[model] = tokens if previous is None else 0.9 * previous + 0.1 * tokens
+
+
+def expected_thinking_tokens(model: str) -> Optional[float]:
+    """Average thinking length seen for `model` without a cap (None = unknown yet)."""
+    with _baseline_lock:
+        return _baseline.get(model)
+
+
+class ThinkingPolicy:
+    """How much reasoning one request may use: off, capped or full."""
+
+    def __init__(self, mode: str = THINK_FULL,
+                 max_thinking_tokens: int = DEFAULT_MAX_THINKING_TOKENS,
+                 use_flag: bool = True):
+        """
+        Args:
+            mode: "off", "capped" or "full"
+            max_thinking_tokens: The cap for "capped" (enforced while streaming)
+            use_flag: Use Ollama's `think` field; False = "/no_think" prompt switch
+        """
+        if mode not in THINK_MODES:
+            raise ValueError(f"Unknown thinking mode {mode!r}, use one of {THINK_MODES}")
+        self.mode = mode
+        self.max_thinking_tokens = max_thinking_tokens
+        self.use_flag = use_flag
+
+    @classmethod
+    def parse(cls, value: Union[None, str, "ThinkingPolicy"]) -> Optional["ThinkingPolicy"]:
+        """None / "off" / "full" / "capped" / "capped:200" / a policy -> policy (or None)."""
+        if value is None or isinstance(value, ThinkingPolicy):
+            return value
+        mode, _, cap = str(value).strip().lower().partition(":")
+        if not mode:
+            return None
+        return cls(mode, int(cap) if cap else DEFAULT_MAX_THINKING_TOKENS)
+
+    def apply(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy of an /api/chat or /api/generate payload with this policy applied."""
+        payload = dict(payload)
+        if self.mode == THINK_FULL:
+            return payload
+        if self.mode == THINK_CAPPED:
+            # Thinking in its own field: easy to count, never mixed into the answer
+            payload["think"] = True
+            return payload
+
+        if self.use_flag:
+            payload["think"] = False
+        elif "prompt" in payload:
+            payload["prompt"] = payload["prompt"] + NO_THINK_SWITCH
+        else:
+            messages = list(payload.get("messages", []))
+            for i in range(len(messages) - 1, -1, -1):
+                if messages[i].get("role") == "user":
+                    messages[i] = {**messages[i], "content": messages[i]["content"] + NO_THINK_SWITCH}
+                    break
+            payload["messages"] = messages
+        return payload
+
+    def budget(self, model: str) -> "ThinkingBudget":
+        """A fresh per-request counter."""
+        return ThinkingBudget(self, model)
+
+    def __repr__(self):
+        return f"ThinkingPolicy({self.mode!r}, max_thinking_tokens={self.max_thinking_tokens})"
+
+
+THINKING_OFF = ThinkingPolicy(THINK_OFF)
+
+
+class ThinkingBudget:
+    """Counts the reasoning tokens of ONE request and records them at the end."""
+
+    def __init__(self, policy: ThinkingPolicy, model: str):
+        self.policy = policy
+        self.model = model
+        self.thinking_tokens = 0
+        self.aborted = False
+        self._inline_parts = []
+        self._finished = False
+
+    def feed(self, chunk: Dict[str, Any]) -> bool:
+        """Count one stream chunk. True = over the cap, stop the stream now."""
+        thinking = (chunk.get("message") or {}).get("thinking") or chunk.get("thinking")
+        if thinking:
+            self.thinking_tokens += 1  # Ollama streams about one token per chunk
+        elif self.policy.mode == THINK_FULL:
+            self._inline_parts.append((chunk.get("message") or {}).get("content")
+                                      or chunk.get("response") or "")
+
+        if (self.policy.mode == THINK_CAPPED
+                and self.thinking_tokens > self.policy.max_thinking_tokens):
+            self.aborted = True
+            return True
+        return False
+
+    def finish(self, data: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Record the request (call once). `data` is a non-streaming response.
+
+        Returns the estimated number of thinking tokens saved.
+        """
+        if self._finished:
+            return 0
+        self._finished = True
+
+        if data is not None:
+            message = data.get("message") or {}
+            thinking = message.get("thinking") or data.get("thinking")
+            if thinking:
+                self.thinking_tokens = count_tokens(thinking)
+            else:
+                self._inline_parts.append(message.get("content") or data.get("response") or "")
+        if not self.thinking_tokens and self._inline_parts:
+            inline = INLINE_THINK.search("".join(self._inline_parts))
+            self.thinking_tokens = count_tokens(inline.group(1)) if inline else 0
+
+        mode = self.policy.mode
+        THINKING_TOKENS.inc(self.thinking_tokens, model=self.model, mode=mode)
+        if self.aborted:
+            THINKING_ABORTS.inc(model=self.model)
+        if mode == THINK_FULL:
+            # Unrestricted: a sample of how long this model likes to think
+            _observe_baseline(self.model, self.thinking_tokens)
+
+        expected = expected_thinking_tokens(self.model)
+        saved = 0
+        if mode != THINK_FULL and expected is not None:
+            saved = max(0, int(expected - self.thinking_tokens))
+        THINKING_TOKENS_SAVED.observe(saved, model=self.model, mode=mode)
+        return saved
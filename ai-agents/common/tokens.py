@@ -0,0 +1,70 @@
+"""
+Token Counting Helpers
+======================
+
+Context windows, memory caps and prompt budgets are all measured in TOKENS,
+not characters. Exact counts need the model's own tokenizer, but for budgets
+a fast estimate is good enough:
+
+    ~4 characters per token for English text (a well known rule of thumb)
+
+If `tiktoken` is installed, count_tokens() uses a real BPE tokenizer instead.
+It is not qwen3's tokenizer, but it is much closer than the 4-chars rule
+and still very fast. Counts are cached, because the same history messages
+are counted again on every turn.
+
+Author: Beyhan MEYRALI
+"""
+
+from functools import lru_cache
+from typing import Dict, List
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4  # role markers / separators added by the chat template
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for a piece of text (never 0 for non-empty text)."""
+    if not text:
+        return 0
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    """Load the tiktoken encoding once (None if tiktoken is unavailable)."""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:  # e.g. the encoding file cannot be downloaded offline
+        return None
+
+
+@lru_cache(maxsize=8192)
+def count_tokens(text: str) -> int:
+    """Token count using tiktoken when available, otherwise estimate_tokens()."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return estimate_tokens(text)
+
+
+def count_message_tokens(messages: List[Dict]) -> int:
+    """
+    Prompt size of a chat `messages` list, with the (cached) count_tokens().
+
+    The ONE message counter: history windows, session caps and stats all
+    use it, so their numbers agree with each other.
+    """
+    return sum(
+        count_tokens(str(message.get("content") or "")) + MESSAGE_OVERHEAD_TOKENS
+        for message in messages
+    )
@@ -0,0 +1,146 @@
+"""
+Tool Cache - Memoise Tool Results With a Per-Tool TTL
+=====================================================
+
+Agents repeat themselves. In one run the model may look up the manager in
+iteration 1 and again in iteration 3; across users, "weather in Paris" is
+asked all day. Each repeat re-runs the tool - a real API call.
+
+ToolCache remembers results keyed on:
+
+    (tool name, canonical arguments)  ->  result string
+
+    {"city": "Paris "}  and  {"city": "Paris"}   -> same key
+    {"a": 1, "b": 2}    and  {"b": 2, "a": 1}    -> same key
+
+Every tool decides for itself (opt-in):
+
+    ttls = {
+        "get_current_weather": 10 * 60,   # weather changes - 10 minutes
+        "get_team_members": 60 * 60,      # org chart - an hour
+        "send_email": None,               # side effect - NEVER cache
+    }
+
+Tools that are not declared are never cached, so a new side-effecting tool
+is safe by default. Error results ({"error": ...}) are not cached either.
+
+Storage is a ResponseCache: an in-process LRU plus an optional SQLite file,
+so results survive restarts and are shared by processes.
+
+Usage:
+    cache = ToolCache(ttls, path="tool_cache.sqlite")
+    result = cache.get(name, arguments)
+    if result is None:
+        result = run_tool(name, arguments)
+        cache.set(name, arguments, result)
+    print(cache.get_stats())
+
+Metrics: tool_cache_requests_total{tool, result="hit"|"miss"}
+
+Author: Beyhan MEYRALI
+"""
+
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from common.metrics import REGISTRY
+from common.response_cache import ResponseCache
+
+TOOL_CACHE_REQUESTS = REGISTRY.counter(
+    "tool_cache_requests_total", "Tool cache lookups", ("tool", "result"))
+
+
+def _canonical(value: Any) -> Any:
+    """Strip and collapse whitespace in strings, recursively (keys are sorted by json.dumps)."""
+    if isinstance(value, str):
+        return " ".join(value.split())
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    return value
+
+
+def _is_error(result: str) -> bool:
+    try:
+        data = json.loads(result)
+    except (TypeError, ValueError):
+        return False
+    return isinstance(data, dict) and "error" in data
+
+
+class ToolCache:
+    """Opt-in, per-tool TTL cache for tool results."""
+
+    def __init__(self,
+                 ttls: Dict[str, Optional[float]],
+                 path: Optional[str] = None,
+                 max_entries: int = 1000):
+        """
+        Args:
+            ttls: tool name -> seconds a result stays valid. None (or a tool
+                  that is missing) = never cached, e.g. tools with side effects
+            path: SQLite file for a persistent tier (None = memory only)
+            max_entries: Size of the in-memory LRU tier
+        """
+        self.ttls = dict(ttls)
+        # Expiry is per entry (per tool), so the store itself never expires
+        self._store = ResponseCache(path=path, max_entries=max_entries, ttl=None)
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def is_cacheable(self, name: str) -> bool:
+        return self.ttls.get(name) is not None
+
+    @staticmethod
+    def make_key(name: str, arguments: Dict[str, Any]) -> str:
+        material = json.dumps({"tool": name, "arguments": _canonical(arguments or {})},
+                              sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, name: str, arguments: Dict[str, Any]) -> Optional[str]:
+        """Cached result, or None (miss, expired or not cacheable)."""
+        if not self.is_cacheable(name):
+            self._count(name, "uncacheable")
+            return None
+        entry = self._store.get(self.make_key(name, arguments))
+        if entry is not None and entry["expires"] > time.time():
+            self._count(name, "hits")
+            TOOL_CACHE_REQUESTS.inc(tool=name, result="hit")
+            return entry["result"]
+        self._count(name, "expired" if entry is not None else "misses")
+        TOOL_CACHE_REQUESTS.inc(tool=name, result="miss")
+        return None
+
+    def set(self, name: str, arguments: Dict[str, Any], result: str):
+        """Remember a result (ignored for uncacheable tools and error results)."""
+        ttl = self.ttls.get(name)
+        if ttl is None or _is_error(result):
+            return
+        self._store.set(self.make_key(name, arguments),
+                        {"result": result, "expires": time.time() + ttl})
+
+    def _count(self, name: str, field: str):
+        with self._lock:
+            per_tool = self.stats.setdefault(
+                name, {"hits": 0, "misses": 0, "expired": 0, "uncacheable": 0})
+            per_tool[field] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-tool hits / misses / expired, plus the overall hit rate."""
+        with self._lock:
+            per_tool = {name: dict(counts) for name, counts in self.stats.items()}
+        hits = sum(c["hits"] for c in per_tool.values())
+        lookups = hits + sum(c["misses"] + c["expired"] for c in per_tool.values())
+        return {"tools": per_tool, "hits": hits, "lookups": lookups,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "entries": self._store.get_stats()["memory_entries"]}
+
+    def clear(self):
+        self._store.clear()
+
+    def close(self):
+        self._store.close()
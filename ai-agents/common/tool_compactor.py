@@ -0,0 +1,239 @@
+"""
+Tool Compactor - Shrink Tool Results Before the Model Sees Them
+===============================================================
+
+Every tool result is appended to `messages` and re-sent on EVERY later
+iteration of the agent loop:
+
+    iteration 1:  question                                  ~50 tokens
+    iteration 2:  question + search results (3 KB)       ~800 tokens
+    iteration 3:  question + search results + team list ~1500 tokens
+    ...           the same kilobytes, read again and again (prompt eval time!)
+
+Most of that JSON is never used: e-mail addresses, ids, URLs, the 40th
+search hit. ToolResultCompactor applies a per-tool policy to each result
+before it goes into the conversation:
+
+    TOOL_OUTPUT_POLICIES = {
+        "get_my_manager":   {"fields": ["manager_name", "manager_city"]},
+        "get_team_members": {"fields": ["team[].name", "team[].city"], "max_items": 10},
+        "search_web":       {"max_tokens": 200, "offload": True},
+    }
+
+    fields     keep only these paths ("a.b", "items[].name" = in every item)
+    max_items  cut longer lists, adding "... N more item(s)"
+    max_tokens truncate the (compact) JSON text to this many tokens
+    offload    keep the FULL result in a side store; the message gets a
+               handle ("result:search_web:3f2a...") the application can
+               fetch() - e.g. to show it, or behind a "read more" tool
+
+Tools without a policy are passed through unchanged (`default_max_tokens`
+adds a safety cap for them). Error results are never touched: the model
+needs the whole error message.
+
+Metric: tool_output_tokens_saved_total{tool}
+
+Usage:
+    compactor = ToolResultCompactor(TOOL_OUTPUT_POLICIES)
+    content = compactor.compact(name, raw_result)
+    messages.append({"role": "tool", "content": content})
+    print(compactor.get_stats())       # tokens saved per tool
+
+Author: Beyhan MEYRALI
+"""
+
+import hashlib
+import json
+import threading
+from typing import Any, Dict, List, Optional
+
+from common.metrics import REGISTRY
+from common.response_cache import ResponseCache
+from common.tokens import count_tokens
+
+TOKENS_SAVED = REGISTRY.counter(
+    "tool_output_tokens_saved_total", "Tool result tokens removed before sending to the model",
+    ("tool",))
+
+
+# =============================================================================
+# BUILDING BLOCKS
+# =============================================================================
+
+def project(data: Any, paths: List[str]) -> Any:
+    """
+    Keep only the given paths of a JSON value.
+
+    project({"a": 1, "b": {"c": 2, "d": 3}}, ["a", "b.c"])  -> {"a": 1, "b": {"c": 2}}
+    project({"team": [{"name": "Bob", "role": "x"}]}, ["team[].name"])
+                                                           -> {"team": [{"name": "Bob"}]}
+    """
+    if isinstance(data, list):
+        return [project(item, paths) for item in data]
+    result: Dict[str, Any] = {}
+    for path in paths:
+        _copy_path(data, result, path.split("."))
+    return result
+
+
+def _copy_path(source: Any, target: Dict[str, Any], parts: List[str]):
+    head, rest = parts[0], parts[1:]
+    is_list = head.endswith("[]")
+    key = head[:-2] if is_list else head
+    if not isinstance(source, dict) or key not in source:
+        return
+    value = source[key]
+    if not rest:
+        target[key] = value
+    elif is_list and isinstance(value, list):
+        items = target.setdefault(key, [{} for _ in value])
+        for source_item, target_item in zip(value, items):
+            _copy_path(source_item, target_item, rest)
+    elif isinstance(value, dict):
+        _copy_path(value, target.setdefault(key, {}), rest)
+
+
+def limit_lists(data: Any, max_items: int) -> Any:
+    """Cut every list longer than max_items (recursively), noting what was left out."""
+    if isinstance(data, dict):
+        return {key: limit_lists(value, max_items) for key, value in data.items()}
+    if isinstance(data, list):
+        kept = [limit_lists(item, max_items) for item in data[:max_items]]
+        if len(data) > max_items:
+            kept.append(f"... {len(data) - max_items} more item(s)")
+        return kept
+    return data
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to about max_tokens tokens, saying how much was dropped."""
+    total = count_tokens(text)
+    if total <= max_tokens:
+        return text
+    cut = len(text) * max_tokens // total
+    while cut > 0 and count_tokens(text[:cut]) > max_tokens:
+        cut = int(cut * 0.9)
+    return f"{text[:cut]} ...[truncated, ~{total - count_tokens(text[:cut])} more tokens]"
+
+
+def _is_error(data: Any) -> bool:
+    return isinstance(data, dict) and "error" in data
+
+
+# =============================================================================
+# THE COMPACTOR
+# =============================================================================
+
+class ToolResultCompactor:
+    """Per-tool projection, list limits, token budget and side-store offload."""
+
+    def __init__(self,
+                 policies: Dict[str, Dict[str, Any]],
+                 default_max_tokens: Optional[int] = None,
+                 store_path: Optional[str] = None,
+                 max_stored: int = 256):
+        """
+        Args:
+            policies: tool name -> {"fields", "max_items", "max_tokens", "offload"}
+            default_max_tokens: Token cap for tools WITHOUT a policy (None = no cap)
+            store_path: SQLite file for offloaded results (None = memory only)
+            max_stored: Offloaded results kept in memory (LRU)
+        """
+        self.policies = dict(policies)
+        self.default_max_tokens = default_max_tokens
+        self._store = ResponseCache(path=store_path, max_entries=max_stored, ttl=None)
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def policy_for(self, name: str) -> Optional[Dict[str, Any]]:
+        policy = self.policies.get(name)
+        if policy is None and self.default_max_tokens is not None:
+            policy = {"max_tokens": self.default_max_tokens}
+        return policy
+
+    def compact(self, name: str, content: str) -> str:
+        """The text to put into the conversation for one tool result."""
+        policy = self.policy_for(name)
+        if not policy or not content:
+            return content
+
+        try:
+            data = json.loads(content)
+        except (TypeError, ValueError):
+            data = None  # plain text: only the token budget applies
+        if _is_error(data):
+            return content
+
+        compacted, lossy = content, False
+        if data is not None:
+            kept = data
+            if policy.get("fields"):
+                kept = project(kept, policy["fields"])
+            if policy.get("max_items"):
+                kept = limit_lists(kept, policy["max_items"])
+            lossy = kept != data
+            # No indentation or spaces after separators - whitespace is tokens too
+            compacted = json.dumps(kept, ensure_ascii=False, separators=(",", ":"))
+        if policy.get("max_tokens"):
+            truncated = truncate_to_tokens(compacted, policy["max_tokens"])
+            lossy = lossy or truncated != compacted
+            compacted = truncated
+
+        # Only worth a handle if something was actually left out
+        offloaded = bool(policy.get("offload")) and lossy
+        if offloaded:
+            compacted = f"{compacted}\n(full result stored as {self.handle(name, content)})"
+
+        before, after = count_tokens(content), count_tokens(compacted)
+        if after >= before:  # nothing to gain (small result)
+            self._count(name, before, before, offloaded=False)
+            return content
+
+        if offloaded:
+            self._store.set(self.handle(name, content), content)
+        self._count(name, before, after, offloaded)
+        TOKENS_SAVED.inc(before - after, tool=name)
+        return compacted
+
+    # -------------------------------------------------------------------------
+    # Side store
+    # -------------------------------------------------------------------------
+
+    @staticmethod
+    def handle(name: str, content: str) -> str:
+        """Stable reference for a full result: same result -> same handle."""
+        digest = hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+        return f"result:{name}:{digest}"
+
+    def fetch(self, handle: str) -> Optional[str]:
+        """The full result behind a handle (None if unknown or evicted)."""
+        return self._store.get(handle.strip())
+
+    # -------------------------------------------------------------------------
+    # Statistics
+    # -------------------------------------------------------------------------
+
+    def _count(self, name: str, before: int, after: int, offloaded: bool):
+        with self._lock:
+            per_tool = self.stats.setdefault(
+                name, {"results": 0, "compacted": 0, "offloaded": 0,
+                       "tokens_before": 0, "tokens_after": 0})
+            per_tool["results"] += 1
+            per_tool["compacted"] += int(after < before)
+            per_tool["offloaded"] += int(offloaded)
+            per_tool["tokens_before"] += before
+            per_tool["tokens_after"] += after
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-tool counts plus the total tokens saved (per result, not per re-send)."""
+        with self._lock:
+            per_tool = {name: dict(counts) for name, counts in self.stats.items()}
+        for counts in per_tool.values():
+            counts["tokens_saved"] = counts["tokens_before"] - counts["tokens_after"]
+        before = sum(c["tokens_before"] for c in per_tool.values())
+        saved = sum(c["tokens_saved"] for c in per_tool.values())
+        return {"tools": per_tool, "tokens_saved": saved,
+                "saved_ratio": round(saved / before, 3) if before else 0.0}
+
+    def close(self):
+        self._store.close()
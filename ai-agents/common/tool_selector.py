@@ -0,0 +1,255 @@
+"""
+Tool Selector - Send Only the Relevant Tools to the Model
+=========================================================
+
+Every tool-calling request carries the JSON schema of EVERY tool:
+
+    4 tools   ->   ~400 prompt tokens
+    50 tools  ->   ~5,000 prompt tokens, re-read on every agent iteration
+
+Most of them are irrelevant to the question. ToolSelector is a small
+retrieval step in front of the model (the same idea as RAG, for tools):
+
+    1. Embed every tool's name + description ONCE (cached, optionally on disk)
+    2. Per request, embed the question and keep the top-k most similar tools
+    3. Send only those k schemas
+
+Selecting costs an embedding request. A catalogue that would lose only one
+schema (top_k + 1 tools or fewer) is sent whole - the call costs more than
+the ~100 tokens it saves. Agents select once per run, not per iteration.
+
+If the model then asks for a tool it was not offered, or says it has no tool
+for the job, `needs_full_set()` tells the agent to retry the turn with the
+FULL catalogue - a wrong guess costs one extra call, never a wrong answer.
+
+If the embedding model is unavailable the selector offers every tool and
+tries embedding again after a cool-down (a restarting Ollama is not fatal).
+
+Metrics:
+    tool_selection_offered          histogram of tools sent per request
+    tool_selection_fallbacks_total  retries with the full catalogue
+
+Usage:
+    selector = ToolSelector(TOOLS, top_k=5, always_include=["search_web"])
+    tools = selector.select(selection_query(messages))   # once per run
+    ... agent loop: call the model with tools ...
+    if selector.needs_full_set(message, tools):
+        tools = selector.tools   # re-ask with everything
+
+Author: Beyhan MEYRALI
+"""
+
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import requests
+
+from common.metrics import REGISTRY
+from common.ollama_client import get_client
+from common.tokens import count_tokens
+
+DEFAULT_EMBEDDING_MODEL = "qwen3-embedding:0.6b"
+DEFAULT_TOP_K = 5
+MIN_TOOLS_DROPPED = 2  # select only if at least this many schemas can be left out
+RETRY_AFTER = 60.0     # seconds to offer everything after an embedding failure
+
+# "I don't have a tool for that" - the model noticed something is missing
+MISSING_TOOL_PATTERN = re.compile(
+    r"\b(?:(?:do not|don't|does not|doesn't) have (?:a |an |the )?(?:access to |any )?"
+    r"(?:tool|function)s?|no (?:suitable |available )?(?:tool|function)s? (?:available|for|to)|"
+    r"(?:tool|function)s? (?:is|are) not available)\b",
+    re.IGNORECASE,
+)
+
+TOOLS_OFFERED = REGISTRY.histogram(
+    "tool_selection_offered", "Tool schemas sent per request", buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55))
+SELECTION_FALLBACKS = REGISTRY.counter(
+    "tool_selection_fallbacks_total", "Turns retried with the full tool catalogue")
+
+
+def tool_name(tool: Dict[str, Any]) -> str:
+    return tool.get("function", {}).get("name", "")
+
+
+def tool_text(tool: Dict[str, Any]) -> str:
+    """What gets embedded: name, description and parameter descriptions."""
+    function = tool.get("function", {})
+    parts = [function.get("name", "").replace("_", " "), function.get("description", "")]
+    for name, spec in (function.get("parameters", {}).get("properties") or {}).items():
+        parts.append(f"{name}: {spec.get('description', '')}".strip(": "))
+    return "\n".join(part for part in parts if part)
+
+
+def selection_query(messages: List[Dict[str, Any]], max_chars: int = 300) -> str:
+    """
+    What the run is about. Agents select once per run, before the first
+    model call, so this is the user's question. Tool results that follow it
+    are appended only when a caller selects again mid-run.
+    """
+    question = next((m.get("content") or "" for m in reversed(messages)
+                     if m.get("role") == "user"), "")
+    recent = []
+    for message in reversed(messages):
+        if message.get("role") != "tool":
+            break
+        recent.append((message.get("content") or "")[:max_chars])
+    return "\n".join([question] + recent[::-1])
+
+
+def _normalise(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+class ToolSelector:
+    """Embedding-based top-k tool retrieval with a full-catalogue fallback."""
+
+    def __init__(self,
+                 tools: List[Dict[str, Any]],
+                 top_k: int = DEFAULT_TOP_K,
+                 always_include: Iterable[str] = (),
+                 model: str = DEFAULT_EMBEDDING_MODEL,
+                 client: Any = None,
+                 cache_path: Optional[str] = None,
+                 max_cached_queries: int = 256,
+                 retry_after: float = RETRY_AFTER):
+        """
+        Args:
+            tools: The full catalogue (Ollama tool schemas)
+            top_k: Tools to send per request (catalogues of up to top_k + 1 are sent whole)
+            always_include: Tool names that are always offered (e.g. a generic search)
+            model: Ollama embedding model
+            client: OllamaClient / BackendPool (default: get_client())
+            cache_path: JSON file for the tool vectors (re-embeds only changed tools)
+            max_cached_queries: LRU size for query vectors (repeated questions)
+            retry_after: Seconds to send the full catalogue after the embedding
+                         model fails, before trying it again
+        """
+        self.tools = list(tools)
+        self.top_k = top_k
+        self.always_include = set(always_include)
+        self.model = model
+        self.client = client or get_client()
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.max_cached_queries = max_cached_queries
+        self.retry_after = retry_after
+
+        self._lock = threading.Lock()
+        self._vectors: Optional[List[List[float]]] = None
+        self._queries: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._disabled_until = 0.0  # embedding model failed -> offer everything until then
+        self._schema_tokens = {tool_name(t): count_tokens(json.dumps(t)) for t in self.tools}
+        self.stats = {"selections": 0, "full_catalogue": 0, "fallbacks": 0,
+                      "tools_offered": 0, "schema_tokens_saved": 0}
+
+    # -------------------------------------------------------------------------
+    # Embeddings
+    # -------------------------------------------------------------------------
+
+    def _embed(self, text: str) -> List[float]:
+        return _normalise(self.client.embeddings(self.model, text, timeout=30))
+
+    def _tool_vectors(self) -> List[List[float]]:
+        """Embed the catalogue once; the disk cache is keyed on model + tool text."""
+        if self._vectors is not None:
+            return self._vectors
+
+        stored: Dict[str, List[float]] = {}
+        if self.cache_path is not None and self.cache_path.exists():
+            stored = json.loads(self.cache_path.read_text(encoding="utf-8"))
+
+        vectors, changed = [], False
+        for tool in self.tools:
+            text = tool_text(tool)
+            key = hashlib.sha256(f"{self.model}\n{text}".encode("utf-8")).hexdigest()
+            if key not in stored:
+                stored[key] = self._embed(text)
+                changed = True
+            vectors.append(stored[key])
+
+        if changed and self.cache_path is not None:
+            self.cache_path.write_text(json.dumps(stored), encoding="utf-8")
+        self._vectors = vectors
+        return vectors
+
+    def _query_vector(self, query: str) -> List[float]:
+        with self._lock:
+            vector = self._queries.get(query)
+            if vector is not None:
+                self._queries.move_to_end(query)
+                return vector
+        vector = self._embed(query)
+        with self._lock:
+            self._queries[query] = vector
+            while len(self._queries) > self.max_cached_queries:
+                self._queries.popitem(last=False)
+        return vector
+
+    # -------------------------------------------------------------------------
+    # Selection
+    # -------------------------------------------------------------------------
+
+    def select(self, query: str, top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """The top-k tools for `query` (plus always_include), in catalogue order."""
+        k = top_k or self.top_k
+        if len(self.tools) < k + MIN_TOOLS_DROPPED or time.monotonic() < self._disabled_until:
+            return self._offer(self.tools, full=True)
+
+        try:
+            with self._lock:
+                tool_vectors = self._tool_vectors()
+            query_vector = self._query_vector(query)
+        except (requests.exceptions.RequestException, KeyError, ValueError) as e:
+            print(f"[WARNING] Tool selection paused ({self.model} unavailable: {e}) - "
+                  f"sending all tools, retrying in {self.retry_after:.0f}s")
+            self._disabled_until = time.monotonic() + self.retry_after
+            return self._offer(self.tools, full=True)
+
+        scores = [sum(a * b for a, b in zip(query_vector, vector)) for vector in tool_vectors]
+        ranked = sorted(range(len(self.tools)), key=lambda i: scores[i], reverse=True)
+        chosen = set(ranked[:k])
+        chosen.update(i for i, tool in enumerate(self.tools) if tool_name(tool) in self.always_include)
+        return self._offer([tool for i, tool in enumerate(self.tools) if i in chosen])
+
+    def needs_full_set(self, message: Dict[str, Any], offered: List[Dict[str, Any]]) -> bool:
+        """
+        True if the model's reply suggests a tool was missing from `offered`:
+        it called a tool that was not offered, or said it has no suitable tool.
+        """
+        if len(offered) >= len(self.tools):
+            return False
+        offered_names = {tool_name(tool) for tool in offered}
+        called = [call.get("function", {}).get("name") for call in message.get("tool_calls") or []]
+        missing = any(name not in offered_names for name in called)
+        if not missing and not called:
+            missing = bool(MISSING_TOOL_PATTERN.search(message.get("content") or ""))
+        if missing:
+            SELECTION_FALLBACKS.inc()
+            with self._lock:
+                self.stats["fallbacks"] += 1
+        return missing
+
+    def _offer(self, tools: List[Dict[str, Any]], full: bool = False) -> List[Dict[str, Any]]:
+        TOOLS_OFFERED.observe(len(tools))
+        offered = {tool_name(tool) for tool in tools}
+        saved = sum(tokens for name, tokens in self._schema_tokens.items() if name not in offered)
+        with self._lock:
+            self.stats["selections"] += 1
+            self.stats["full_catalogue"] += int(full)
+            self.stats["tools_offered"] += len(tools)
+            self.stats["schema_tokens_saved"] += saved
+        return tools
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            selections = self.stats["selections"]
+            return {**self.stats, "catalogue_size": len(self.tools),
+                    "avg_tools_offered": round(self.stats["tools_offered"] / selections, 2)
+                    if selections else 0.0}